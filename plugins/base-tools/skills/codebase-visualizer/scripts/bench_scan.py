@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Benchmark visualize.scan() against the original recursive pathlib walker."""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from visualize import IGNORE, new_stats, scan
+
+def legacy_scan(path: Path, stats: dict) -> dict:
+    result = {"name": path.name, "children": [], "size": 0}
+    try:
+        for item in sorted(path.iterdir()):
+            if item.name in IGNORE or item.name.startswith('.'):
+                continue
+            if item.is_file():
+                size = item.stat().st_size
+                ext = item.suffix.lower() or '(no ext)'
+                result["children"].append({"name": item.name, "size": size, "ext": ext})
+                result["size"] += size
+                stats["files"] += 1
+                stats["extensions"][ext] += 1
+                stats["ext_sizes"][ext] += size
+            elif item.is_dir():
+                stats["dirs"] += 1
+                child = legacy_scan(item, stats)
+                if child["children"]:
+                    result["children"].append(child)
+                    result["size"] += child["size"]
+    except PermissionError:
+        pass
+    return result
+
+def best_of(fn, repeat: int):
+    best, out = float('inf'), None
+    for _ in range(repeat):
+        stats = new_stats()
+        start = time.perf_counter()
+        data = fn(stats)
+        best = min(best, time.perf_counter() - start)
+        out = (data, stats)
+    return best, out
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path', nargs='?', default='.', help='directory to scan (default: .)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per variant, best time is reported (default: 3)')
+    parser.add_argument('--workers', default='1,4,8', help='comma-separated worker counts (default: 1,4,8)')
+    args = parser.parse_args()
+    target = Path(args.path).resolve()
+
+    legacy_time, expected = best_of(lambda stats: legacy_scan(target, stats), args.repeat)
+    files = expected[1]["files"]
+    print(f'{target}: {files:,} files, {expected[1]["dirs"]:,} dirs')
+    print(f'{"variant":<14}{"seconds":>10}{"files/s":>14}{"speedup":>10}')
+    print(f'{"legacy":<14}{legacy_time:>10.3f}{files / legacy_time:>14,.0f}{1:>9.2f}x')
+    for workers in (int(w) for w in args.workers.split(',')):
+        elapsed, (data, stats) = best_of(lambda s: scan(target, s, workers), args.repeat)
+        note = '' if (data, stats) == expected else '  OUTPUT MISMATCH'
+        print(f'{f"scandir x{workers}":<14}{elapsed:>10.3f}{files / elapsed:>14,.0f}{legacy_time / elapsed:>9.2f}x{note}')
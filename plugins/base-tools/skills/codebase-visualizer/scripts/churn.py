@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Git history overlay for the codebase visualizer: commit counts and lines changed per file
+and folder, from one streamed `git log --numstat` and cached by HEAD."""
+
+import json
+import os
+import subprocess
+from array import array
+from pathlib import Path
+
+VERSION = 1
+READ = 1 << 20
+HOTSPOTS = 15   # files listed in the page
+
+def _git(root, *args) -> str:
+    result = subprocess.run(['git', '-C', str(root), *args], capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+def _stream_log(root, since: str, counts: dict):
+    """Add the commits in HEAD (after since, if given) that touch root to counts, keyed by
+    repository path; folders end in '/' and count each commit once. Returns the commit count,
+    or None if git failed (counts are then incomplete)."""
+    rev = f'{since}..HEAD' if since else 'HEAD'
+    cmd = ['git', '-C', str(root), 'log', '-z', '--numstat', '--no-renames', '--no-merges', '--format=%x1e%H', rev, '--', '.']
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    commits = 0
+    touched = set()
+
+    def close_commit():
+        for d in touched:
+            counts.setdefault(d, [0, 0, 0])[0] += 1
+        touched.clear()
+
+    rest = b''
+    while True:
+        block = proc.stdout.read(READ)
+        if not block:
+            break
+        records = (rest + block).split(b'\0')
+        rest = records.pop()
+        for record in records:
+            record = record.lstrip(b'\n')
+            if record.startswith(b'\x1e'):
+                close_commit()
+                commits += 1
+                continue
+            if not record:
+                continue
+            added, deleted, path = record.split(b'\t', 2)
+            added = int(added) if added != b'-' else 0   # '-' for binary files
+            deleted = int(deleted) if deleted != b'-' else 0
+            path = path.decode('utf-8', 'surrogateescape')
+            entry = counts.setdefault(path, [0, 0, 0])
+            entry[0] += 1
+            entry[1] += added
+            entry[2] += deleted
+            cut = len(path)
+            while cut >= 0:
+                cut = path.rfind('/', 0, cut)
+                folder = path[:cut + 1]  # '' is the repository root
+                entry = counts.setdefault(folder, [0, 0, 0])
+                entry[1] += added
+                entry[2] += deleted
+                touched.add(folder)
+    close_commit()
+    return commits if proc.wait() == 0 else None
+
+def load_churn(root: Path, cache_path: Path = None):
+    """({repository path: [commits, added, deleted]}, repository prefix of root, commits parsed
+    this run), or None outside a git work tree or when git log fails. A cache for an ancestor
+    of HEAD is extended with just the new commits."""
+    head = _git(root, 'rev-parse', 'HEAD')
+    prefix = _git(root, 'rev-parse', '--show-prefix')
+    top = _git(root, 'rev-parse', '--show-toplevel')
+    if head is None or prefix is None:
+        return None
+    key = {"version": VERSION, "top": top, "prefix": prefix}
+    counts, since = {}, None
+    if cache_path:
+        try:
+            saved = json.loads(cache_path.read_text(encoding='utf-8'))
+            if saved.get("key") == key:
+                if saved["head"] == head:
+                    return saved["counts"], prefix, 0
+                if _git(root, 'merge-base', '--is-ancestor', saved["head"], head) is not None:
+                    counts, since = saved["counts"], saved["head"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    parsed = _stream_log(root, since, counts)
+    if parsed is None:
+        return None  # partial history must not be shown or cached as complete
+    if cache_path:
+        tmp = cache_path.with_name(cache_path.name + '.tmp')
+        tmp.write_text(json.dumps({"key": key, "head": head, "counts": counts}, separators=(',', ':')),
+                       encoding='utf-8')
+        os.replace(tmp, cache_path)
+    return counts, prefix, parsed
+
+def churn_overlay(tree, root: Path, cache_path: Path = None):
+    """Store per-node 'commits' and 'churn' (lines added + deleted) arrays in tree.extra and
+    return {"commits", "parsed", "max", "hotspots"}, or None when root is not under git or git log fails."""
+    loaded = load_churn(root, cache_path)
+    if loaded is None:
+        return None
+    counts, prefix, parsed = loaded
+    n = len(tree)
+    commits, churn = array('d', bytes(8 * n)), array('d', bytes(8 * n))
+    rel = tree.paths('')
+    files = []
+    for i in range(n):
+        key = prefix + rel[i].replace(os.sep, '/')
+        if tree.ext[i] < 0 and i:
+            key += '/'
+        entry = counts.get(key)
+        if entry:
+            commits[i] = entry[0]
+            churn[i] = entry[1] + entry[2]
+            if tree.ext[i] >= 0:
+                files.append(i)
+    tree.extra.update(commits=commits, churn=churn)
+    files.sort(key=lambda i: (-commits[i], -churn[i]))
+    return {"commits": int(commits[0]), "parsed": parsed, "max": int(commits[files[0]]) if files else 0,
+            "hotspots": [{"path": rel[i], "commits": int(commits[i]), "churn": int(churn[i]), "size": tree.size[i]}
+                         for i in files[:HOTSPOTS]]}
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Duplicate files for the codebase visualizer: files are bucketed by size, then compared by
+a hash of their first and last blocks, and only what still collides is hashed in full."""
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+BLOCK = 1 << 16     # bytes hashed at each end of a file in the second stage
+READ = 1 << 20      # read size for full hashes
+
+def _digest():
+    return hashlib.blake2b(digest_size=16)
+
+def _edges(path: str, size: int):
+    """(file identity, hash of the first and last BLOCK bytes); small files are hashed whole."""
+    h = _digest()
+    try:
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            if size <= 2 * BLOCK:
+                h.update(f.read())
+            else:
+                h.update(f.read(BLOCK))
+                f.seek(-BLOCK, os.SEEK_END)
+                h.update(f.read(BLOCK))
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino), h.digest()
+
+def _full(path: str):
+    h = _digest()
+    buf = bytearray(READ)
+    view = memoryview(buf)
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                h.update(view[:n])
+    except OSError:
+        return None
+    return h.digest()
+
+def _collide(keys: dict) -> list:
+    """Groups of two or more indices that share a key."""
+    groups = {}
+    for i, key in keys.items():
+        groups.setdefault(key, []).append(i)
+    return [g for g in groups.values() if len(g) > 1]
+
+def find_duplicates(tree, root, threads: int = 8) -> dict:
+    """Duplicate groups among the files in tree, largest waste first:
+    {"groups": [{"size", "wasted", "paths"}], "wasted", "compared", "hashed"}.
+    Hard links to one file count as a single copy; empty files are skipped."""
+    rel = tree.paths('')
+    by_size = {}
+    for i in range(len(tree)):
+        if tree.ext[i] >= 0 and tree.size[i]:
+            by_size.setdefault(tree.size[i], []).append(i)
+    candidates = [i for bucket in by_size.values() if len(bucket) > 1 for i in bucket]
+    path = lambda i: os.path.join(root, rel[i])
+    size = tree.size
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        edges = {}
+        seen = set()
+        for i, result in zip(candidates, pool.map(lambda i: _edges(path(i), size[i]), candidates)):
+            if result is None or result[0] in seen:
+                continue  # unreadable, or a hard link to a file already listed
+            seen.add(result[0])
+            edges[i] = (size[i], result[1])
+        groups, todo = [], []
+        for group in _collide(edges):
+            (groups if size[group[0]] <= 2 * BLOCK else todo).append(group)
+        todo = [i for group in todo for i in group]
+        full = {}
+        for i, digest in zip(todo, pool.map(lambda i: _full(path(i)), todo)):
+            if digest is not None:
+                full[i] = (size[i], digest)
+        groups.extend(_collide(full))
+
+    out = [{"size": size[g[0]], "wasted": size[g[0]] * (len(g) - 1), "paths": sorted(rel[i] for i in g)}
+           for g in groups]
+    out.sort(key=lambda g: (-g["wasted"], g["paths"][0]))
+    return {"groups": out, "wasted": sum(g["wasted"] for g in out),
+            "compared": len(candidates), "hashed": len(todo)}
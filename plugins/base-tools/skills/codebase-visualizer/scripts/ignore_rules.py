@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Compiled .gitignore matching for the codebase visualizer."""
+
+import hashlib
+import re
+from functools import lru_cache
+from pathlib import Path
+
+def _translate(pattern: str) -> str:
+    """Translate one gitignore glob into a regex body."""
+    out, i, n = [], 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern.startswith('**', i) and (i == 0 or pattern[i - 1] == '/'):
+                if i + 2 == n:
+                    out.append('.*')  # trailing '/**': everything inside
+                    i += 2
+                    continue
+                if pattern[i + 2] == '/':
+                    out.append('(?:.*/)?')  # '**/': zero or more directories
+                    i += 3
+                    continue
+            while i + 1 < n and pattern[i + 1] == '*':
+                i += 1
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            j = i + 1
+            if j < n and pattern[j] in '!^':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            while j < n and pattern[j] != ']':
+                j += 1
+            if j >= n:
+                out.append('\\[')
+            else:
+                body = pattern[i + 1:j]
+                if body[0] in '!^':
+                    body = '^' + body[1:]
+                out.append('[' + body.replace('[', '\\[') + ']')
+                i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out)
+
+def _union(sources: list):
+    return re.compile('|'.join(f'(?:{s})' for s in sources)) if sources else None
+
+class IgnoreFile:
+    """Patterns from one ignore file. Patterns without a slash match the entry name at any
+    depth; the rest match the path relative to the file's directory."""
+
+    def __init__(self, text: str):
+        self.rules = []  # (negate, dir_only, anchored, regex), in file order
+        for line in text.splitlines():
+            if not line or line.startswith('#'):
+                continue
+            if not line.endswith('\\ '):
+                line = line.rstrip(' ')
+            negate = line.startswith('!')
+            if negate or line.startswith('\\!') or line.startswith('\\#'):
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+            anchored = '/' in line
+            self.rules.append((negate, dir_only, anchored, _translate(line.lstrip('/'))))
+        self.negates = any(r[0] for r in self.rules)
+        if self.negates:
+            # Last matching pattern wins, so keep them ordered.
+            self.ordered = [(neg, d, a, re.compile(src)) for neg, d, a, src in reversed(self.rules)]
+        else:
+            # Without negations any match ignores, so each group collapses into one regex.
+            pick = lambda dir_only, anchored: [s for _, d, a, s in self.rules if d == dir_only and a == anchored]
+            self.name_any, self.path_any = _union(pick(False, False)), _union(pick(False, True))
+            self.name_dir, self.path_dir = _union(pick(True, False)), _union(pick(True, True))
+
+    def match(self, rel: str, name: str, is_dir: bool):
+        """True to ignore, False to re-include, None when no pattern applies."""
+        if not self.negates:
+            if ((self.name_any and self.name_any.fullmatch(name)) or (self.path_any and self.path_any.fullmatch(rel))
+                    or (is_dir and ((self.name_dir and self.name_dir.fullmatch(name))
+                                    or (self.path_dir and self.path_dir.fullmatch(rel))))):
+                return True
+            return None
+        for negate, dir_only, anchored, regex in self.ordered:
+            if dir_only and not is_dir:
+                continue
+            if regex.fullmatch(rel if anchored else name):
+                return not negate
+        return None
+
+@lru_cache(maxsize=None)
+def _compile(text: str) -> IgnoreFile:
+    return IgnoreFile(text)
+
+def _read(path) -> str:
+    try:
+        return Path(path).read_text(encoding='utf-8', errors='replace')
+    except OSError:
+        return ''
+
+def _git_dir(top: Path):
+    """The directory holding info/exclude for the work tree at top: .git itself, or for a
+    linked worktree or submodule (where .git is a file) the git dir it points to."""
+    dot_git = top / '.git'
+    if dot_git.is_dir():
+        return dot_git
+    text = _read(dot_git)
+    if not text.startswith('gitdir:'):
+        return None
+    git_dir = (top / text[len('gitdir:'):].strip()).resolve()
+    common = _read(git_dir / 'commondir').strip()
+    return (git_dir / common).resolve() if common else git_dir
+
+def _work_tree(root: Path):
+    """(top of the git work tree holding root, root's path below it), or (None, None)."""
+    top = root.resolve()
+    parts = []
+    while not (top / '.git').exists():
+        if top.parent == top:
+            return None, None
+        parts.append(top.name)
+        top = top.parent
+    return top, parts[::-1]
+
+class IgnoreRules:
+    """Ignore files in effect for one directory, shallowest first. Paths are relative to the
+    scan root with '/' separators; directory prefixes end in '/'. fp fingerprints the rules.
+    Files above the scan root (the repository's exclude file and ancestor .gitignore files)
+    match against the path from their own directory, which is the scan-root path with a
+    fixed lead prepended."""
+
+    def __init__(self, levels: tuple = (), fp: str = '', gitignore: bool = True):
+        self.levels = levels
+        self.fp = fp
+        self.gitignore = gitignore
+
+    @classmethod
+    def for_root(cls, root: Path, extra_files=(), gitignore: bool = True) -> 'IgnoreRules':
+        """Rules in effect above the scan root, lowest precedence first: extra ignore files,
+        then the enclosing repository's info/exclude, then the .gitignore of every directory
+        from the repository top down to (not including) root, as git applies them."""
+        rules = cls(gitignore=gitignore)
+        for path in extra_files:
+            rules = rules.child('', _read(path))
+        if not gitignore:
+            return rules
+        top, below = _work_tree(root)
+        if top is None:
+            return rules
+        git_dir = _git_dir(top)
+        if git_dir:
+            rules = rules.child('', _read(git_dir / 'info' / 'exclude'), ''.join(f'{p}/' for p in below))
+        for depth in range(len(below)):
+            ancestor = top.joinpath(*below[:depth])
+            rules = rules.child('', _read(ancestor / '.gitignore'), ''.join(f'{p}/' for p in below[depth:]))
+        return rules
+
+    def child(self, prefix: str, text: str, lead: str = '') -> 'IgnoreRules':
+        """Rules with one more ignore file, located at directory prefix, taking precedence.
+        lead is the scan root's path from a file that lives above the root."""
+        compiled = _compile(text)
+        if not compiled.rules:
+            return self
+        fp = hashlib.sha1(f'{self.fp}\0{lead}{prefix}\0{text}'.encode('utf-8')).hexdigest()[:16]
+        return IgnoreRules(self.levels + ((prefix, lead, compiled),), fp, self.gitignore)
+
+    def enter(self, path: str, prefix: str) -> 'IgnoreRules':
+        """Add the .gitignore of directory path (relative prefix) if it has one."""
+        return self.child(prefix, _read(f'{path}/.gitignore'))
+
+    def ignored(self, prefix: str, name: str, is_dir: bool) -> bool:
+        for base, lead, compiled in reversed(self.levels):
+            verdict = compiled.match(lead + prefix[len(base):] + name, name, is_dir)
+            if verdict is not None:
+                return verdict
+        return False
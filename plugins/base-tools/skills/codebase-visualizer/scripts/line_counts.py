@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Line, blank and comment counts for the codebase visualizer, computed in a process pool."""
+
+import json
+import mmap
+import os
+import re
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+SNIFF = 8000            # bytes checked for NUL, as git does
+MMAP_MIN = 1 << 16      # smaller files are cheaper to read() than to map
+WINDOW = 1 << 22        # mapped files are counted in line-aligned windows of about this size
+BATCH = 256             # files per pool task
+BINARY = -1             # lines value recorded for binary files
+
+_HASH = ('#',)
+_SLASH = ('//',)
+COMMENT_PREFIXES = {
+    '.py': _HASH, '.sh': _HASH, '.bash': _HASH, '.rb': _HASH, '.pl': _HASH, '.r': _HASH,
+    '.yaml': _HASH, '.yml': _HASH, '.toml': _HASH, '.cfg': _HASH, '.conf': _HASH, '.ps1': _HASH,
+    '(no ext)': _HASH, '.cmake': _HASH, '.mk': _HASH, '.dockerfile': _HASH,
+    '.c': _SLASH, '.h': _SLASH, '.cc': _SLASH, '.cpp': _SLASH, '.hpp': _SLASH, '.cs': _SLASH,
+    '.java': _SLASH, '.kt': _SLASH, '.scala': _SLASH, '.go': _SLASH, '.rs': _SLASH, '.swift': _SLASH,
+    '.js': _SLASH, '.jsx': _SLASH, '.ts': _SLASH, '.tsx': _SLASH, '.mjs': _SLASH, '.dart': _SLASH,
+    '.php': ('//', '#'), '.sql': ('--',), '.lua': ('--',), '.hs': ('--',),
+    '.ini': (';', '#'), '.bat': ('REM ', 'rem ', '::'), '.vim': ('"',), '.tex': ('%',), '.erl': ('%',),
+}
+
+_BLANK = re.compile(rb'^[ \t\r\f\v]*$', re.M)
+_COMMENT = {prefixes: re.compile(rb'^[ \t]*(?:' + b'|'.join(re.escape(p.encode()) for p in prefixes) + rb')', re.M)
+            for prefixes in set(COMMENT_PREFIXES.values())}
+
+def count_buffer(data, comment) -> tuple:
+    """(lines, blank, comment) for one text buffer."""
+    size = len(data)
+    if not size:
+        return 0, 0, 0
+    lines = data.count(b'\n') + (data[size - 1:size] != b'\n')
+    blank = len(_BLANK.findall(data))
+    if data[size - 1:size] == b'\n':
+        blank -= 1  # the empty match after the final newline is not a line
+    comments = len(comment.findall(data)) if comment else 0
+    return lines, blank, comments
+
+def count_mapped(data: mmap.mmap, comment) -> tuple:
+    """count_buffer over a mapped file, one line-aligned window at a time."""
+    lines = blank = comments = 0
+    size, start = len(data), 0
+    while start < size:
+        end = size
+        if start + WINDOW < size:
+            cut = data.rfind(b'\n', start, start + WINDOW)
+            if cut < 0:
+                cut = data.find(b'\n', start + WINDOW)
+            if cut >= 0:
+                end = cut + 1
+        counted = count_buffer(data[start:end], comment)
+        lines += counted[0]
+        blank += counted[1]
+        comments += counted[2]
+        start = end
+    return lines, blank, comments
+
+def count_file(path: str, ext: str) -> tuple:
+    """(lines, blank, comment) for a text file; lines is BINARY when a NUL shows up early."""
+    comment = _COMMENT.get(COMMENT_PREFIXES.get(ext))
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(SNIFF)
+            if b'\0' in head:
+                return BINARY, 0, 0
+            if len(head) < SNIFF:
+                return count_buffer(head, comment)
+            size = os.fstat(f.fileno()).st_size
+            if size < MMAP_MIN:
+                return count_buffer(head + f.read(), comment)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return count_mapped(data, comment)
+    except (OSError, ValueError):
+        return BINARY, 0, 0
+
+def _count_batch(batch: list) -> list:
+    return [count_file(path, ext) for path, ext in batch]
+
+def count_lines(tree, root: Path, cache_path: Path = None, jobs: int = None) -> dict:
+    """Count lines for every file in tree, store per-node 'lines'/'blank'/'comment' arrays in
+    tree.extra (summed into directories; lines is BINARY for binary files) and return
+    per-extension totals: {ext: {"lines", "blank", "comment", "text", "binary"}}."""
+    cache = {}
+    if cache_path:
+        try:
+            cache = json.loads(cache_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            cache = {}
+    paths = tree.paths(str(root))
+    n = len(tree)
+    lines, blank, comment = array('d', bytes(8 * n)), array('d', bytes(8 * n)), array('d', bytes(8 * n))
+    fresh, todo = {}, []
+    for i in range(n):
+        if tree.ext[i] < 0:
+            continue
+        path = paths[i]
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        key = [tree.size[i], mtime]
+        hit = cache.get(path)
+        if hit and hit[:2] == key:
+            fresh[path] = hit
+            lines[i], blank[i], comment[i] = hit[2:]
+        else:
+            todo.append((i, path, key))
+    if todo:
+        batches = [todo[k:k + BATCH] for k in range(0, len(todo), BATCH)]
+        work = [[(path, tree.exts[tree.ext[i]]) for i, path, _ in batch] for batch in batches]
+        if len(batches) == 1 or jobs == 1:
+            results = list(map(_count_batch, work))
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(_count_batch, work))
+        for batch, counts in zip(batches, results):
+            for (i, path, key), counted in zip(batch, counts):
+                lines[i], blank[i], comment[i] = counted
+                fresh[path] = key + list(counted)
+    if cache_path and (todo or len(fresh) != len(cache)):
+        tmp = cache_path.with_name(cache_path.name + '.tmp')
+        tmp.write_text(json.dumps(fresh, separators=(',', ':')), encoding='utf-8')
+        os.replace(tmp, cache_path)
+
+    totals = {}
+    for i in range(n):
+        e = tree.ext[i]
+        if e < 0:
+            continue
+        t = totals.setdefault(tree.exts[e], {"lines": 0, "blank": 0, "comment": 0, "text": 0, "binary": 0})
+        if lines[i] == BINARY:
+            t["binary"] += 1
+        else:
+            t["text"] += 1
+            t["lines"] += int(lines[i])
+            t["blank"] += int(blank[i])
+            t["comment"] += int(comment[i])
+    # Roll text counts up into directories, children first.
+    for i in range(n - 1, 0, -1):
+        if lines[i] > 0:
+            p = tree.parent[i]
+            lines[p] += lines[i]
+            blank[p] += blank[i]
+            comment[p] += comment[i]
+    tree.extra.update(lines=lines, blank=blank, comment=comment)
+    return totals
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Squarified treemap (Bruls, Huizing and van Wijk) of the scanned tree, laid out in Python
+and written as a static SVG. Siblings that would come out smaller than min_px on a side are
+merged into one box, so the output grows with the canvas rather than with the repository."""
+
+import html
+
+HEADER = 14     # px reserved above a folder's contents for its name
+PAD = 1         # px between a folder's edge and its contents
+DIR_FILL, REST_FILL, FILE_FILL = '#252542', '#3d3d5c', '#6b7280'
+
+def squarify(areas: list, x: float, y: float, w: float, h: float) -> list:
+    """(x, y, w, h) for each area (largest first, summing to w * h), in order. Rows are laid
+    along the shorter side and grow while their worst aspect ratio keeps improving; with the
+    areas sorted, a row's largest and smallest items are its first and last."""
+    rects = []
+    i, n = 0, len(areas)
+    while i < n:
+        side = min(w, h)
+        if side <= 0:
+            rects.extend((x, y, 0.0, 0.0) for _ in range(n - i))
+            break
+        side2 = side * side
+        total, big = areas[i], areas[i]
+        worst = max(side2 * big / (total * total), total * total / (side2 * big))
+        j = i + 1
+        while j < n:
+            grown = total + areas[j]
+            ratio = max(side2 * big / (grown * grown), grown * grown / (side2 * areas[j]))
+            if ratio > worst:
+                break
+            total, worst = grown, ratio
+            j += 1
+        thick = total / side
+        offset = 0.0
+        for area in areas[i:j]:
+            length = area / thick
+            if w >= h:  # column along the left edge
+                rects.append((x, y + offset, thick, length))
+            else:       # row along the top edge
+                rects.append((x + offset, y, length, thick))
+            offset += length
+        if w >= h:
+            x, w = x + thick, w - thick
+        else:
+            y, h = y + thick, h - thick
+        i = j
+    return rects
+
+def _has_header(w: float, h: float) -> bool:
+    return h > 3 * HEADER and w > 4 * HEADER
+
+def layout(tree, width: int, height: int, min_px: float = 6) -> list:
+    """Draw list of (x, y, w, h, node, rest), parents before children. rest is None for a
+    tree node; for a merged box it is (count, bytes) of the small children of folder node."""
+    start, kids = tree.children_index()
+    size, ext = tree.size, tree.ext
+    min_area = min_px * min_px
+    out = []
+    if not size[0]:
+        return out
+    stack = [(0, 0.0, 0.0, float(width), float(height))]
+    while stack:
+        node, x, y, w, h = stack.pop()
+        out.append((x, y, w, h, node, None))
+        if ext[node] >= 0 or w < 2 * min_px or h < 2 * min_px:
+            continue  # a file, or a folder too small to show its contents
+        top = HEADER if _has_header(w, h) else 0
+        x, y, w, h = x + PAD, y + PAD + top, w - 2 * PAD, h - 2 * PAD - top
+        if w <= 0 or h <= 0:
+            continue
+        children = sorted((k for k in kids[start[node]:start[node + 1]] if size[k]), key=size.__getitem__, reverse=True)
+        scale = w * h / size[node]
+        items = [(size[k] * scale, k) for k in children]
+        cut = len(items)
+        while cut and items[cut - 1][0] < min_area:
+            cut -= 1
+        rest = None
+        if len(items) - cut > 1:
+            small = children[cut:]
+            rest = (len(small), sum(size[k] for k in small))
+            items = items[:cut]
+            items.append((rest[1] * scale, -1))
+            items.sort(key=lambda item: item[0], reverse=True)
+        rects = squarify([area for area, _ in items], x, y, w, h)
+        for (_, k), rect in zip(reversed(items), reversed(rects)):
+            if k < 0:
+                out.append((*rect, node, rest))
+            else:
+                stack.append((k, *rect))
+    return out
+
+def _fmt(b) -> str:
+    if b < 1024: return f"{b} B"
+    if b < 1048576: return f"{b/1024:.1f} KB"
+    return f"{b/1048576:.1f} MB"
+
+def render_svg(tree, width: int = 1600, height: int = 1000, min_px: float = 6, colors: dict = None) -> str:
+    """Standalone SVG of layout(); hover any box for its path and size."""
+    colors = colors or {}
+    paths = tree.paths('')
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+             f'viewBox="0 0 {width} {height}" font-family="system-ui, sans-serif" font-size="11">',
+             '<style>rect{stroke:#1a1a2e;stroke-width:.5}text{fill:#eee;pointer-events:none}</style>',
+             f'<rect width="{width}" height="{height}" fill="#1a1a2e"/>']
+    for x, y, w, h, node, rest in layout(tree, width, height, min_px):
+        if rest:
+            fill, label = REST_FILL, f'{rest[0]:,} smaller items'
+            title = f'{paths[node] or tree.names[tree.name[0]]}/ — {label}, {_fmt(rest[1])}'
+        else:
+            name = tree.names[tree.name[node]]
+            is_dir = tree.ext[node] < 0
+            fill = DIR_FILL if is_dir else colors.get(tree.exts[tree.ext[node]], FILE_FILL)
+            label = name + ('/' if is_dir else '')
+            title = f'{paths[node] or name}{"/" if is_dir else ""} — {_fmt(tree.size[node])}'
+        parts.append(f'<rect x="{x:.1f}" y="{y:.1f}" width="{w:.1f}" height="{h:.1f}" fill="{fill}">'
+                     f'<title>{html.escape(title)}</title></rect>')
+        if rest is None and tree.ext[node] < 0 and not _has_header(w, h):
+            continue  # folder names only go in their header strip
+        chars = int((w - 6) / 6.5)
+        if h >= HEADER and chars >= 3:
+            if len(label) > chars:
+                label = label[:chars - 1] + '…'
+            parts.append(f'<text x="{x + 3:.1f}" y="{y + 11:.1f}">{html.escape(label)}</text>')
+    parts.append('</svg>')
+    return '\n'.join(parts)
@@ -1,48 +1,688 @@
 #!/usr/bin/env python3
 """Generate an interactive collapsible tree visualization of a codebase."""
 
+import argparse
+import base64
+import hashlib
+import html
 import json
+import os
+import stat
 import sys
+import threading
+import time
 import webbrowser
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from collections import Counter
+from collections import Counter, deque
+
+from churn import churn_overlay
+from duplicates import find_duplicates
+from ignore_rules import IgnoreRules
+from line_counts import count_lines
+from treemap import render_svg
+from watch import make_watcher, serve
 
 IGNORE = {'.git', 'node_modules', '__pycache__', '.venv', 'venv', 'dist', 'build'}
+NO_RULES = IgnoreRules(gitignore=False)
+DUP_GROUPS = 50  # duplicate groups listed in the page
+COLORS = {
+    '.js': '#f7df1e', '.ts': '#3178c6', '.py': '#3776ab', '.go': '#00add8',
+    '.rs': '#dea584', '.rb': '#cc342d', '.css': '#264de4', '.html': '#e34c26',
+    '.json': '#6b7280', '.md': '#083fa1', '.yaml': '#cb171e', '.yml': '#cb171e',
+    '.mdx': '#083fa1', '.tsx': '#3178c6', '.jsx': '#61dafb', '.sh': '#4eaa25',
+}
+
+# Match Path ordering: case-insensitive on Windows, byte order elsewhere.
+_sort_key = (lambda e: e.name.lower()) if os.name == 'nt' else (lambda e: e.name)
+
+def new_stats() -> dict:
+    return {"files": 0, "dirs": 0, "extensions": Counter(), "ext_sizes": Counter()}
+
+def _suffix(name: str) -> str:
+    # Same rule as Path.suffix.
+    i = name.rfind('.')
+    return name[i:] if 0 < i < len(name) - 1 else ''
+
+def _is_ancestor(link: str, here: str) -> bool:
+    target = os.path.realpath(link)
+    real = os.path.realpath(here)
+    return real == target or real.startswith(target.rstrip(os.sep) + os.sep)
+
+def _b64(values: array) -> str:
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return base64.b64encode(values.tobytes()).decode('ascii')
+
+class CompactTree:
+    """Tree stored as parallel arrays. Node 0 is the root and every parent precedes its
+    children; names and extensions are interned, and ext is -1 for directories."""
+
+    def __init__(self, root_name: str = ''):
+        self.parent = array('i')
+        self.name = array('i')
+        self.size = array('q')
+        self.ext = array('i')
+        self.names, self._name_ids = [], {}
+        self.exts, self._ext_ids = [], {}
+        self.dirs = array('i')
+        self._filled = set()  # directories with at least one file directly inside
+        self.extra = {}  # optional per-node arrays added after finalize(), e.g. line counts
+        self.add(-1, root_name)
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def add(self, parent: int, name: str, size: int = 0, ext: str = None) -> int:
+        """Append a node; file sizes are added to the parent right away."""
+        ids = self._name_ids
+        name_id = ids.setdefault(name, len(ids))
+        if name_id == len(self.names):
+            self.names.append(name)
+        index = len(self.parent)
+        if ext is None:
+            ext_id, size = -1, 0
+            self.dirs.append(index)
+        else:
+            ext_ids = self._ext_ids
+            ext_id = ext_ids.setdefault(ext, len(ext_ids))
+            if ext_id == len(self.exts):
+                self.exts.append(ext)
+            self.size[parent] += size
+            self._filled.add(parent)
+        self.parent.append(parent)
+        self.name.append(name_id)
+        self.size.append(size)
+        self.ext.append(ext_id)
+        return index
+
+    def graft(self, index: int, other: 'CompactTree') -> None:
+        """Attach the children of other's root (not yet finalized) under node index."""
+        base = len(self) - 1
+        names, exts = other.names, other.exts
+        for i in range(1, len(other)):
+            p = other.parent[i]
+            e = other.ext[i]
+            self.add(index if p == 0 else base + p, names[other.name[i]], other.size[i],
+                     None if e < 0 else exts[e])
+
+    def finalize(self) -> 'CompactTree':
+        """Roll directory sizes up to the root and drop directories that contain no files."""
+        parent, size = self.parent, self.size
+        keep = set(self._filled)
+        for d in reversed(self.dirs):
+            if d and d in keep:
+                size[parent[d]] += size[d]
+                keep.add(parent[d])
+        if len(keep | {0}) == len(self.dirs):
+            return self
+        out = CompactTree.__new__(CompactTree)
+        out.names, out._name_ids, out.exts, out._ext_ids = self.names, self._name_ids, self.exts, self._ext_ids
+        out.parent, out.name, out.size, out.ext, out.dirs = array('i'), array('i'), array('q'), array('i'), array('i')
+        out._filled, out.extra = set(), {}
+        remap = array('i', bytes(4 * len(self)))
+        for i in range(len(self)):
+            e = self.ext[i]
+            if e >= 0 or i in keep or not i:
+                remap[i] = len(out.parent)
+                if e < 0:
+                    out.dirs.append(remap[i])
+                out.parent.append(remap[parent[i]] if i else -1)
+                out.name.append(self.name[i])
+                out.size.append(size[i])
+                out.ext.append(e)
+        return out
+
+    def to_dict(self) -> dict:
+        """Nested {"name", "children", "size"} / {"name", "size", "ext"} form."""
+        nodes = []
+        for i in range(len(self)):
+            name = self.names[self.name[i]]
+            if self.ext[i] < 0:
+                node = {"name": name, "children": [], "size": self.size[i]}
+            else:
+                node = {"name": name, "size": self.size[i], "ext": self.exts[self.ext[i]]}
+            nodes.append(node)
+            if i:
+                nodes[self.parent[i]]["children"].append(node)
+        return nodes[0]
+
+    def paths(self, root: str) -> list:
+        """Path of every node joined onto root ('' for paths relative to the scan root)."""
+        paths, names, name, parent = [root], self.names, self.name, self.parent
+        for i in range(1, len(self)):
+            paths.append(os.path.join(paths[parent[i]], names[name[i]]))
+        return paths
+
+    def children_index(self):
+        """CSR child lists: children of i are kids[start[i]:start[i + 1]], in scan order."""
+        n = len(self)
+        start = array('i', bytes(4 * (n + 1)))
+        for i in range(1, n):
+            start[self.parent[i] + 1] += 1
+        for i in range(n):
+            start[i + 1] += start[i]
+        fill, kids = array('i', start), array('i', bytes(4 * n))
+        for i in range(1, n):
+            p = self.parent[i]
+            kids[fill[p]] = i
+            fill[p] += 1
+        return start, kids
+
+    def serialize(self, nodes=None, links=None) -> dict:
+        """Little-endian typed arrays as base64 plus a '/'-joined name table. With nodes,
+        pack just those (parents first); links maps a node to the chunk holding its children."""
+        if nodes is None:
+            packed = {"parent": _b64(self.parent), "name": _b64(self.name), "size": _b64(array('d', self.size)),
+                      "ext": _b64(self.ext), "names": '/'.join(self.names), "exts": self.exts}
+            packed.update((key, _b64(array('d', values))) for key, values in self.extra.items())
+            return packed
+        local = {g: i for i, g in enumerate(nodes)}
+        name_ids, names = {}, []
+        parent, name, size, ext, link = array('i'), array('i'), array('d'), array('i'), array('i')
+        for i, g in enumerate(nodes):
+            parent.append(local[self.parent[g]] if i else -1)
+            label = self.names[self.name[g]]
+            name_id = name_ids.setdefault(label, len(name_ids))
+            if name_id == len(names):
+                names.append(label)
+            name.append(name_id)
+            size.append(self.size[g])
+            ext.append(self.ext[g])
+            link.append(links.get(g, -1))
+        packed = {"parent": _b64(parent), "name": _b64(name), "size": _b64(size), "ext": _b64(ext),
+                  "link": _b64(link), "names": '/'.join(names), "exts": self.exts}
+        packed.update((key, _b64(array('d', (values[g] for g in nodes)))) for key, values in self.extra.items())
+        return packed
+
+def plan_chunks(tree: CompactTree, limit: int) -> list:
+    """Split the tree into [(nodes, links)] chunks of about limit nodes. A chunk holds its root,
+    the root's children and whole subtrees that fit; larger subtrees get chunks of their own."""
+    parent, ext = tree.parent, tree.ext
+    counts = array('i', [1]) * len(tree)
+    for i in range(len(tree) - 1, 0, -1):
+        counts[parent[i]] += counts[i]
+    start, kids = tree.children_index()
+    chunks, queue = [], deque([0])
+    while queue:
+        root = queue.popleft()
+        nodes, links = array('i', [root]), {}
+        children = kids[start[root]:start[root + 1]]
+        budget = limit - 1 - len(children)
+        inline = deque()
+        nodes.extend(children)
+        for c in children:
+            if ext[c] >= 0:
+                continue
+            if counts[c] - 1 <= budget:
+                budget -= counts[c] - 1
+                inline.append(c)
+            else:
+                links[c] = len(chunks) + len(queue) + 1
+                queue.append(c)
+        while inline:
+            d = inline.popleft()
+            below = kids[start[d]:start[d + 1]]
+            nodes.extend(below)
+            inline.extend(c for c in below if ext[c] < 0)
+        chunks.append((nodes, links))
+    return chunks
+
+class ScanCache:
+    """Directory listings from the previous run, reused when a directory's mtime is unchanged.
+
+    A directory's mtime only changes when entries are added, removed or renamed, so the
+    files of a reused listing are still stat'ed to pick up edits made in place; that skips
+    the listing, sorting and ignore matching but keeps sizes exact. With restat=False the
+    saved sizes are trusted as well, which skips one stat per file but leaves a file edited in
+    place at its old size until its directory changes. Listings are also tied to the
+    fingerprint of the ignore rules that filtered them.
+    """
+    VERSION = 3
+    RACY_NS = 2_000_000_000  # listings this close to the last scan may have missed a change
+
+    def __init__(self, path: Path, root: Path, restat: bool = True):
+        self.path = path
+        self.restat = restat
+        self.key = {"version": self.VERSION, "root": str(root), "ignore": sorted(IGNORE)}
+        self.started = time.time_ns()
+        self.old, self.new = {}, {}
+        self.hits = self.misses = 0
+        self.resized = False
+        self.cutoff = 0
+        try:
+            saved = json.loads(path.read_text(encoding='utf-8'))
+            if saved.get("key") == self.key:
+                self.old = saved["dirs"]
+                self.cutoff = saved["scanned_at"] - self.RACY_NS
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    def get(self, path: str, mtime: int):
+        """Return the saved [mtime, entries, totals, has_gitignore, rules fp] for an
+        unchanged directory, else None. The caller still checks the rules fingerprint."""
+        record = self.old.get(path)
+        if record and record[0] == mtime and mtime < self.cutoff:
+            return record
+        return None
+
+    def hit(self, path: str, record: list, resized: bool = False) -> None:
+        self.hits += 1
+        self.resized |= resized
+        self.new[path] = record
+
+    def put(self, path: str, mtime: int, entries: list, totals: dict, has_gitignore: bool, fp: str) -> None:
+        self.misses += 1
+        self.new[path] = [mtime, entries, totals, has_gitignore, fp]
+
+    def save(self) -> None:
+        if not self.misses and not self.resized and len(self.new) == len(self.old):
+            return  # every directory was reused as-is
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        tmp.write_text(json.dumps({"key": self.key, "scanned_at": self.started, "dirs": self.new},
+                                  separators=(',', ':')), encoding='utf-8')
+        os.replace(tmp, self.path)
+
+def cache_dir(root: Path) -> Path:
+    """Folder for the caches of one scan root, under $XDG_CACHE_HOME (or ~/.cache, or
+    %LOCALAPPDATA% on Windows) so that scanning a tree never writes into it."""
+    base = os.environ.get('XDG_CACHE_HOME') or (os.environ.get('LOCALAPPDATA') if os.name == 'nt' else None)
+    key = hashlib.sha1(os.fsencode(str(root))).hexdigest()[:16]
+    return Path(base or Path.home() / '.cache') / 'codebase-visualizer' / f'{root.name or "root"}-{key}'
+
+def _list_dir(path: str, found: list, prefix: str, rules: IgnoreRules, want_mtimes: bool):
+    """Filter one sorted scandir listing into entries: [name, size, ext] for files, the name
+    for directories, [name] for symlinks back to an ancestor. Returns (entries, per-extension
+    [count, bytes] totals, directory mtimes)."""
+    ignored = rules.ignored if rules.levels else None
+    entries, totals, mtimes = [], {}, {}
+    for entry in found:
+        name = entry.name
+        if name in IGNORE or name.startswith('.'):
+            continue
+        try:
+            if entry.is_file():
+                if ignored and ignored(prefix, name, False):
+                    continue
+                size = entry.stat().st_size
+                ext = _suffix(name).lower() or '(no ext)'
+                entries.append([name, size, ext])
+                total = totals.setdefault(ext, [0, 0])
+                total[0] += 1
+                total[1] += size
+            elif entry.is_dir():
+                if ignored and ignored(prefix, name, True):
+                    continue  # pruned before it is entered
+                if entry.is_symlink() and _is_ancestor(entry.path, path):
+                    entries.append([name])  # counted, never entered
+                    continue
+                if want_mtimes:
+                    mtimes[name] = entry.stat().st_mtime_ns
+                entries.append(name)
+        except OSError:
+            continue  # vanished or unreadable entry
+    return entries, totals, mtimes
+
+def _restat(path: str, entries: list):
+    """Current sizes for the files of a reused listing: (entries, totals, changed), or None
+    when a file is gone or no longer a regular file and the directory must be listed again."""
+    out, totals, changed = [], {}, False
+    for entry in entries:
+        if type(entry) is list and len(entry) == 3:
+            try:
+                st = os.stat(os.path.join(path, entry[0]))
+            except OSError:
+                return None
+            if not stat.S_ISREG(st.st_mode):
+                return None
+            if st.st_size != entry[1]:
+                entry = [entry[0], st.st_size, entry[2]]
+                changed = True
+            total = totals.setdefault(entry[2], [0, 0])
+            total[0] += 1
+            total[1] += entry[1]
+        out.append(entry)
+    return out, totals, changed
+
+def _read_dir(path: str, index: int, tree: CompactTree, stats: dict, cache=None, mtime=None,
+              prefix: str = '', rules: IgnoreRules = NO_RULES) -> list:
+    """Add one directory's entries under node index; return stack items for subdirectories.
+    prefix is the directory's path relative to the scan root, ending in '/' below the root."""
+    record = cache.get(path, mtime) if cache else None
+    if record is not None:
+        here = rules.enter(path, prefix) if record[3] and rules.gitignore else rules
+        if here.fp != record[4]:
+            fresh = None
+        elif cache.restat:
+            fresh = _restat(path, record[1])
+        else:
+            fresh = record[1], record[2], False
+        if fresh is not None:
+            entries, totals, changed = fresh
+            if changed:
+                record = [record[0], entries, totals, record[3], record[4]]
+            cache.hit(path, record, changed)
+            mtimes = None
+        else:
+            record = None
+    if record is None:
+        try:
+            with os.scandir(path) as it:
+                found = sorted(it, key=_sort_key)
+        except PermissionError:
+            return []
+        has_gitignore = any(e.name == '.gitignore' for e in found)
+        here = rules.enter(path, prefix) if has_gitignore and rules.gitignore else rules
+        entries, totals, mtimes = _list_dir(path, found, prefix, here, cache is not None)
+        if cache:
+            cache.put(path, mtime, entries, totals, has_gitignore, here.fp)
+    for ext, (count, size) in totals.items():
+        stats["files"] += count
+        stats["extensions"][ext] += count
+        stats["ext_sizes"][ext] += size
+    add = tree.add
+    subdirs = []
+    for entry in entries:
+        if type(entry) is str:
+            stats["dirs"] += 1
+            sub = os.path.join(path, entry)
+            sub_mtime = None
+            if cache:
+                if mtimes is not None:
+                    sub_mtime = mtimes[entry]
+                else:
+                    try:
+                        sub_mtime = os.stat(sub).st_mtime_ns
+                    except OSError:
+                        continue
+            subdirs.append((sub, add(index, entry), sub_mtime, f'{prefix}{entry}/', here))
+        elif len(entry) == 1:
+            stats["dirs"] += 1
+        else:
+            add(index, *entry)
+    return subdirs
 
-def scan(path: Path, stats: dict) -> dict:
-    result = {"name": path.name, "children": [], "size": 0}
-    try:
-        for item in sorted(path.iterdir()):
-            if item.name in IGNORE or item.name.startswith('.'):
+def _walk(path: str, index: int, tree: CompactTree, stats: dict, cache=None, mtime=None,
+          prefix: str = '', rules: IgnoreRules = NO_RULES) -> None:
+    """Depth-first walk with an explicit stack."""
+    stack = [(path, index, mtime, prefix, rules)]
+    while stack:
+        path, index, mtime, prefix, rules = stack.pop()
+        stack.extend(reversed(_read_dir(path, index, tree, stats, cache, mtime, prefix, rules)))
+
+def scan_tree(path: Path, stats: dict, workers: int = 1, cache: ScanCache = None,
+              rules: IgnoreRules = NO_RULES) -> CompactTree:
+    tree = CompactTree(path.name)
+    mtime = path.stat().st_mtime_ns if cache else None
+    if workers <= 1:
+        _walk(str(path), 0, tree, stats, cache, mtime, '', rules)
+        return tree.finalize()
+    # Walk each top-level subtree on its own thread; helps most on network filesystems.
+    subdirs = _read_dir(str(path), 0, tree, stats, cache, mtime, '', rules)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        jobs = []
+        for sub, index, sub_mtime, sub_prefix, sub_rules in subdirs:
+            local, subtree = new_stats(), CompactTree()
+            jobs.append((pool.submit(_walk, sub, 0, subtree, local, cache, sub_mtime, sub_prefix, sub_rules),
+                         index, subtree, local))
+        for job, index, subtree, local in jobs:
+            job.result()
+            tree.graft(index, subtree)
+            stats["files"] += local["files"]
+            stats["dirs"] += local["dirs"]
+            stats["extensions"].update(local["extensions"])
+            stats["ext_sizes"].update(local["ext_sizes"])
+    return tree.finalize()
+
+def scan(path: Path, stats: dict, workers: int = 1, cache: ScanCache = None,
+         rules: IgnoreRules = NO_RULES) -> dict:
+    return scan_tree(path, stats, workers, cache, rules).to_dict()
+
+class _LiveDir:
+    __slots__ = ('path', 'prefix', 'parent', 'inherited', 'rules', 'files', 'subdirs', 'loops', 'size', 'count')
+
+class LiveTree:
+    """Directory listings kept in memory for --watch. Every directory has a stable id that
+    doubles as its chunk id in the page; a changed directory is re-listed on its own and the
+    size change is carried up to the root. size and count cover the whole subtree."""
+
+    def __init__(self, root: Path, rules: IgnoreRules, watcher):
+        self.name = root.name
+        self.watcher = watcher
+        self.dirs = {}
+        self.next_id = 0
+        self.stats = new_stats()
+        self.lock = threading.Lock()  # held while the tree changes and while it is serialized
+        self._load(str(root), '', -1, rules)
+
+    def _new(self, path: str, prefix: str, parent: int, inherited: IgnoreRules) -> int:
+        did = self.next_id
+        self.next_id += 1
+        d = self.dirs[did] = _LiveDir()
+        d.path, d.prefix, d.parent, d.inherited, d.rules = path, prefix, parent, inherited, inherited
+        d.files, d.subdirs, d.loops = {}, {}, []
+        d.size = d.count = 0
+        if parent >= 0:
+            self.stats["dirs"] += 1
+        self.watcher.add(did, path)  # before listing, so no change can slip in between
+        return did
+
+    def _list(self, d: _LiveDir) -> list:
+        try:
+            with os.scandir(d.path) as it:
+                found = sorted(it, key=_sort_key)
+        except OSError:
+            found = []
+        has_gitignore = any(e.name == '.gitignore' for e in found)
+        d.rules = d.inherited.enter(d.path, d.prefix) if has_gitignore and d.inherited.gitignore else d.inherited
+        return _list_dir(d.path, found, d.prefix, d.rules, False)[0]
+
+    def _add_file(self, d: _LiveDir, name: str, size: int, ext: str) -> None:
+        d.files[name] = (size, ext)
+        d.size += size
+        d.count += 1
+        stats = self.stats
+        stats["files"] += 1
+        stats["extensions"][ext] += 1
+        stats["ext_sizes"][ext] += size
+
+    def _drop_file(self, d: _LiveDir, name: str) -> None:
+        size, ext = d.files.pop(name)
+        d.size -= size
+        d.count -= 1
+        stats = self.stats
+        stats["files"] -= 1
+        stats["extensions"][ext] -= 1
+        stats["ext_sizes"][ext] -= size
+        if not stats["extensions"][ext]:
+            del stats["extensions"][ext], stats["ext_sizes"][ext]
+
+    def _load(self, path: str, prefix: str, parent: int, inherited: IgnoreRules) -> int:
+        """Add a directory and everything below it; its totals are not yet added to parent."""
+        top = self._new(path, prefix, parent, inherited)
+        stack = [top]
+        while stack:
+            did = stack.pop()
+            d = self.dirs[did]
+            for entry in self._list(d):
+                if type(entry) is str:
+                    sub = self._new(os.path.join(d.path, entry), f'{d.prefix}{entry}/', did, d.rules)
+                    d.subdirs[entry] = sub
+                    stack.append(sub)
+                elif len(entry) == 1:
+                    d.loops.append(entry[0])
+                    self.stats["dirs"] += 1
+                else:
+                    self._add_file(d, *entry)
+        # Ids from this load are consecutive and parents come first.
+        for did in range(self.next_id - 1, top, -1):
+            d = self.dirs[did]
+            p = self.dirs[d.parent]
+            p.size += d.size
+            p.count += d.count
+        return top
+
+    def _unload(self, top: int, removed: list) -> None:
+        stack = [top]
+        while stack:
+            did = stack.pop()
+            d = self.dirs.pop(did)
+            self.watcher.remove(did)
+            removed.append(did)
+            for name in list(d.files):
+                self._drop_file(d, name)
+            self.stats["dirs"] -= 1 + len(d.loops)
+            stack.extend(d.subdirs.values())
+
+    def _refresh(self, did: int, names, removed: list) -> bool:
+        """Bring one directory up to date. names is the set of files changed in place, or
+        None to re-list the directory. Returns whether its listing changed."""
+        d = self.dirs[did]
+        changed = False
+        if names is not None and '.gitignore' not in names:
+            for name in names:
+                if name not in d.files:
+                    continue  # a directory, or a file that is filtered out
+                try:
+                    size = os.stat(os.path.join(d.path, name)).st_size
+                except OSError:
+                    names = None  # gone already; the delete event may be in the next batch
+                    break
+                if size != d.files[name][0]:
+                    ext = d.files[name][1]
+                    self._drop_file(d, name)
+                    self._add_file(d, name, size, ext)
+                    changed = True
+            else:
+                return changed
+        fp = d.rules.fp
+        entries = self._list(d)
+        reload = d.rules.fp != fp  # the directory's .gitignore changed; re-filter everything below
+        files = {e[0]: e for e in entries if type(e) is list and len(e) == 3}
+        subdirs = [e for e in entries if type(e) is str]
+        loops = [e[0] for e in entries if type(e) is list and len(e) == 1]
+        for name, (size, _) in list(d.files.items()):
+            if name not in files or files[name][1] != size:
+                self._drop_file(d, name)
+                changed = True
+        for name, entry in files.items():
+            if name not in d.files:
+                self._add_file(d, *entry)
+                changed = True
+        for name, sid in list(d.subdirs.items()):
+            if reload or name not in subdirs:
+                sub = self.dirs[sid]
+                d.size -= sub.size
+                d.count -= sub.count
+                self._unload(sid, removed)
+                del d.subdirs[name]
+                changed = True
+        for name in subdirs:
+            if name not in d.subdirs:
+                sid = d.subdirs[name] = self._load(os.path.join(d.path, name), f'{d.prefix}{name}/', did, d.rules)
+                d.size += self.dirs[sid].size
+                d.count += self.dirs[sid].count
+                changed = True
+        if loops != d.loops:
+            self.stats["dirs"] += len(loops) - len(d.loops)
+            d.loops = loops
+        return changed
+
+    def apply(self, dirty: dict):
+        """Refresh the directories in dirty ({id: set of names or None}); return the diff for
+        the page, or None when nothing visible changed. Call with lock held."""
+        changed, sizes, removed = set(), {}, []
+        for did in sorted(dirty):
+            if did not in self.dirs:
+                continue  # removed with an ancestor earlier in this batch
+            d = self.dirs[did]
+            size, count = d.size, d.count
+            if self._refresh(did, dirty[did], removed):
+                changed.add(did)
+            dsize, dcount = d.size - size, d.count - count
+            if not (dsize or dcount):
                 continue
-            if item.is_file():
-                size = item.stat().st_size
-                ext = item.suffix.lower() or '(no ext)'
-                result["children"].append({"name": item.name, "size": size, "ext": ext})
-                result["size"] += size
-                stats["files"] += 1
-                stats["extensions"][ext] += 1
-                stats["ext_sizes"][ext] += size
-            elif item.is_dir():
-                stats["dirs"] += 1
-                child = scan(item, stats)
-                if child["children"]:
-                    result["children"].append(child)
-                    result["size"] += child["size"]
-    except PermissionError:
-        pass
-    return result
-
-def generate_html(data: dict, stats: dict, output: Path) -> None:
+            sizes[did] = d.size
+            child = d
+            while child.parent >= 0:
+                p = self.dirs[child.parent]
+                if dcount and (child.count == 0 or child.count == dcount):
+                    changed.add(child.parent)  # child appears or disappears, as in finalize()
+                p.size += dsize
+                p.count += dcount
+                sizes[child.parent] = p.size
+                child = p
+        gone = set(removed)
+        changed -= gone
+        if not (changed or sizes or removed):
+            return None
+        return {"changed": sorted(changed), "removed": removed,
+                "sizes": {did: size for did, size in sizes.items() if did not in gone},
+                "stats": {"files": self.stats["files"], "dirs": self.stats["dirs"],
+                          "size": self.dirs[0].size, "types": len(self.stats["extensions"])}}
+
+    def level(self, did: int):
+        """One directory as a CompactTree of its direct children plus {node: directory id}
+        links; directories with no files below them are left out, as in finalize()."""
+        d = self.dirs[did]
+        tree = CompactTree(self.name if did == 0 else os.path.basename(d.path))
+        links = {}
+        for name, sid in d.subdirs.items():
+            sub = self.dirs[sid]
+            if sub.count:
+                node = tree.add(0, name)
+                tree.size[node] = sub.size
+                links[node] = sid
+        for name, (size, ext) in d.files.items():
+            tree.add(0, name, size, ext)
+        tree.size[0] = d.size
+        return tree, links
+
+    def chunk(self, did: int):
+        """Serialized listing of directory did for the page, or None if it no longer exists."""
+        with self.lock:
+            if did not in self.dirs:
+                return None
+            tree, links = self.level(did)
+            return tree.serialize(range(len(tree)), links)
+
+    def page(self) -> str:
+        with self.lock:
+            tree, links = self.level(0)
+            return render_html(tree, self.stats, tree.serialize(range(len(tree)), links),
+                               'codebase-map-data', live=True)
+
+def generate_html(tree: CompactTree, stats: dict, output: Path, chunk_size: int = None,
+                  line_stats: dict = None, duplicates: dict = None, churn: dict = None) -> None:
+    """Write the viewer. With chunk_size, only the top of the tree is inlined and the rest is
+    written as <output>-data/chunk-N.js files that the page loads when a folder is opened.
+    line_stats is the per-extension result of line_counts.count_lines(), duplicates the
+    result of duplicates.find_duplicates() and churn that of churn.churn_overlay()."""
+    data_dir = output.with_name(output.stem + '-data')
+    if chunk_size:
+        chunks = plan_chunks(tree, chunk_size)
+        data_dir.mkdir(exist_ok=True)
+        for old in data_dir.glob('chunk-*.js'):
+            old.unlink()
+        for cid, (nodes, links) in enumerate(chunks[1:], 1):
+            (data_dir / f'chunk-{cid}.js').write_text(
+                f'codebaseMapChunk({cid}, {json.dumps(tree.serialize(nodes, links))});\n', encoding='utf-8')
+        first = tree.serialize(*chunks[0])
+    else:
+        first = tree.serialize()
+    output.write_text(render_html(tree, stats, first, data_dir.name, line_stats, duplicates, churn),
+                      encoding='utf-8')
+
+def render_html(tree: CompactTree, stats: dict, first: dict, data_dir: str, line_stats: dict = None,
+                duplicates: dict = None, churn: dict = None, live: bool = False) -> str:
+    """The viewer page with the serialized chunk 0 inlined. A live page follows the /events
+    stream of the --watch server and re-fetches folders that changed."""
     ext_sizes = stats["ext_sizes"]
     total_size = sum(ext_sizes.values()) or 1
     sorted_exts = sorted(ext_sizes.items(), key=lambda x: -x[1])[:8]
-    colors = {
-        '.js': '#f7df1e', '.ts': '#3178c6', '.py': '#3776ab', '.go': '#00add8',
-        '.rs': '#dea584', '.rb': '#cc342d', '.css': '#264de4', '.html': '#e34c26',
-        '.json': '#6b7280', '.md': '#083fa1', '.yaml': '#cb171e', '.yml': '#cb171e',
-        '.mdx': '#083fa1', '.tsx': '#3178c6', '.jsx': '#61dafb', '.sh': '#4eaa25',
-    }
+    colors = COLORS
     lang_bars = "".join(
         f'<div class="bar-row"><span class="bar-label">{ext}</span>'
         f'<div class="bar" style="width:{(size/total_size)*100}%;background:{colors.get(ext,"#6b7280")}"></div>'
@@ -53,8 +693,50 @@ def generate_html(data: dict, stats: dict, output: Path) -> None:
         if b < 1024: return f"{b} B"
         if b < 1048576: return f"{b/1024:.1f} KB"
         return f"{b/1048576:.1f} MB"
+    line_section = ""
+    if line_stats:
+        total_lines = sum(t["lines"] for t in line_stats.values()) or 1
+        by_lines = sorted((item for item in line_stats.items() if item[1]["lines"]), key=lambda x: -x[1]["lines"])[:8]
+        line_bars = "".join(
+            f'<div class="bar-row" title="{t["blank"]/t["lines"]*100:.0f}% blank · {t["comment"]/t["lines"]*100:.0f}% comments · '
+            f'{t["text"]:,} text / {t["binary"]:,} binary files"><span class="bar-label">{ext}</span>'
+            f'<div class="bar" style="width:{(t["lines"]/total_lines)*100}%;background:{colors.get(ext,"#6b7280")}"></div>'
+            f'<span class="bar-pct">{t["lines"]:,}</span></div>'
+            for ext, t in by_lines
+        )
+        binaries = sorted((item for item in line_stats.items() if item[1]["binary"]), key=lambda x: -x[1]["binary"])[:8]
+        binary_rows = "".join(
+            f'<div class="stat"><span>{ext}</span><span class="stat-value">{t["binary"]:,}</span></div>'
+            for ext, t in binaries
+        )
+        line_section = (f'<div class="stat"><span>Lines of code</span><span class="stat-value">{int(tree.extra["lines"][0]):,}</span></div>'
+                        f'<h2>By lines of code</h2>{line_bars}')
+        if binary_rows:
+            line_section += f'<h2>Binary files</h2>{binary_rows}'
+    churn_section = ""
+    if churn:
+        hot_rows = "".join(
+            f'<div class="stat" title="{html.escape(h["path"])} · {h["churn"]:,} lines changed · {fmt(h["size"])}">'
+            f'<span class="hot-path">{html.escape(os.path.basename(h["path"]))}</span>'
+            f'<span class="stat-value">{h["commits"]:,}</span></div>'
+            for h in churn["hotspots"]
+        )
+        churn_section = (f'<h2>Hotspots</h2>'
+                         f'<div class="stat"><span>Commits</span><span class="stat-value">{churn["commits"]:,}</span></div>'
+                         f'{hot_rows}')
+    dup_section = ""
+    if duplicates is not None:
+        groups = duplicates["groups"]
+        dup_rows = "".join(
+            f'<details class="dup"><summary>{len(g["paths"])} × {fmt(g["size"])}<span class="size">{fmt(g["wasted"])}</span></summary>'
+            + "".join(f'<div class="dup-path">{html.escape(p)}</div>' for p in g["paths"]) + '</details>'
+            for g in groups[:DUP_GROUPS]
+        )
+        dup_section = (f'<h2>Duplicate files</h2>'
+                       f'<div class="stat"><span>Wasted</span><span class="stat-value">{fmt(duplicates["wasted"])}</span></div>'
+                       f'<div class="stat"><span>Groups</span><span class="stat-value">{len(groups):,}</span></div>{dup_rows}')
 
-    html = f'''<!DOCTYPE html>
+    return f'''<!DOCTYPE html>
 <html><head>
   <meta charset="utf-8"><title>Codebase Explorer</title>
   <style>
@@ -79,53 +761,254 @@ def generate_html(data: dict, stats: dict, output: Path) -> None:
     .file:hover {{ background: #2d2d44; }}
     .size {{ color: #888; margin-left: auto; font-size: 12px; }}
     .dot {{ width: 8px; height: 8px; border-radius: 50%; margin-right: 8px; }}
+    .hot-path {{ overflow: hidden; text-overflow: ellipsis; white-space: nowrap; margin-right: 8px; }}
+    .dup summary {{ display: flex; font-size: 12px; }}
+    .dup-path {{ font-size: 11px; color: #aaa; padding: 2px 0 2px 16px; word-break: break-all; }}
+    .virtual {{ overflow-y: auto; }}
+    .virtual > div {{ position: relative; }}
+    .virtual .file {{ position: absolute; left: 0; right: 0; height: 28px; box-sizing: border-box; }}
   </style>
 </head><body>
   <div class="container">
     <div class="sidebar">
       <h1>📊 Summary</h1>
-      <div class="stat"><span>Files</span><span class="stat-value">{stats["files"]:,}</span></div>
-      <div class="stat"><span>Directories</span><span class="stat-value">{stats["dirs"]:,}</span></div>
-      <div class="stat"><span>Total size</span><span class="stat-value">{fmt(data["size"])}</span></div>
-      <div class="stat"><span>File types</span><span class="stat-value">{len(stats["extensions"])}</span></div>
+      <div class="stat"><span>Files</span><span class="stat-value" id="stat-files">{stats["files"]:,}</span></div>
+      <div class="stat"><span>Directories</span><span class="stat-value" id="stat-dirs">{stats["dirs"]:,}</span></div>
+      <div class="stat"><span>Total size</span><span class="stat-value" id="stat-size">{fmt(tree.size[0])}</span></div>
+      <div class="stat"><span>File types</span><span class="stat-value" id="stat-types">{len(stats["extensions"])}</span></div>
       <h2>By file type</h2>
       {lang_bars}
+      {line_section}
+      {churn_section}
+      {dup_section}
     </div>
     <div class="main">
-      <h1>📁 {data["name"]}</h1>
+      <h1>📁 {tree.names[tree.name[0]]}</h1>
       <ul class="tree" id="root"></ul>
     </div>
   </div>
   <script>
-    const data = {json.dumps(data)};
+    const dataDir = {json.dumps(data_dir)}, live = {json.dumps(live)}, churnMax = {churn["max"] if churn else 0};
     const colors = {json.dumps(colors)};
+    const ROW = 28, VIEW = 20, VIRTUAL_MIN = 200;  // row px, visible rows, files before virtualizing
+    const collator = new Intl.Collator();
+    // Rendered folders by chunk id, open folder ids, and the node holding each chunk's root.
+    const views = {{ 0: {{ ul: document.getElementById('root'), filled: true }} }}, openDirs = new Set(), where = {{}};
     function fmt(b) {{ if (b < 1024) return b + ' B'; if (b < 1048576) return (b/1024).toFixed(1) + ' KB'; return (b/1048576).toFixed(1) + ' MB'; }}
-    function render(node, parent) {{
-      if (node.children) {{
-        const det = document.createElement('details');
-        det.open = parent === document.getElementById('root');
-        det.innerHTML = `<summary><span class="folder">📁 ${{node.name}}</span><span class="size">${{fmt(node.size)}}</span></summary>`;
-        const ul = document.createElement('ul'); ul.className = 'tree';
-        node.children.sort((a,b) => (b.children?1:0)-(a.children?1:0) || a.name.localeCompare(b.name));
-        node.children.forEach(c => render(c, ul));
-        det.appendChild(ul);
-        const li = document.createElement('li'); li.appendChild(det); parent.appendChild(li);
-      }} else {{
-        const li = document.createElement('li'); li.className = 'file';
-        li.innerHTML = `<span class="dot" style="background:${{colors[node.ext]||'#6b7280'}}"></span>${{node.name}}<span class="size">${{fmt(node.size)}}</span>`;
-        parent.appendChild(li);
+    function decode(b64, Type) {{ const bin = atob(b64); const bytes = new Uint8Array(bin.length); for (let i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i); return new Type(bytes.buffer); }}
+    function unpack(packed) {{
+      const c = {{ parent: decode(packed.parent, Int32Array), nameId: decode(packed.name, Int32Array),
+                  size: decode(packed.size, Float64Array), extId: decode(packed.ext, Int32Array),
+                  names: packed.names.split('/'), exts: packed.exts }};
+      const n = c.parent.length;
+      c.link = packed.link ? decode(packed.link, Int32Array) : new Int32Array(n).fill(-1);
+      if (packed.link) for (let i = 1; i < n; i++) if (c.link[i] >= 0) where[c.link[i]] = [c, i];
+      if (packed.lines) {{
+        c.lines = decode(packed.lines, Float64Array); c.blank = decode(packed.blank, Float64Array);
+        c.comment = decode(packed.comment, Float64Array);
+      }}
+      if (packed.commits) {{ c.commits = decode(packed.commits, Float64Array); c.churn = decode(packed.churn, Float64Array); }}
+      // Children of node i are kids[start[i]] .. kids[start[i + 1] - 1], in scan order.
+      c.start = new Int32Array(n + 1); c.kids = new Int32Array(n);
+      for (let i = 1; i < n; i++) c.start[c.parent[i] + 1]++;
+      for (let i = 0; i < n; i++) c.start[i + 1] += c.start[i];
+      const fill = c.start.slice(0, n);
+      for (let i = 1; i < n; i++) c.kids[fill[c.parent[i]]++] = i;
+      return c;
+    }}
+    const chunks = {{ 0: unpack({json.dumps(first)}) }}, pending = {{}};
+    window.codebaseMapChunk = (id, packed) => {{ chunks[id] = unpack(packed); (pending[id] || []).forEach(f => f()); delete pending[id]; }};
+    function withChunk(id, fn) {{
+      if (chunks[id]) return fn(chunks[id]);
+      if (!pending[id]) {{
+        pending[id] = [];
+        const script = document.createElement('script'); script.src = `${{dataDir}}/chunk-${{id}}.js`;
+        document.head.appendChild(script);
+      }}
+      pending[id].push(() => fn(chunks[id]));
+    }}
+    const isDir = (c, i) => c.extId[i] < 0;
+    const label = (c, i) => c.names[c.nameId[i]];
+    function lineInfo(c, i) {{
+      if (!c.lines) return '';
+      const n = c.lines[i];
+      if (n < 0) return 'binary';
+      const pct = v => n ? Math.round(v / n * 100) : 0;
+      return `${{n.toLocaleString()}} lines · ${{pct(c.blank[i])}}% blank · ${{pct(c.comment[i])}}% comments`;
+    }}
+    function churnInfo(c, i) {{
+      if (!c.commits) return '';
+      return `${{c.commits[i].toLocaleString()}} commits · ${{c.churn[i].toLocaleString()}} lines changed`;
+    }}
+    const info = (c, i) => [lineInfo(c, i), churnInfo(c, i)].filter(Boolean).join('\\n');
+    // Files tint from clear to red with their commit count, on a log scale.
+    const heat = (c, i) => `rgba(239, 68, 68, ${{(0.5 * Math.log1p(c.commits[i]) / Math.log1p(churnMax)).toFixed(2)}})`;
+    function fileRow(c, i, tag) {{
+      const row = document.createElement(tag); row.className = 'file'; row.title = info(c, i);
+      if (c.commits && c.commits[i]) row.style.background = heat(c, i);
+      row.innerHTML = `<span class="dot" style="background:${{colors[c.exts[c.extId[i]]]||'#6b7280'}}"></span>${{label(c, i)}}<span class="size">${{fmt(c.size[i])}}</span>`;
+      return row;
+    }}
+    // Only the visible rows of a long file list exist in the DOM.
+    function virtualList(c, files, parent) {{
+      const box = document.createElement('li'); box.className = 'virtual';
+      box.style.height = Math.min(files.length, VIEW) * ROW + 'px';
+      const inner = document.createElement('div'); inner.style.height = files.length * ROW + 'px';
+      box.appendChild(inner); parent.appendChild(box);
+      let drawn = -1;
+      function draw() {{
+        const first = Math.max(0, Math.floor(box.scrollTop / ROW) - VIEW);
+        if (first === drawn) return;
+        drawn = first; inner.textContent = '';
+        for (let k = first; k < Math.min(files.length, first + 3 * VIEW); k++) {{
+          const row = fileRow(c, files[k], 'div'); row.style.top = k * ROW + 'px'; inner.appendChild(row);
+        }}
+      }}
+      box.addEventListener('scroll', () => requestAnimationFrame(draw));
+      draw();
+    }}
+    function fill(c, i, ul) {{
+      const list = Array.from(c.kids.subarray(c.start[i], c.start[i + 1]));
+      list.sort((a,b) => (isDir(c, b)?1:0)-(isDir(c, a)?1:0) || collator.compare(label(c, a), label(c, b)));
+      const files = list.filter(k => !isDir(c, k));
+      list.filter(k => isDir(c, k)).forEach(k => render(c, k, ul));
+      if (files.length >= VIRTUAL_MIN) virtualList(c, files, ul);
+      else files.forEach(k => ul.appendChild(fileRow(c, k, 'li')));
+    }}
+    // Folder contents are built the first time the folder is opened.
+    function render(c, i, parent) {{
+      if (!isDir(c, i)) return parent.appendChild(fileRow(c, i, 'li'));
+      const det = document.createElement('details'), id = c.link[i];
+      det.innerHTML = `<summary><span class="folder">📁 ${{label(c, i)}}</span><span class="size">${{fmt(c.size[i])}}</span></summary>`;
+      det.firstChild.title = info(c, i);
+      const ul = document.createElement('ul'); ul.className = 'tree';
+      det.appendChild(ul);
+      const view = {{ ul, size: det.firstChild.lastChild, filled: false }};
+      if (id >= 0) views[id] = view;
+      det.addEventListener('toggle', () => {{
+        if (id >= 0) det.open ? openDirs.add(id) : openDirs.delete(id);
+        if (!det.open || view.filled) return;
+        view.filled = true;
+        if (id < 0) fill(c, i, ul);
+        else withChunk(id, chunk => fill(chunk, 0, ul));
+      }});
+      // Top-level folders start open unless their contents live in a separate chunk file;
+      // folders re-rendered after a live update keep their open state.
+      det.open = (parent === document.getElementById('root') && id < 0) || openDirs.has(id);
+      const li = document.createElement('li'); li.appendChild(det); parent.appendChild(li);
+    }}
+    fill(chunks[0], 0, document.getElementById('root'));
+    if (live) {{
+      function refill(id) {{
+        const view = views[id];
+        if (view && view.filled) withChunk(id, chunk => {{ view.ul.textContent = ''; fill(chunk, 0, view.ul); }});
       }}
+      // Diffs from --watch: new folder sizes, folders whose listing changed, and removed folders.
+      new EventSource('/events').onmessage = e => {{
+        const diff = JSON.parse(e.data);
+        diff.removed.forEach(id => {{ delete chunks[id]; delete views[id]; delete where[id]; openDirs.delete(id); }});
+        for (const [id, size] of Object.entries(diff.sizes)) {{
+          if (where[id]) where[id][0].size[where[id][1]] = size;
+          if (views[id] && views[id].size) views[id].size.textContent = fmt(size);
+        }}
+        diff.changed.forEach(id => {{ delete chunks[id]; refill(id); }});
+        document.getElementById('stat-files').textContent = diff.stats.files.toLocaleString();
+        document.getElementById('stat-dirs').textContent = diff.stats.dirs.toLocaleString();
+        document.getElementById('stat-size').textContent = fmt(diff.stats.size);
+        document.getElementById('stat-types').textContent = diff.stats.types;
+      }};
     }}
-    data.children.forEach(c => render(c, document.getElementById('root')));
   </script>
 </body></html>'''
-    output.write_text(html, encoding='utf-8')
 
 if __name__ == '__main__':
-    target = Path(sys.argv[1] if len(sys.argv) > 1 else '.').resolve()
-    stats = {"files": 0, "dirs": 0, "extensions": Counter(), "ext_sizes": Counter()}
-    data = scan(target, stats)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path', nargs='?', default='.', help='directory to scan (default: .)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='threads for scanning top-level subtrees in parallel (default: 1)')
+    parser.add_argument('--cache', default=None,
+                        help='snapshot reused by the next run (default: scan.json in the user cache '
+                             'folder for this root, e.g. ~/.cache/codebase-visualizer/<name>-<hash>/)')
+    parser.add_argument('--no-cache', action='store_true', help='always rescan the whole tree and write no caches')
+    parser.add_argument('--no-restat', action='store_true',
+                        help='trust cached file sizes in unchanged directories (faster warm runs; files '
+                             'edited in place keep their old size until their directory changes)')
+    parser.add_argument('--ignore-file', action='append', default=[], metavar='PATH',
+                        help='extra gitignore-style file applied from the scan root (repeatable)')
+    parser.add_argument('--no-gitignore', action='store_true',
+                        help='do not read .gitignore files or .git/info/exclude')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='split tree data into codebase-map-data/ files of about this many nodes, '
+                             'loaded when folders are opened (default: one self-contained file)')
+    parser.add_argument('--lines', action='store_true',
+                        help='count lines, blank lines and comments per file and language')
+    parser.add_argument('--line-jobs', type=int, default=None,
+                        help='processes for --lines (default: CPU count)')
+    parser.add_argument('--line-cache', default=None,
+                        help='per-file line counts reused by the next --lines run (default: lines.json in the cache folder)')
+    parser.add_argument('--churn', action='store_true',
+                        help='overlay git history: commits and lines changed per file and folder')
+    parser.add_argument('--churn-cache', default=None,
+                        help='history counts reused and extended by the next --churn run '
+                             '(default: churn.json in the cache folder)')
+    parser.add_argument('--duplicates', action='store_true',
+                        help='find duplicate files and list the groups wasting the most space')
+    parser.add_argument('--hash-threads', type=int, default=8,
+                        help='threads reading files for --duplicates (default: 8)')
+    parser.add_argument('--treemap', action='store_true',
+                        help='also write codebase-treemap.svg, a squarified treemap of file sizes')
+    parser.add_argument('--treemap-size', default='1600x1000', metavar='WxH',
+                        help='treemap size in pixels (default: 1600x1000)')
+    parser.add_argument('--treemap-min-px', type=float, default=6,
+                        help='merge treemap boxes smaller than this many pixels on a side (default: 6)')
+    parser.add_argument('--watch', action='store_true',
+                        help='serve the map on localhost and update it as files change')
+    parser.add_argument('--port', type=int, default=8000, help='port for --watch (default: 8000, 0 picks one)')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help='seconds between checks when --watch cannot use inotify (default: 1.0)')
+    args = parser.parse_args()
+    target = Path(args.path).resolve()
+    if args.watch:
+        if args.lines or args.duplicates or args.churn:
+            parser.error('--lines, --duplicates and --churn are not supported with --watch')
+        rules = IgnoreRules.for_root(target, args.ignore_file, not args.no_gitignore)
+        serve(LiveTree(target, rules, make_watcher(args.poll_interval)), args.port)
+        sys.exit(0)
+    stats = new_stats()
+    caches = None if args.no_cache else cache_dir(target)
+    if caches:
+        caches.mkdir(parents=True, exist_ok=True)
+    cache = None if args.no_cache else ScanCache(Path(args.cache or caches / 'scan.json'), target, not args.no_restat)
+    rules = IgnoreRules.for_root(target, args.ignore_file, not args.no_gitignore)
+    tree = scan_tree(target, stats, args.workers, cache, rules)
+    if cache:
+        cache.save()
+        print(f'Scan cache: {cache.hits:,} directories reused, {cache.misses:,} rescanned')
+    line_stats = None
+    if args.lines:
+        line_cache = None if args.no_cache else Path(args.line_cache or caches / 'lines.json')
+        line_stats = count_lines(tree, target, line_cache, args.line_jobs)
+    churn = None
+    if args.churn:
+        churn = churn_overlay(tree, target, None if args.no_cache else Path(args.churn_cache or caches / 'churn.json'))
+        if churn is None:
+            print(f'--churn: no history for {target} (not in a git repository with commits, or git log failed)', file=sys.stderr)
+        else:
+            print(f'Git history: {churn["commits"]:,} commits touch this tree ({churn["parsed"]:,} read from git log)')
+    duplicates = None
+    if args.duplicates:
+        duplicates = find_duplicates(tree, str(target), args.hash_threads)
+        print(f'Duplicates: {len(duplicates["groups"]):,} groups, {duplicates["wasted"]:,} bytes wasted '
+              f'({duplicates["compared"]:,} same-size files compared, {duplicates["hashed"]:,} hashed in full)')
+    if args.treemap:
+        try:
+            width, height = (int(v) for v in args.treemap_size.lower().split('x'))
+        except ValueError:
+            parser.error('--treemap-size must look like 1600x1000')
+        svg = Path('codebase-treemap.svg')
+        svg.write_text(render_svg(tree, width, height, args.treemap_min_px, COLORS), encoding='utf-8')
+        print(f'Generated {svg.absolute()}')
     out = Path('codebase-map.html')
-    generate_html(data, stats, out)
+    generate_html(tree, stats, out, args.chunk_size, line_stats, duplicates, churn)
     print(f'Generated {out.absolute()}')
-    webbrowser.open(f'file://{out.absolute()}')
\ No newline at end of file
+    webbrowser.open(f'file://{out.absolute()}')
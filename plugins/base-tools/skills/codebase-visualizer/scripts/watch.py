@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""Directory watching and the local HTTP server behind visualize.py --watch."""
+
+import ctypes
+import ctypes.util
+import errno
+import json
+import os
+import queue
+import re
+import select
+import struct
+import sys
+import threading
+import time
+import webbrowser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+DEBOUNCE = 0.2       # seconds to gather a burst of events before re-listing
+KEEPALIVE = 15       # seconds between SSE comments on an idle stream
+
+IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE = 0x2, 0x4, 0x8
+IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x40, 0x80, 0x100, 0x200
+IN_Q_OVERFLOW, IN_IGNORED, IN_ONLYDIR, IN_ISDIR = 0x4000, 0x8000, 0x01000000, 0x40000000
+_EVENT = struct.Struct('iIII')
+
+def _mtime(path: str):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _stamp(path: str) -> tuple:
+    # An edited .gitignore leaves the directory mtime alone but changes what is listed.
+    return _mtime(path), _mtime(os.path.join(path, '.gitignore'))
+
+class PollWatcher:
+    """Compares directory (and .gitignore) mtimes every interval seconds. It sees entries
+    being added, removed or renamed but not files edited in place."""
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self.paths = {}  # key -> [path, stamp]
+
+    def add(self, key, path: str) -> None:
+        self.paths[key] = [path, _stamp(path)]
+
+    def remove(self, key) -> None:
+        self.paths.pop(key, None)
+
+    def check(self) -> list:
+        out = []
+        for key, item in list(self.paths.items()):
+            stamp = _stamp(item[0])
+            if stamp != item[1]:
+                item[1] = stamp
+                out.append((key, None))
+        return out
+
+    def events(self, timeout: float = None) -> list:
+        """Block up to timeout (None: until something changes) and return [(key, name)]."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            out = self.check()
+            if out:
+                return out
+            wait = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+            if wait <= 0:
+                return out
+            time.sleep(wait)
+
+    def close(self) -> None:
+        pass
+
+class InotifyWatcher:
+    """Directory watches through Linux inotify, called with ctypes. Directories beyond
+    fs.inotify.max_user_watches are handed to a PollWatcher."""
+    MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+    TOUCH = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE  # content or metadata of an existing entry
+
+    def __init__(self, interval: float = 1.0):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._init, self._add, self._rm = libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch
+        self._add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = self._init(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.keys, self.wds = {}, {}  # wd -> key, key -> wd
+        self.polled = PollWatcher(interval)
+
+    def add(self, key, path: str) -> None:
+        wd = self._add(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            if ctypes.get_errno() == errno.ENOSPC:
+                if not self.polled.paths:
+                    print('Warning: inotify watch limit reached; polling the remaining directories',
+                          file=sys.stderr)
+                self.polled.add(key, path)
+            return  # otherwise the directory is already gone or unreadable
+        # A directory moved within the tree keeps its wd; the newest key owns it.
+        self.wds.pop(self.keys.get(wd), None)
+        self.keys[wd] = key
+        self.wds[key] = wd
+
+    def remove(self, key) -> None:
+        self.polled.remove(key)
+        wd = self.wds.pop(key, None)
+        if wd is not None and self.keys.get(wd) == key:
+            del self.keys[wd]
+            self._rm(self.fd, wd)
+
+    def events(self, timeout: float = None) -> list:
+        """Block up to timeout (None: until something changes) and return [(key, name)]:
+        name is the file changed in place, or None when the directory must be re-listed.
+        (None, None) means events were lost and everything must be re-listed."""
+        if self.polled.paths:
+            timeout = self.polled.interval if timeout is None else min(timeout, self.polled.interval)
+        out = []
+        if select.select([self.fd], [], [], timeout)[0]:
+            while True:
+                try:
+                    buf = os.read(self.fd, 1 << 16)
+                except BlockingIOError:
+                    break
+                offset = 0
+                while offset < len(buf):
+                    wd, mask, _, length = _EVENT.unpack_from(buf, offset)
+                    start = offset + _EVENT.size
+                    name = os.fsdecode(buf[start:start + length].rstrip(b'\0'))
+                    offset = start + length
+                    if mask & IN_Q_OVERFLOW:
+                        out.append((None, None))
+                    elif mask & IN_IGNORED:
+                        key = self.keys.pop(wd, None)  # watched directory was deleted
+                        if key is not None and self.wds.get(key) == wd:
+                            del self.wds[key]
+                    elif wd in self.keys:
+                        touched = mask & self.TOUCH and not mask & IN_ISDIR
+                        out.append((self.keys[wd], name if touched else None))
+        if self.polled.paths:
+            out.extend(self.polled.check())
+        return out
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+def make_watcher(interval: float = 1.0):
+    """inotify on Linux, mtime polling elsewhere or when inotify is unavailable."""
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(interval)
+        except (OSError, AttributeError):
+            pass
+    return PollWatcher(interval)
+
+class LiveServer(ThreadingHTTPServer):
+    """Serves the page, per-directory data files and a server-sent event stream of diffs."""
+    daemon_threads = True
+
+    def __init__(self, address, live):
+        super().__init__(address, _Handler)
+        self.live = live
+        self.clients = set()
+        self.clients_lock = threading.Lock()
+
+    def publish(self, message: dict) -> None:
+        data = json.dumps(message, separators=(',', ':'))
+        with self.clients_lock:
+            for client in self.clients:
+                client.put(data)
+
+_CHUNK = re.compile(r'/codebase-map-data/chunk-(\d+)\.js')
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path in ('/', '/index.html'):
+            return self._send('text/html; charset=utf-8', self.server.live.page())
+        if path == '/events':
+            return self._stream()
+        match = _CHUNK.fullmatch(path)
+        packed = self.server.live.chunk(int(match.group(1))) if match else None
+        if packed is None:
+            return self.send_error(404)
+        self._send('text/javascript; charset=utf-8', f'codebaseMapChunk({match.group(1)}, {json.dumps(packed)});\n')
+
+    def _send(self, content_type: str, body: str) -> None:
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'no-store')  # folder data changes under the same URL
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        client = queue.Queue()
+        with self.server.clients_lock:
+            self.server.clients.add(client)
+        try:
+            while True:
+                try:
+                    chunk = f'data: {client.get(timeout=KEEPALIVE)}\n\n'
+                except queue.Empty:
+                    chunk = ': keep-alive\n\n'
+                self.wfile.write(chunk.encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self.server.clients_lock:
+                self.server.clients.discard(client)
+
+    def log_message(self, format, *args):
+        pass  # one line per data request would drown the console
+
+def _collect(events: list, dirty: dict, live) -> None:
+    for key, name in events:
+        if key is None:
+            dirty.update(dict.fromkeys(live.dirs))
+        elif name is None or (key in dirty and dirty[key] is None):
+            dirty[key] = None
+        else:
+            dirty.setdefault(key, set()).add(name)
+
+def serve(live, port: int = 8000, open_browser: bool = True) -> None:
+    """Serve live (a visualize.LiveTree) on localhost and push a diff to every open page
+    after each burst of changes, until interrupted."""
+    server = LiveServer(('127.0.0.1', port), live)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/'
+    print(f'Watching {len(live.dirs):,} directories; serving {url} (Ctrl+C to stop)')
+    if open_browser:
+        webbrowser.open(url)
+    watcher = live.watcher
+    try:
+        while True:
+            dirty = {}
+            _collect(watcher.events(None), dirty, live)
+            time.sleep(DEBOUNCE)
+            _collect(watcher.events(0), dirty, live)
+            if not dirty:
+                continue
+            with live.lock:
+                diff = live.apply(dirty)
+            if diff:
+                server.publish(diff)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        watcher.close()
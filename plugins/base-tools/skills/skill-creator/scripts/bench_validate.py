@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Validation micro-benchmark - Per-skill cost of quick_validate, stage by stage
+
+Stages (median time per skill):
+    legacy_full      read the whole SKILL.md, regex out the frontmatter, yaml.safe_load (the old core)
+    read_head        quick_validate.read_frontmatter: read only up to the closing "---"
+    parse_builtin    the built-in parser for one-line "key: value" frontmatter
+    parse_yaml       yaml with the C loader when available (the fallback for anything else)
+    check_skill      the whole check, as run by validate_skill
+
+Startup is measured separately in a fresh interpreter: importing quick_validate and validating
+one skill, with and without PyYAML being imported along the way.
+
+Usage:
+    bench_validate.py [skill-folders-or-marketplace-root ...] [--repeat N] [--body-kb KB] [--output FILE]
+
+Examples:
+    bench_validate.py
+    bench_validate.py ~/claude-plugins --repeat 500
+    bench_validate.py skills/public/my-skill --body-kb 2048 --output bench.json
+"""
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import quick_validate
+from quick_validate import check_skill, expand_paths, parse_frontmatter, read_frontmatter
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+DEFAULT_ROOT = SCRIPTS_DIR.parents[4]   # the marketplace this skill ships in
+
+
+def time_per_skill(func, skills, repeat):
+    """Median seconds per skill of func(skill) over repeat passes through all skills."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for skill in skills:
+            func(skill)
+        timings.append((time.perf_counter() - start) / len(skills))
+    return statistics.median(timings)
+
+
+def legacy_full(skill_path):
+    import yaml
+    content = (Path(skill_path) / 'SKILL.md').read_text()
+    match = re.match(r'^---\n(.*?)\n---', content, re.DOTALL)
+    return yaml.safe_load(match.group(1)) if match else None
+
+
+def startup(skill_path):
+    """Seconds for a fresh interpreter to import quick_validate and validate one skill, and
+    whether PyYAML got imported."""
+    code = ("import sys, time; t = time.perf_counter(); import quick_validate; "
+            f"quick_validate.validate_skill({str(skill_path)!r}); "
+            "print(time.perf_counter() - t, 'yaml' in sys.modules)")
+    out = subprocess.run([sys.executable, '-c', code], cwd=SCRIPTS_DIR, capture_output=True, text=True, check=True)
+    seconds, imported = out.stdout.split()
+    return float(seconds), imported == 'True'
+
+
+def make_large_skill(workdir, body_kb):
+    """A skill with the usual frontmatter and a body_kb KB body, to show what reading stops short of."""
+    skill = Path(workdir) / 'large-skill'
+    skill.mkdir()
+    body = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit.\n" * (body_kb * 1024 // 57 + 1))
+    (skill / 'SKILL.md').write_text(
+        "---\nname: large-skill\ndescription: A skill with a long body, used by the benchmark.\n---\n\n" + body,
+        encoding='utf-8')
+    return skill
+
+
+def run(skills, repeat):
+    heads = {skill: read_frontmatter(Path(skill) / 'SKILL.md')[1] for skill in skills}
+    builtin = [skill for skill in skills if quick_validate._parse_simple(heads[skill] or '') is not None]
+
+    import yaml
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    stages = {
+        'legacy_full': (legacy_full, skills),
+        'read_head': (lambda skill: read_frontmatter(Path(skill) / 'SKILL.md'), skills),
+        'parse_builtin': (lambda skill: parse_frontmatter(heads[skill]), builtin),
+        'parse_yaml': (lambda skill: yaml.load(heads[skill] or '', Loader=loader), skills),
+        'check_skill': (check_skill, skills),
+    }
+    results = {}
+    for key, (func, items) in stages.items():
+        if not items:
+            continue
+        seconds = time_per_skill(func, items, repeat)
+        results[key] = {'us_per_skill': round(seconds * 1e6, 2), 'skills': len(items)}
+        print(f"   {key:<16} {seconds * 1e6:10.1f} µs/skill  ({len(items)} skills)")
+    print(f"   (yaml loader: {loader.__name__}; built-in parser handles {len(builtin)}/{len(skills)} skills)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the per-skill cost of quick_validate")
+    parser.add_argument('paths', nargs='*', default=[str(DEFAULT_ROOT)], help="Skill folders or marketplace roots")
+    parser.add_argument('--repeat', type=int, default=200, help="Passes over the skills per stage (default: 200)")
+    parser.add_argument('--body-kb', type=int, default=512, help="Body size of the synthetic large skill (default: 512)")
+    parser.add_argument('--output', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    skills = [str(skill) for skill in expand_paths(args.paths) if (Path(skill) / 'SKILL.md').is_file()]
+    if not skills:
+        print("❌ Error: no skills found")
+        sys.exit(1)
+
+    report = {'python': sys.version.split()[0], 'repeat': args.repeat}
+    print(f"⏱️  {len(skills)} skills, {args.repeat} passes")
+    report['skills'] = run(skills, args.repeat)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        large = str(make_large_skill(workdir, args.body_kb))
+        print(f"\n⏱️  One skill with a {args.body_kb} KB body")
+        report['large_skill'] = run([large], args.repeat)
+
+    seconds, imported = startup(skills[0])
+    print(f"\n⏱️  Fresh interpreter: import + validate {Path(skills[0]).name} in {seconds * 1000:.1f} ms"
+          f" (PyYAML imported: {'yes' if imported else 'no'})")
+    report['startup'] = {'ms': round(seconds * 1000, 2), 'yaml_imported': imported}
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n", encoding='utf-8')
+        print(f"\n✅ Results written to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
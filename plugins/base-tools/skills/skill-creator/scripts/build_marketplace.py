@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Marketplace Builder - Validates and packages every skill of a plugin marketplace in one run
+
+Skills are found through .claude-plugin/marketplace.json and each plugin's plugin.json, then
+validated and packaged on a process pool. A skill whose files (and these scripts) are unchanged
+since the last build is skipped. A JSON build report with per-skill timings is written to the
+output directory and read back on the next run.
+
+Usage:
+    build_marketplace.py [marketplace-root] [--output DIR] [--jobs N] [--force] [--report FILE]
+                         [--max-size SIZE] [--max-file-size SIZE]
+
+Examples:
+    build_marketplace.py
+    build_marketplace.py . --output dist
+    build_marketplace.py ~/claude-plugins --jobs 4 --force
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from package_skill import MAX_FILE_BYTES, MAX_SKILL_BYTES, check_budgets, collect_files, parse_size, write_archive
+from quick_validate import validate_skill
+
+REPORT_NAME = "build-report.json"
+SCRIPTS = ("build_marketplace.py", "package_skill.py", "quick_validate.py")
+
+
+def discover_skills(root):
+    """
+    Find every skill listed by a marketplace.
+
+    Plugins come from .claude-plugin/marketplace.json (local "./path" sources only). Each
+    plugin's skills are the folders holding a SKILL.md in its skills/ directory and in any
+    extra directories named by the "skills" field of its .claude-plugin/plugin.json.
+
+    Args:
+        root: Marketplace root directory
+
+    Returns:
+        List of (plugin name, skill folder path), in marketplace order
+    """
+    root = Path(root).resolve()
+    marketplace = json.loads((root / ".claude-plugin" / "marketplace.json").read_text(encoding="utf-8"))
+    skills = []
+    for plugin in marketplace.get("plugins", []):
+        source = plugin.get("source")
+        if not isinstance(source, str):
+            print(f"⚠️  Skipping {plugin.get('name')}: only local plugin sources can be built")
+            continue
+        plugin_dir = (root / source).resolve()
+        dirs = ["skills"]
+        manifest = plugin_dir / ".claude-plugin" / "plugin.json"
+        if manifest.exists():
+            extra = json.loads(manifest.read_text(encoding="utf-8")).get("skills", [])
+            dirs += [extra] if isinstance(extra, str) else extra
+        seen = set()
+        for skills_dir in dirs:
+            skills_dir = (plugin_dir / skills_dir).resolve()
+            if skills_dir in seen or not skills_dir.is_dir():
+                continue
+            seen.add(skills_dir)
+            candidates = [skills_dir] if (skills_dir / "SKILL.md").exists() else sorted(skills_dir.iterdir())
+            for skill_dir in candidates:
+                if (skill_dir / "SKILL.md").is_file():
+                    skills.append((plugin.get("name", plugin_dir.name), skill_dir))
+    return skills
+
+
+def _tool_digest(*settings):
+    """Hash of the build scripts and settings, so changing the validator, packager or budgets rebuilds."""
+    digest = hashlib.sha256(repr(settings).encode("utf-8"))
+    here = Path(__file__).resolve().parent
+    for name in SCRIPTS:
+        digest.update((here / name).read_bytes())
+    return digest.hexdigest()
+
+
+def fingerprint(files, tool_digest):
+    """
+    Fingerprint a skill's inputs from file names, sizes, modification times and modes.
+
+    Args:
+        files: Output of collect_files
+        tool_digest: Hash of the build scripts
+
+    Returns:
+        Hex digest that changes whenever any input file is added, removed or modified
+    """
+    digest = hashlib.sha256(tool_digest.encode("ascii"))
+    for arcname, file_path in files:
+        st = file_path.stat()
+        digest.update(f"{arcname}\0{st.st_size}\0{st.st_mtime_ns}\0{st.st_mode & 0o111}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _build_skill(task):
+    """
+    Validate and package one skill (runs in a worker process).
+
+    Args:
+        task: Dict with 'entry' (the report entry so far), 'path', 'archive', 'files' and 'budgets'
+
+    Returns:
+        The completed report entry
+    """
+    entry = task["entry"]
+    try:
+        start = time.perf_counter()
+        valid, message = validate_skill(task["path"])
+        validated = time.perf_counter()
+        entry["timings"]["validate"] = round(validated - start, 4)
+        if not valid:
+            entry.update(status="invalid", message=message)
+            return entry
+        files = [(arcname, Path(file_path)) for arcname, file_path in task["files"]]
+        problems = check_budgets(files, *task["budgets"])
+        if problems:
+            entry.update(status="invalid", message="Size budget exceeded:\n" + problems)
+            return entry
+        archive = Path(task["archive"])
+        archive.parent.mkdir(parents=True, exist_ok=True)
+        counts = write_archive(files, archive, workers=2)
+        entry["timings"]["package"] = round(time.perf_counter() - validated, 4)
+        entry.update(status="built", message=message, members=counts, bytes=archive.stat().st_size)
+    except Exception as e:
+        entry.update(status="error", message=f"{type(e).__name__}: {e}")
+    return entry
+
+
+def _load_report(report_path):
+    try:
+        report = json.loads(report_path.read_text(encoding="utf-8"))
+        return {entry["source"]: entry for entry in report["skills"]}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def build_marketplace(root=".", output_dir=None, jobs=None, force=False, report_path=None,
+                      max_skill_bytes=MAX_SKILL_BYTES, max_file_bytes=MAX_FILE_BYTES):
+    """
+    Validate and package every skill in a marketplace.
+
+    Args:
+        root: Marketplace root directory
+        output_dir: Where to write <plugin>/<skill>.skill (defaults to <root>/dist)
+        jobs: Worker processes (defaults to the CPU count)
+        force: Rebuild skills even when their inputs are unchanged
+        report_path: Build report location (defaults to <output_dir>/build-report.json)
+        max_skill_bytes: Budget for each skill's total size (0 for none)
+        max_file_bytes: Budget for any single file (0 for none)
+
+    Returns:
+        The build report as a dict
+    """
+    started = time.perf_counter()
+    root = Path(root).resolve()
+    output_dir = Path(output_dir).resolve() if output_dir else root / "dist"
+    report_path = Path(report_path).resolve() if report_path else output_dir / REPORT_NAME
+    previous = {} if force else _load_report(report_path)
+    budgets = (max_skill_bytes, max_file_bytes)
+    tool_digest = _tool_digest(*budgets)
+
+    entries, tasks = [], []
+    for plugin, skill_dir in discover_skills(root):
+        files = collect_files(skill_dir)
+        archive = output_dir / plugin / f"{skill_dir.name}.skill"
+        entry = {
+            "plugin": plugin,
+            "skill": skill_dir.name,
+            "source": skill_dir.relative_to(root).as_posix() if skill_dir.is_relative_to(root) else str(skill_dir),
+            "archive": str(archive),
+            "fingerprint": fingerprint(files, tool_digest),
+            "files": len(files),
+            "timings": {"validate": 0.0, "package": 0.0},
+        }
+        entries.append(entry)
+        last = previous.get(entry["source"])
+        if (last and last.get("fingerprint") == entry["fingerprint"] and last.get("status") in ("built", "skipped")
+                and last.get("archive") == entry["archive"] and archive.exists()):
+            entry.update(status="skipped", message="unchanged since the last build",
+                         bytes=archive.stat().st_size)
+        else:
+            tasks.append({"entry": entry, "path": str(skill_dir), "archive": str(archive),
+                          "files": [(arcname, str(file_path)) for arcname, file_path in files],
+                          "budgets": budgets})
+
+    if tasks:
+        workers = min(jobs or os.cpu_count() or 1, len(tasks))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for task, built in zip(tasks, pool.map(_build_skill, tasks)):
+                task["entry"].update(built)
+
+    summary = {status: sum(entry["status"] == status for entry in entries)
+               for status in ("built", "skipped", "invalid", "error")}
+    report = {
+        "root": str(root),
+        "output": str(output_dir),
+        "elapsed": round(time.perf_counter() - started, 4),
+        "summary": summary,
+        "skills": entries,
+    }
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate and package every skill in a plugin marketplace")
+    parser.add_argument("root", nargs="?", default=".", help="Marketplace root (holds .claude-plugin/marketplace.json)")
+    parser.add_argument("--output", "-o", help="Output directory for .skill files (default: <root>/dist)")
+    parser.add_argument("--jobs", "-j", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Rebuild skills even if unchanged")
+    parser.add_argument("--report", help="Build report path (default: <output>/build-report.json)")
+    parser.add_argument("--max-size", type=parse_size, default=MAX_SKILL_BYTES,
+                        help="Budget for each skill's total size, e.g. 50MB (0 disables)")
+    parser.add_argument("--max-file-size", type=parse_size, default=MAX_FILE_BYTES,
+                        help="Budget for any single file, e.g. 10MB (0 disables)")
+    args = parser.parse_args()
+
+    print(f"📦 Building marketplace: {Path(args.root).resolve()}")
+    print()
+    try:
+        report = build_marketplace(args.root, args.output, args.jobs, args.force, args.report,
+                                   args.max_size, args.max_file_size)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error: could not read the marketplace: {e}")
+        sys.exit(1)
+
+    icons = {"built": "✅", "skipped": "⏭️ ", "invalid": "❌", "error": "❌"}
+    for entry in report["skills"]:
+        timings = entry["timings"]
+        line = f"  {icons[entry['status']]} {entry['plugin']}/{entry['skill']}"
+        if entry["status"] == "built":
+            line += f" ({timings['validate'] + timings['package']:.2f}s)"
+        elif entry["status"] != "skipped":
+            line += f": {entry['message']}"
+        print(line)
+
+    summary = report["summary"]
+    print(f"\n{summary['built']} built, {summary['skipped']} unchanged, "
+          f"{summary['invalid'] + summary['error']} failed in {report['elapsed']:.2f}s")
+    print(f"   Report: {args.report or Path(report['output']) / REPORT_NAME}")
+    sys.exit(1 if summary["invalid"] or summary["error"] else 0)
+
+
+if __name__ == "__main__":
+    main()
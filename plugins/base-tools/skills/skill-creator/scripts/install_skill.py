@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Skill Installer - Installs or upgrades a skill from a .skill file
+
+Only members whose contents differ from the installed copy are extracted; unchanged files
+are hard-linked (or copied) from the current install. Every extracted member is checked
+against the SHA-256 that package_skill.py records for it, and the new version is assembled
+in a staging directory that replaces the old one in a single rename.
+
+Usage:
+    install_skill.py <path/to/skill-file> [skills-directory] [--force]
+
+Examples:
+    install_skill.py dist/my-skill.skill
+    install_skill.py dist/my-skill.skill ~/.claude/skills
+    install_skill.py dist/my-skill.skill .claude/skills --force
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import os
+import shutil
+import sys
+import zipfile
+from pathlib import Path, PurePosixPath
+from package_skill import HASH_PREFIX
+
+MANIFEST = ".skill-manifest.json"   # written into each install: relative path -> hash, size, mtime
+DEFAULT_SKILLS_DIR = Path.home() / ".claude" / "skills"
+READ = 1 << 20
+
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+
+
+def _members(zipf):
+    """
+    Check an archive's layout and pair each file member with its path inside the skill.
+
+    Args:
+        zipf: Open ZipFile of the .skill archive
+
+    Returns:
+        (skill name, list of (relative path, ZipInfo, recorded SHA-256 or None))
+
+    Raises:
+        ValueError: If the archive is empty, holds more than one top-level folder, or has
+        absolute or parent-relative member names
+    """
+    names, members = set(), []
+    for info in zipf.infolist():
+        path = PurePosixPath(info.filename)
+        if path.is_absolute() or '..' in path.parts or '\\' in info.filename or not path.parts:
+            raise ValueError(f"unsafe member name in archive: {info.filename}")
+        names.add(path.parts[0])
+        if info.is_dir():
+            continue  # folders are created as their files are written
+        if len(path.parts) < 2:
+            raise ValueError(f"file outside the skill folder in archive: {info.filename}")
+        digest = None
+        if info.comment.startswith(HASH_PREFIX):
+            digest = info.comment[len(HASH_PREFIX):].decode('ascii')
+        members.append(('/'.join(path.parts[1:]), info, digest))
+    if len(names) != 1:
+        raise ValueError("a .skill archive must contain exactly one top-level skill folder")
+    return names.pop(), members
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb', buffering=0) as f:
+        while chunk := f.read(READ):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _installed_hash(skill_dir, rel_path, size, manifest):
+    """
+    SHA-256 of an installed file, or None if it is missing or a different size.
+
+    The hash recorded in the install manifest is trusted while the file's size and mtime
+    still match it; otherwise the file is read and hashed.
+    """
+    path = skill_dir / rel_path
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    if st.st_size != size:
+        return None
+    known = manifest.get(rel_path)
+    if known and known.get("size") == st.st_size and known.get("mtime_ns") == st.st_mtime_ns:
+        return known.get("sha256")
+    return _hash_file(path)
+
+
+def _extract(zipf, info, target, expected):
+    """Stream one member to target, hashing as it goes; returns its SHA-256."""
+    digest = hashlib.sha256()
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with zipf.open(info) as src, open(target, 'wb') as out:
+        while chunk := src.read(READ):
+            digest.update(chunk)
+            out.write(chunk)
+    actual = digest.hexdigest()
+    if expected and actual != expected:
+        raise ValueError(f"hash mismatch for {info.filename}: archive records {expected[:12]}…, got {actual[:12]}…")
+    return actual
+
+
+def _link_or_copy(source, target):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+        return
+    except OSError:
+        pass
+    shutil.copy2(source, target)
+
+
+def _swap(staging, skill_dir):
+    """
+    Put staging in place of skill_dir in one step.
+
+    On Linux the two directories are exchanged atomically with renameat2(RENAME_EXCHANGE);
+    elsewhere the old directory is renamed aside first, leaving a brief window in which
+    neither exists.
+
+    Returns:
+        Path now holding the previous install (to be removed), or None if there was none
+    """
+    if not skill_dir.exists():
+        os.rename(staging, skill_dir)
+        return None
+    if sys.platform.startswith('linux'):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            renameat2 = libc.renameat2
+            renameat2.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+            if renameat2(AT_FDCWD, os.fsencode(staging), AT_FDCWD, os.fsencode(skill_dir), RENAME_EXCHANGE) == 0:
+                return staging
+        except (OSError, AttributeError):
+            pass  # no renameat2 in this libc, or the file system does not support the exchange
+    backup = skill_dir.with_name(f".{skill_dir.name}.old-{os.getpid()}")
+    os.rename(skill_dir, backup)
+    os.rename(staging, skill_dir)
+    return backup
+
+
+def install_skill(skill_file, skills_dir=DEFAULT_SKILLS_DIR, force=False):
+    """
+    Install or upgrade a skill from a .skill file.
+
+    Args:
+        skill_file: Path to the .skill archive
+        skills_dir: Directory that holds installed skills; the skill goes in <skills_dir>/<name>
+        force: Extract every member instead of reusing unchanged installed files
+
+    Returns:
+        Path to the installed skill folder, or None if error
+    """
+    skill_file = Path(skill_file).resolve()
+    if not skill_file.is_file():
+        print(f"❌ Error: Skill file not found: {skill_file}")
+        return None
+
+    skills_dir = Path(skills_dir).expanduser().resolve()
+    staging = None
+    try:
+        with zipfile.ZipFile(skill_file) as zipf:
+            name, members = _members(zipf)
+            skill_dir = skills_dir / name
+            manifest = {}
+            if skill_dir.is_dir() and not force:
+                try:
+                    manifest = json.loads((skill_dir / MANIFEST).read_text(encoding='utf-8'))
+                except (OSError, ValueError):
+                    pass
+
+            skills_dir.mkdir(parents=True, exist_ok=True)
+            staging = skills_dir / f".{name}.staging-{os.getpid()}"
+            shutil.rmtree(staging, ignore_errors=True)
+            staging.mkdir()
+
+            counts = {'extracted': 0, 'unchanged': 0}
+            installed = {}
+            for rel_path, info, expected in members:
+                target = staging / rel_path
+                if (not force and expected and skill_dir.is_dir()
+                        and _installed_hash(skill_dir, rel_path, info.file_size, manifest) == expected):
+                    _link_or_copy(skill_dir / rel_path, target)
+                    digest = expected
+                    counts['unchanged'] += 1
+                else:
+                    digest = _extract(zipf, info, target, expected)
+                    counts['extracted'] += 1
+                mode = (info.external_attr >> 16) & 0o777
+                if mode:
+                    os.chmod(target, mode)
+                st = target.stat()
+                installed[rel_path] = {"sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+        (staging / MANIFEST).write_text(json.dumps(installed, indent=1, sort_keys=True), encoding='utf-8')
+        removed = len(set(manifest) - set(installed))
+        previous = _swap(staging, skill_dir)
+        staging = None
+        if previous:
+            shutil.rmtree(previous, ignore_errors=True)
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        print(f"❌ Error installing {skill_file.name}: {e}")
+        if staging:
+            shutil.rmtree(staging, ignore_errors=True)
+        return None
+
+    print(f"  {len(members)} files: {counts['extracted']} extracted, {counts['unchanged']} unchanged"
+          + (f", {removed} removed" if removed else ""))
+    print(f"\n✅ Successfully installed skill to: {skill_dir}")
+    return skill_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Install or upgrade a skill from a .skill file")
+    parser.add_argument("skill_file", help="Path to the .skill file")
+    parser.add_argument("skills_dir", nargs="?", default=DEFAULT_SKILLS_DIR,
+                        help=f"Directory holding installed skills (default: {DEFAULT_SKILLS_DIR})")
+    parser.add_argument("--force", action="store_true", help="Extract every file, even unchanged ones")
+    args = parser.parse_args()
+
+    print(f"📥 Installing skill: {args.skill_file}")
+    print(f"   Skills directory: {args.skills_dir}")
+    print()
+
+    result = install_skill(args.skill_file, args.skills_dir, args.force)
+
+    if result:
+        sys.exit(0)
+    else:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
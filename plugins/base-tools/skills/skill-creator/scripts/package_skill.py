@@ -4,25 +4,66 @@ Skill Packager - Creates a distributable .skill file of a skill folder
 
 Usage:
     python utils/package_skill.py <path/to/skill-folder> [output-directory]
+                                  [--max-size SIZE] [--max-file-size SIZE]
 
 Example:
     python utils/package_skill.py skills/public/my-skill
     python utils/package_skill.py skills/public/my-skill ./dist
+    python utils/package_skill.py skills/public/my-skill ./dist --max-size 20MB --max-file-size 2MB
+
+Files matching DEFAULT_IGNORES or a pattern in the skill's .skillignore (gitignore-style:
+"#" comments, "!" to re-include, a trailing "/" for directories only, a leading or inner "/"
+to anchor at the skill folder, "*" and "?" stopping at "/", "**" spanning folders) are left
+out of the archive.
 """
 
+import argparse
+import hashlib
+import os
+import re
+import struct
 import sys
 import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from quick_validate import validate_skill
 
+# Formats that are already compressed; deflating them again only costs time.
+STORED_SUFFIXES = {
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.heic', '.ico',
+    '.zip', '.skill', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.7z', '.rar', '.jar', '.whl',
+    '.mp3', '.mp4', '.m4a', '.mov', '.webm', '.ogg', '.flac', '.woff', '.woff2', '.pdf',
+}
+COMPRESS_LEVEL = 6
+DOS_EPOCH = (0, (1 << 5) | 1)   # (time, date) of 1980-01-01 00:00, the earliest zip timestamp
+HASH_PREFIX = b'sha256:'        # each member's comment holds the hash of its contents
+
+IGNORE_FILE = '.skillignore'
+DEFAULT_IGNORES = [
+    '.skillignore', '.skill-manifest.json', '.skill-validate-cache.json', '*.skill',
+    '.env', '.env.*', '!.env.example', '!.env.sample', '!.env.template',  # keep documented templates
+    '.DS_Store', 'Thumbs.db', '*.pyc', '*.pyo',
+    '__pycache__/', '.git/', '.venv/', 'venv/', 'node_modules/', '.pytest_cache/', 'output/',
+]
+MAX_SKILL_BYTES = 50 * 1024 * 1024  # default budgets on uncompressed sizes; 0 disables
+MAX_FILE_BYTES = 10 * 1024 * 1024
+TOP_CONTRIBUTORS = 10
+
+_LOCAL = struct.Struct('<4s5H3L2H')
+_CENTRAL = struct.Struct('<4s6H3L5H2L')
+_END = struct.Struct('<4s4H2LH')
 
-def package_skill(skill_path, output_dir=None):
+
+def package_skill(skill_path, output_dir=None, max_skill_bytes=MAX_SKILL_BYTES, max_file_bytes=MAX_FILE_BYTES):
     """
     Package a skill folder into a .skill file.
 
     Args:
         skill_path: Path to the skill folder
         output_dir: Optional output directory for the .skill file (defaults to current directory)
+        max_skill_bytes: Budget for the total size of the packaged files (0 for none)
+        max_file_bytes: Budget for any single packaged file (0 for none)
 
     Returns:
         Path to the created .skill file, or None if error
@@ -65,14 +106,15 @@ def package_skill(skill_path, output_dir=None):
 
     # Create the .skill file (zip format)
     try:
-        with zipfile.ZipFile(skill_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Walk through the skill directory
-            for file_path in skill_path.rglob('*'):
-                if file_path.is_file():
-                    # Calculate the relative path within the zip
-                    arcname = file_path.relative_to(skill_path.parent)
-                    zipf.write(file_path, arcname)
-                    print(f"  Added: {arcname}")
+        files = collect_files(skill_path)
+        problems = check_budgets(files, max_skill_bytes, max_file_bytes)
+        if problems:
+            print(f"❌ Size budget exceeded:\n{problems}")
+            print("   Add large or generated files to .skillignore, or raise the budget.")
+            return None
+        counts = write_archive(files, skill_filename)
+        print(f"  {len(files)} files: {counts['deflated']} deflated, {counts['stored']} stored, "
+              f"{counts['reused']} reused from the previous archive")
 
         print(f"\n✅ Successfully packaged skill to: {skill_filename}")
         return skill_filename
@@ -82,23 +124,345 @@ def package_skill(skill_path, output_dir=None):
         return None
 
 
+def _translate(pattern):
+    """
+    Translate one gitignore glob into a regex, as git matches it: "*", "?" and "[...]" never
+    match "/", while "**/" matches any number of folders and a trailing "/**" everything inside.
+    """
+    out, i, n = [], 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern.startswith('**', i) and (i == 0 or pattern[i - 1] == '/'):
+                if i + 2 == n:
+                    out.append('.*')
+                    i += 2
+                    continue
+                if pattern[i + 2] == '/':
+                    out.append('(?:.*/)?')
+                    i += 3
+                    continue
+            while i + 1 < n and pattern[i + 1] == '*':
+                i += 1
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            j = i + 1
+            if j < n and pattern[j] in '!^':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            while j < n and pattern[j] != ']':
+                j += 1
+            if j >= n:
+                out.append('\\[')
+            else:
+                body = pattern[i + 1:j]
+                if body[0] in '!^':
+                    body = '^' + body[1:]
+                out.append('[' + body.replace('[', '\\[') + ']')
+                i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return re.compile(''.join(out))
+
+
+def load_ignore_rules(skill_path):
+    """
+    Read the ignore rules for a skill: DEFAULT_IGNORES, then its .skillignore.
+
+    Args:
+        skill_path: Path to the skill folder
+
+    Returns:
+        List of (compiled pattern, negated, directories only, anchored), in order; the last
+        match wins
+    """
+    lines = list(DEFAULT_IGNORES)
+    try:
+        lines += (Path(skill_path) / IGNORE_FILE).read_text(encoding='utf-8').splitlines()
+    except FileNotFoundError:
+        pass
+    rules = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        negated = line.startswith('!')
+        line = line.lstrip('!')
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        anchored = '/' in line
+        if line:
+            rules.append((_translate(line.lstrip('/')), negated, dir_only, anchored))
+    return rules
+
+
+def is_ignored(rules, rel_path, is_dir):
+    """
+    Whether a path inside the skill folder is excluded by the ignore rules.
+
+    Args:
+        rules: Output of load_ignore_rules
+        rel_path: Path relative to the skill folder, with "/" separators
+        is_dir: Whether the path is a directory
+
+    Returns:
+        True if the path should be left out
+    """
+    name = rel_path.rsplit('/', 1)[-1]
+    ignored = False
+    for pattern, negated, dir_only, anchored in rules:
+        if dir_only and not is_dir:
+            continue
+        if pattern.fullmatch(rel_path if anchored else name):
+            ignored = not negated
+    return ignored
+
+
+def collect_files(skill_path):
+    """
+    List the files that go into a skill's archive.
+
+    The folder is walked with os.scandir and ignored directories are pruned before they
+    are entered, so large ignored trees (node_modules/, output/) cost nothing.
+
+    Args:
+        skill_path: Resolved path to the skill folder
+
+    Returns:
+        Sorted list of (archive name, file path); archive names start with the folder name
+    """
+    skill_path = Path(skill_path)
+    rules = load_ignore_rules(skill_path)
+    files = []
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            entries = list(os.scandir(skill_path / rel_dir))
+        except OSError:
+            continue
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            is_dir = entry.is_dir(follow_symlinks=False)
+            if is_ignored(rules, rel_path, is_dir):
+                continue
+            if is_dir:
+                stack.append(rel_path)
+            elif entry.is_file():
+                files.append((f"{skill_path.name}/{rel_path}", skill_path / rel_path))
+    files.sort()
+    return files
+
+
+def _format_size(n):
+    if n < 1024:
+        return f"{n} B"
+    if n < 1024 * 1024:
+        return f"{n / 1024:.1f} KB"
+    return f"{n / (1024 * 1024):.1f} MB"
+
+
+def check_budgets(files, max_skill_bytes=MAX_SKILL_BYTES, max_file_bytes=MAX_FILE_BYTES):
+    """
+    Check the files of a skill against its size budgets.
+
+    Args:
+        files: Output of collect_files
+        max_skill_bytes: Budget for the total size (0 for none)
+        max_file_bytes: Budget for any single file (0 for none)
+
+    Returns:
+        None if within budget, otherwise a report naming the budgets exceeded and the
+        largest files and top-level folders
+    """
+    sizes = [(file_path.stat().st_size, arcname) for arcname, file_path in files]
+    total = sum(size for size, _ in sizes)
+    lines = []
+    if max_skill_bytes and total > max_skill_bytes:
+        lines.append(f"   Skill is {_format_size(total)}, over the {_format_size(max_skill_bytes)} budget")
+    if max_file_bytes:
+        over = [arcname for size, arcname in sizes if size > max_file_bytes]
+        if over:
+            lines.append(f"   {len(over)} file(s) over the {_format_size(max_file_bytes)} per-file budget")
+    if not lines:
+        return None
+
+    folders = {}
+    for size, arcname in sizes:
+        parts = arcname.split('/')
+        key = parts[1] + '/' if len(parts) > 2 else parts[1]
+        folders[key] = folders.get(key, 0) + size
+    lines.append("   Largest files:")
+    for size, arcname in sorted(sizes, reverse=True)[:TOP_CONTRIBUTORS]:
+        lines.append(f"     {_format_size(size):>10}  {arcname.split('/', 1)[1]}")
+    lines.append("   Largest top-level entries:")
+    for key, size in sorted(folders.items(), key=lambda item: -item[1])[:TOP_CONTRIBUTORS]:
+        lines.append(f"     {_format_size(size):>10}  {key}")
+    return "\n".join(lines)
+
+
+def _compress(file_path, previous):
+    """
+    Read, hash and (unless the same content is in the previous archive) compress one file.
+
+    Args:
+        file_path: File to add
+        previous: Mapping of (content hash, stored suffix) to ZipInfo in the previous archive
+
+    Returns:
+        (digest, crc, size, method, data); data is None when the previous member is reused
+    """
+    data = file_path.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    stored = file_path.suffix.lower() in STORED_SUFFIXES
+    if (digest, stored) in previous:
+        return digest, None, None, None, None
+    crc = zlib.crc32(data)
+    size = len(data)
+    if not stored:
+        compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -15)
+        packed = compressor.compress(data) + compressor.flush()
+        if len(packed) < size:
+            return digest, crc, size, zipfile.ZIP_DEFLATED, packed
+    return digest, crc, size, zipfile.ZIP_STORED, data
+
+
+def _previous_members(archive):
+    """
+    Index the members of an earlier archive written by write_archive.
+
+    Args:
+        archive: Path to the existing .skill file
+
+    Returns:
+        Mapping of (content hash, stored suffix) to ZipInfo (empty if there is no usable archive)
+    """
+    try:
+        with zipfile.ZipFile(archive) as zipf:
+            infos = zipf.infolist()
+    except (OSError, zipfile.BadZipFile):
+        return {}
+    return {
+        (info.comment[len(HASH_PREFIX):].decode('ascii'),
+         Path(info.filename).suffix.lower() in STORED_SUFFIXES): info
+        for info in infos
+        if info.comment.startswith(HASH_PREFIX) and info.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+    }
+
+
+def _raw_member(f, info):
+    """Read the compressed bytes of a member straight from an open archive."""
+    f.seek(info.header_offset)
+    header = _LOCAL.unpack(f.read(_LOCAL.size))
+    f.seek(header[9] + header[10], os.SEEK_CUR)  # file name and extra field
+    return f.read(info.compress_size)
+
+
+def write_archive(files, archive, workers=None):
+    """
+    Write a reproducible zip of files to archive.
+
+    Entries are written in the given order with fixed timestamps and permissions, so the
+    same inputs always give the same bytes. Files are compressed on a thread pool, formats
+    in STORED_SUFFIXES are stored as-is, and each member's comment records the SHA-256 of
+    its contents: a file whose content hash (and stored/deflated choice by suffix) matches
+    any member of the previous archive, under whatever name, reuses that member's compressed
+    bytes instead of being compressed again.
+
+    Args:
+        files: Sorted list of (archive name, file path)
+        archive: Path of the .skill file to write
+        workers: Compression threads (defaults to the CPU count)
+
+    Returns:
+        Dict with counts of 'deflated', 'stored' and 'reused' members
+    """
+    archive = Path(archive)
+    previous = _previous_members(archive)
+    counts = {'deflated': 0, 'stored': 0, 'reused': 0}
+    central = []
+    tmp = archive.with_name(archive.name + '.tmp')
+    old = open(archive, 'rb') if previous else None
+    try:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool, open(tmp, 'wb') as out:
+            results = pool.map(lambda item: _compress(item[1], previous), files)
+            for (arcname, file_path), (digest, crc, size, method, data) in zip(files, results):
+                if data is None:
+                    info = previous[digest, file_path.suffix.lower() in STORED_SUFFIXES]
+                    crc, size, method = info.CRC, info.file_size, info.compress_type
+                    data = _raw_member(old, info)
+                    counts['reused'] += 1
+                else:
+                    counts['deflated' if method == zipfile.ZIP_DEFLATED else 'stored'] += 1
+                if max(size, len(data), out.tell()) >= 0xFFFFFFFF or len(files) >= 0xFFFF:
+                    raise ValueError("skill is too large for a .skill archive (zip64 is not supported)")
+                name = arcname.encode('utf-8')
+                flags = 0x800 if not arcname.isascii() else 0  # UTF-8 file name
+                mode = 0o755 if os.access(file_path, os.X_OK) else 0o644
+                central.append((name, flags, method, crc, len(data), size, mode, out.tell(),
+                                HASH_PREFIX + digest.encode('ascii')))
+                out.write(_LOCAL.pack(b'PK\x03\x04', 20, flags, method, *DOS_EPOCH,
+                                      crc, len(data), size, len(name), 0))
+                out.write(name)
+                out.write(data)
+
+            start = out.tell()
+            for name, flags, method, crc, csize, size, mode, offset, comment in central:
+                out.write(_CENTRAL.pack(b'PK\x01\x02', (3 << 8) | 20, 20, flags, method, *DOS_EPOCH,
+                                        crc, csize, size, len(name), 0, len(comment), 0, 0,
+                                        (0o100000 | mode) << 16, offset))
+                out.write(name)
+                out.write(comment)
+            out.write(_END.pack(b'PK\x05\x06', 0, 0, len(central), len(central),
+                                out.tell() - start, start, 0))
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    finally:
+        if old:
+            old.close()
+    os.replace(tmp, archive)
+    return counts
+
+
+def parse_size(text):
+    """Parse a size such as 512KB, 20MB or 1048576 into bytes."""
+    text = text.strip().upper().rstrip('B')
+    for suffix, factor in (('K', 1024), ('M', 1024 ** 2), ('G', 1024 ** 3)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python utils/package_skill.py <path/to/skill-folder> [output-directory]")
-        print("\nExample:")
-        print("  python utils/package_skill.py skills/public/my-skill")
-        print("  python utils/package_skill.py skills/public/my-skill ./dist")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Package a skill folder into a distributable .skill file",
+        epilog="Example: package_skill.py skills/public/my-skill ./dist --max-size 20MB",
+    )
+    parser.add_argument("skill_path", help="Path to the skill folder")
+    parser.add_argument("output_dir", nargs="?", help="Output directory (default: current directory)")
+    parser.add_argument("--max-size", type=parse_size, default=MAX_SKILL_BYTES,
+                        help="Budget for the skill's total size, e.g. 50MB (0 disables)")
+    parser.add_argument("--max-file-size", type=parse_size, default=MAX_FILE_BYTES,
+                        help="Budget for any single file, e.g. 10MB (0 disables)")
+    args = parser.parse_args()
 
-    skill_path = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else None
+    skill_path = args.skill_path
+    output_dir = args.output_dir
 
     print(f"📦 Packaging skill: {skill_path}")
     if output_dir:
         print(f"   Output directory: {output_dir}")
     print()
 
-    result = package_skill(skill_path, output_dir)
+    result = package_skill(skill_path, output_dir, args.max_size, args.max_file_size)
 
     if result:
         sys.exit(0)
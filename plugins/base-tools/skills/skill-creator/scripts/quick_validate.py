@@ -1,95 +1,381 @@
 #!/usr/bin/env python3
 """
 Quick validation script for skills - minimal version
+
+Usage:
+    quick_validate.py <skill_directory>
+    quick_validate.py <path> [<path> ...] [--format text|json|sarif] [--jobs N] [--cache FILE | --no-cache]
+
+A path holding .claude-plugin/marketplace.json stands for every skill in that marketplace.
+With several skills, all errors of every skill are reported, skills are checked in parallel,
+and results are cached by the SHA-256 of each frontmatter so unchanged skills are not re-checked.
+
+Only the frontmatter of SKILL.md is read. Frontmatter made of one-line "key: value" entries is
+parsed without PyYAML; anything else (nested metadata, lists, block scalars) goes through
+yaml's C loader when available.
 """
 
+import argparse
+import hashlib
+import json
 import sys
 import os
 import re
-import yaml
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-def validate_skill(skill_path):
-    """Basic validation of a skill"""
+# Define allowed properties
+ALLOWED_PROPERTIES = {'name', 'description', 'license', 'allowed-tools', 'metadata'}
+
+DEFAULT_CACHE = '.skill-validate-cache.json'
+PARALLEL_THRESHOLD = 8  # below this many uncached skills, a process pool costs more than it saves
+
+# SARIF rule id -> short description
+RULES = {
+    'missing-skill-md': "The skill folder has no SKILL.md",
+    'missing-frontmatter': "SKILL.md does not start with YAML frontmatter",
+    'invalid-frontmatter': "The frontmatter is not a valid YAML dictionary",
+    'unexpected-key': "The frontmatter has a property outside the allowed set",
+    'missing-field': "A required frontmatter property is missing",
+    'invalid-name': "The name is not a hyphen-case string of at most 64 characters",
+    'invalid-description': "The description is not a string of at most 1024 characters without angle brackets",
+}
+
+
+# Plain scalars that YAML 1.1 resolves to something other than a string
+_NON_STRINGS = {'', '~', 'null', 'Null', 'NULL', 'true', 'True', 'TRUE', 'false', 'False', 'FALSE',
+                'yes', 'Yes', 'YES', 'no', 'No', 'NO', 'on', 'On', 'ON', 'off', 'Off', 'OFF'}
+_PLAIN_START = set('-?:,[]{}#&*!|>%@`+.~=<0123456789')  # indicators, and starts of numbers/dates
+_SIMPLE_KEY = re.compile(r'([A-Za-z_][\w-]*):(?: (.*))?')
+_SINGLE_QUOTED = re.compile(r"'((?:[^']|'')*)'")
+_DOUBLE_QUOTED = re.compile(r'"([^"\\]*)"')
+
+
+def read_frontmatter(skill_md):
+    """
+    Read SKILL.md up to the end of its frontmatter, and no further.
+
+    Args:
+        skill_md: Path to SKILL.md
+
+    Returns:
+        (bytes read, frontmatter text or None if the opening line is not "---", closed);
+        closed is False when no closing "---" line was found
+    """
+    with open(skill_md, 'rb') as f:
+        first = f.readline()
+        if not first.startswith(b'---'):
+            return first, None, False
+        head = [first]
+        if first.rstrip(b'\r\n') != b'---':
+            return first, '', False
+        for line in f:
+            head.append(line)
+            if line.startswith(b'---'):
+                body = b''.join(head[1:-1])
+                return b''.join(head), body.decode('utf-8').replace('\r\n', '\n').rstrip('\n'), bool(body)
+    return b''.join(head), '', False
+
+
+def _parse_simple(text):
+    """
+    Parse frontmatter made only of one-line "key: value" entries with plain or quoted string
+    values, giving the same result as yaml.safe_load.
+
+    Returns:
+        Dict, or None when the text uses anything else and needs a YAML parser
+    """
+    result = {}
+    for line in text.split('\n'):
+        if not line.strip() or line.startswith('#'):
+            continue
+        match = _SIMPLE_KEY.fullmatch(line)
+        if not match or '\t' in line or match.group(1) in _NON_STRINGS:
+            return None  # indented (nested or continued) line, flow collection, non-string key...
+        value = (match.group(2) or '').strip()
+        quoted = _SINGLE_QUOTED.fullmatch(value)
+        if quoted:
+            value = quoted.group(1).replace("''", "'")
+        elif _DOUBLE_QUOTED.fullmatch(value):
+            value = value[1:-1]
+        elif (value in _NON_STRINGS or value[0] in _PLAIN_START or value[0] in '"\''
+              or ': ' in value or ' #' in value or value.endswith(':')):
+            return None  # empty (block follows), non-string, or not a plain scalar
+        result[match.group(1)] = value
+    return result or None  # YAML reads a document of only comments as None
+
+
+def parse_frontmatter(text):
+    """
+    Parse frontmatter text, using PyYAML only when the built-in parser cannot.
+
+    Args:
+        text: Frontmatter between the "---" lines
+
+    Returns:
+        The parsed value (a dict for valid frontmatter)
+
+    Raises:
+        ValueError: If the text is not valid YAML
+    """
+    result = _parse_simple(text)
+    if result is not None:
+        return result
+    import yaml
+    try:
+        return yaml.load(text, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+    except yaml.YAMLError as e:
+        raise ValueError(e) from e
+
+
+def _key_lines(frontmatter_text):
+    """Line number in SKILL.md of each top-level frontmatter key (the frontmatter starts on line 2)."""
+    lines = {}
+    for number, line in enumerate(frontmatter_text.splitlines(), start=2):
+        match = re.match(r'^([\w-]+)\s*:', line)
+        if match:
+            lines.setdefault(match.group(1), number)
+    return lines
+
+
+def check_skill(skill_path):
+    """
+    Check a skill and collect every problem found.
+
+    Args:
+        skill_path: Path to the skill folder
+
+    Returns:
+        List of (rule id, message, line in SKILL.md or None); empty if the skill is valid
+    """
     skill_path = Path(skill_path)
 
     # Check SKILL.md exists
     skill_md = skill_path / 'SKILL.md'
     if not skill_md.exists():
-        return False, "SKILL.md not found"
+        return [('missing-skill-md', "SKILL.md not found", None)]
 
     # Read and validate frontmatter
-    content = skill_md.read_text()
-    if not content.startswith('---'):
-        return False, "No YAML frontmatter found"
-
-    # Extract frontmatter
-    match = re.match(r'^---\n(.*?)\n---', content, re.DOTALL)
-    if not match:
-        return False, "Invalid frontmatter format"
-
-    frontmatter_text = match.group(1)
+    try:
+        _, frontmatter_text, closed = read_frontmatter(skill_md)
+    except UnicodeDecodeError:
+        return [('invalid-frontmatter', "Frontmatter is not valid UTF-8", 1)]
+    if frontmatter_text is None:
+        return [('missing-frontmatter', "No YAML frontmatter found", 1)]
+    if not closed:
+        return [('invalid-frontmatter', "Invalid frontmatter format", 1)]
 
     # Parse YAML frontmatter
     try:
-        frontmatter = yaml.safe_load(frontmatter_text)
+        frontmatter = parse_frontmatter(frontmatter_text)
         if not isinstance(frontmatter, dict):
-            return False, "Frontmatter must be a YAML dictionary"
-    except yaml.YAMLError as e:
-        return False, f"Invalid YAML in frontmatter: {e}"
+            return [('invalid-frontmatter', "Frontmatter must be a YAML dictionary", 2)]
+    except ValueError as e:
+        return [('invalid-frontmatter', f"Invalid YAML in frontmatter: {e}", 2)]
 
-    # Define allowed properties
-    ALLOWED_PROPERTIES = {'name', 'description', 'license', 'allowed-tools', 'metadata'}
+    errors = []
+    lines = _key_lines(frontmatter_text)
 
     # Check for unexpected properties (excluding nested keys under metadata)
-    unexpected_keys = set(frontmatter.keys()) - ALLOWED_PROPERTIES
+    unexpected_keys = set(map(str, frontmatter.keys())) - ALLOWED_PROPERTIES
     if unexpected_keys:
-        return False, (
+        errors.append(('unexpected-key', (
             f"Unexpected key(s) in SKILL.md frontmatter: {', '.join(sorted(unexpected_keys))}. "
             f"Allowed properties are: {', '.join(sorted(ALLOWED_PROPERTIES))}"
-        )
+        ), min(lines.get(key, 2) for key in unexpected_keys)))
 
     # Check required fields
     if 'name' not in frontmatter:
-        return False, "Missing 'name' in frontmatter"
+        errors.append(('missing-field', "Missing 'name' in frontmatter", 1))
     if 'description' not in frontmatter:
-        return False, "Missing 'description' in frontmatter"
+        errors.append(('missing-field', "Missing 'description' in frontmatter", 1))
 
     # Extract name for validation
     name = frontmatter.get('name', '')
+    line = lines.get('name')
     if not isinstance(name, str):
-        return False, f"Name must be a string, got {type(name).__name__}"
+        errors.append(('invalid-name', f"Name must be a string, got {type(name).__name__}", line))
+        name = ''
     name = name.strip()
     if name:
         # Check naming convention (hyphen-case: lowercase with hyphens)
         if not re.match(r'^[a-z0-9-]+$', name):
-            return False, f"Name '{name}' should be hyphen-case (lowercase letters, digits, and hyphens only)"
-        if name.startswith('-') or name.endswith('-') or '--' in name:
-            return False, f"Name '{name}' cannot start/end with hyphen or contain consecutive hyphens"
+            errors.append(('invalid-name', f"Name '{name}' should be hyphen-case (lowercase letters, digits, and hyphens only)", line))
+        elif name.startswith('-') or name.endswith('-') or '--' in name:
+            errors.append(('invalid-name', f"Name '{name}' cannot start/end with hyphen or contain consecutive hyphens", line))
         # Check name length (max 64 characters per spec)
         if len(name) > 64:
-            return False, f"Name is too long ({len(name)} characters). Maximum is 64 characters."
+            errors.append(('invalid-name', f"Name is too long ({len(name)} characters). Maximum is 64 characters.", line))
 
     # Extract and validate description
     description = frontmatter.get('description', '')
+    line = lines.get('description')
     if not isinstance(description, str):
-        return False, f"Description must be a string, got {type(description).__name__}"
+        errors.append(('invalid-description', f"Description must be a string, got {type(description).__name__}", line))
+        description = ''
     description = description.strip()
     if description:
         # Check for angle brackets
         if '<' in description or '>' in description:
-            return False, "Description cannot contain angle brackets (< or >)"
+            errors.append(('invalid-description', "Description cannot contain angle brackets (< or >)", line))
         # Check description length (max 1024 characters per spec)
         if len(description) > 1024:
-            return False, f"Description is too long ({len(description)} characters). Maximum is 1024 characters."
+            errors.append(('invalid-description', f"Description is too long ({len(description)} characters). Maximum is 1024 characters.", line))
+
+    return errors
+
 
+def validate_skill(skill_path):
+    """Basic validation of a skill: (True, message) or (False, first error)"""
+    errors = check_skill(skill_path)
+    if errors:
+        return False, errors[0][1]
     return True, "Skill is valid!"
 
+
+def _validator_digest():
+    """Hash of this script, so cached results are dropped whenever the checks change."""
+    return hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
+
+def _content_hash(skill_path):
+    """Hash of the part of SKILL.md the checks look at: everything up to the frontmatter's end."""
+    try:
+        return hashlib.sha256(read_frontmatter(Path(skill_path) / 'SKILL.md')[0]).hexdigest()
+    except OSError:
+        return None  # missing SKILL.md is cheap to re-check
+
+
+def expand_paths(paths):
+    """
+    Turn command-line paths into skill folders; a marketplace root expands to all its skills.
+
+    Args:
+        paths: Skill folders and/or marketplace roots
+
+    Returns:
+        List of skill folder paths, without duplicates
+    """
+    skills = []
+    for path in map(Path, paths):
+        if (path / '.claude-plugin' / 'marketplace.json').is_file():
+            from build_marketplace import discover_skills
+            skills.extend(skill_dir for _, skill_dir in discover_skills(path))
+        else:
+            skills.append(path)
+    return list(dict.fromkeys(skills))
+
+
+def validate_skills(paths, jobs=None, cache_path=DEFAULT_CACHE):
+    """
+    Validate many skills, reusing cached results for unchanged SKILL.md files.
+
+    Args:
+        paths: Skill folders
+        jobs: Worker processes for uncached skills (defaults to the CPU count)
+        cache_path: JSON cache file, or None to disable caching
+
+    Returns:
+        List of {"path", "valid", "errors", "cached"} in the order given; errors are
+        {"rule", "message", "line"} dicts
+    """
+    cache = {}
+    validator = _validator_digest()
+    if cache_path:
+        try:
+            saved = json.loads(Path(cache_path).read_text(encoding='utf-8'))
+            if saved.get('validator') == validator:
+                cache = saved['results']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    results, todo = [], []
+    for path in paths:
+        digest = _content_hash(path)
+        result = {'path': str(path), 'valid': None, 'errors': [], 'cached': False}
+        if digest and digest in cache:
+            result.update(errors=cache[digest], cached=True)
+        else:
+            todo.append((result, path, digest))
+        results.append(result)
+
+    if len(todo) >= PARALLEL_THRESHOLD and (jobs or os.cpu_count() or 1) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            checked = list(pool.map(check_skill, [path for _, path, _ in todo], chunksize=4))
+    else:
+        checked = [check_skill(path) for _, path, _ in todo]
+
+    for (result, _, digest), errors in zip(todo, checked):
+        errors = [{'rule': rule, 'message': message, 'line': line} for rule, message, line in errors]
+        result['errors'] = errors
+        if digest:
+            cache[digest] = errors
+    for result in results:
+        result['valid'] = not result['errors']
+
+    if cache_path and todo:
+        tmp = Path(f"{cache_path}.tmp")
+        tmp.write_text(json.dumps({'validator': validator, 'results': cache}, separators=(',', ':')), encoding='utf-8')
+        os.replace(tmp, cache_path)
+    return results
+
+
+def to_sarif(results):
+    """SARIF 2.1.0 log of validation results, for code scanning and pre-commit integrations."""
+    sarif_results = []
+    for result in results:
+        for error in result['errors']:
+            location = {'artifactLocation': {'uri': Path(result['path'], 'SKILL.md').as_posix()}}
+            if error['line']:
+                location['region'] = {'startLine': error['line']}
+            sarif_results.append({
+                'ruleId': error['rule'],
+                'level': 'error',
+                'message': {'text': error['message']},
+                'locations': [{'physicalLocation': location}],
+            })
+    return {
+        '$schema': 'https://json.schemastore.org/sarif-2.1.0.json',
+        'version': '2.1.0',
+        'runs': [{
+            'tool': {'driver': {
+                'name': 'quick_validate',
+                'rules': [{'id': rule, 'shortDescription': {'text': text}} for rule, text in RULES.items()],
+            }},
+            'results': sarif_results,
+        }],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate skill folders")
+    parser.add_argument('paths', nargs='+', help="Skill folders or marketplace roots")
+    parser.add_argument('--format', choices=('text', 'json', 'sarif'), default='text', help="Output format")
+    parser.add_argument('--jobs', '-j', type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help=f"Result cache file (default: {DEFAULT_CACHE})")
+    parser.add_argument('--no-cache', action='store_true', help="Neither read nor write the cache")
+    args = parser.parse_args()
+
+    # A single skill keeps the original behaviour: one message, no cache file.
+    if len(args.paths) == 1 and args.format == 'text' and not (Path(args.paths[0]) / '.claude-plugin').is_dir():
+        valid, message = validate_skill(args.paths[0])
+        print(message)
+        sys.exit(0 if valid else 1)
+
+    results = validate_skills(expand_paths(args.paths), args.jobs, None if args.no_cache else args.cache)
+    if args.format == 'json':
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    elif args.format == 'sarif':
+        print(json.dumps(to_sarif(results), indent=2, ensure_ascii=False))
+    else:
+        for result in results:
+            print(f"{'✅' if result['valid'] else '❌'} {result['path']}")
+            for error in result['errors']:
+                print(f"   - {error['message']}")
+        failed = sum(not result['valid'] for result in results)
+        print(f"\n{len(results) - failed} valid, {failed} invalid")
+    sys.exit(0 if all(result['valid'] for result in results) else 1)
+
+
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python quick_validate.py <skill_directory>")
-        sys.exit(1)
-    
-    valid, message = validate_skill(sys.argv[1])
-    print(message)
-    sys.exit(0 if valid else 1)
\ No newline at end of file
+    main()
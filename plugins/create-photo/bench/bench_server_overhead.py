@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图像服务本地开销微基准
+分阶段计时每个请求在上游延迟之外的本地开销，并与基线文件对比，超过阈值即判定为性能回退
+
+阶段:
+    flask_parse        Flask 解析 /txt2img 请求体（request.get_json）
+    jsonify_b64        jsonify 包含大段 base64 的响应
+    sd_reencode        stable_diffusion_api.encode_image_base64：PIL 解码、PNG 重新编码、base64
+    glm_stream_parse   b64_stream.parse_image_response：流式解析上游响应并解码到临时文件
+    save_b64           save_png_from_url.save_image_from_dict：base64 解码 + PIL 保存 PNG
+    save_handle        save_png_from_url.save_image_from_dict：已解码文件句柄直接写盘
+
+用法:
+    python bench_server_overhead.py                                # 与 baseline.json 对比
+    python bench_server_overhead.py --update-baseline              # 记录新的基线（基线文件不存在时必须显式指定）
+    python bench_server_overhead.py --sizes 512,1024 --samples 1 --threshold 0.3 --output result.json
+"""
+
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from PIL import Image
+
+BENCH_DIR = Path(__file__).resolve().parent
+SKILLS_DIR = BENCH_DIR.parent / "skills"
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+sys.path.insert(0, str(SKILLS_DIR / "glm-image"))
+sys.path.insert(0, str(SKILLS_DIR / "nano-banana-api" / "scripts"))
+
+
+def make_png(side):
+    """生成接近真实照片压缩率的测试图（低频渐变叠加高斯噪声）"""
+    channels = []
+    for sigma in (24, 32, 40):
+        gradient = Image.linear_gradient("L").resize((side, side))
+        noise = Image.effect_noise((side, side), sigma)
+        channels.append(Image.blend(gradient, noise, 0.35))
+    buffered = io.BytesIO()
+    Image.merge("RGB", channels).save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def time_stage(func, repeat):
+    """运行 repeat 次，返回各次耗时（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def build_stages(png, samples, workdir):
+    """返回 {阶段名: 可调用对象}；依赖缺失的阶段会被跳过并提示"""
+    stages = {}
+    b64 = base64.b64encode(png).decode("ascii")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import glm_image_api
+        import save_png_from_url
+        import b64_stream
+    app = glm_image_api.app
+
+    request_body = json.dumps({"prompt": "a cute cartoon cat, white background", "negative_prompt": "blurry",
+                               "width": 1024, "height": 1024, "samples": samples}).encode("utf-8")
+
+    def flask_parse():
+        with app.test_request_context("/txt2img", method="POST", data=request_body,
+                                      content_type="application/json"):
+            from flask import request
+            request.get_json()
+    stages["flask_parse"] = flask_parse
+
+    response_images = [{"base64": b64, "url": None} for _ in range(samples)]
+
+    def jsonify_b64():
+        with app.app_context():
+            glm_image_api.jsonify({"prompt": "p", "images": response_images, "count": samples}).get_data()
+    stages["jsonify_b64"] = jsonify_b64
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            import stable_diffusion_api
+    except (ImportError, SystemExit):
+        print("WARN   未安装 stability-sdk，跳过 sd_reencode 阶段")
+    else:
+        def sd_reencode():
+            for _ in range(samples):
+                stable_diffusion_api.encode_image_base64(png)
+        stages["sd_reencode"] = sd_reencode
+
+    upstream_body = json.dumps({"id": "bench0001", "data": [{"b64_image": b64} for _ in range(samples)]}).encode("utf-8")
+
+    def glm_stream_parse():
+        chunks = (upstream_body[i:i + 65536] for i in range(0, len(upstream_body), 65536))
+        _, handles = b64_stream.parse_image_response(chunks)
+        for handle in handles:
+            handle.close()
+    stages["glm_stream_parse"] = glm_stream_parse
+
+    def save_b64():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(samples):
+                save_png_from_url.save_image_from_dict({"base64": b64}, "bench0001", f"b64_{i}", workdir)
+    stages["save_b64"] = save_b64
+
+    def save_handle():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(samples):
+                save_png_from_url.save_image_from_dict({"file": io.BytesIO(png)}, "bench0001", f"file_{i}", workdir)
+    stages["save_handle"] = save_handle
+
+    return stages
+
+
+def run(sizes, sample_counts, repeat):
+    """运行所有阶段，返回 {"阶段@尺寸xN": 统计}"""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for side in sizes:
+            png = make_png(side)
+            print(f"🖼️  {side}x{side}（PNG {len(png) / 1048576:.1f} MB）")
+            for samples in sample_counts:
+                for name, func in build_stages(png, samples, workdir).items():
+                    func()  # 预热
+                    timings = time_stage(func, repeat)
+                    key = f"{name}@{side}x{side}x{samples}"
+                    results[key] = {
+                        "median_ms": statistics.median(timings),
+                        "min_ms": min(timings),
+                        "max_ms": max(timings),
+                        "runs": repeat,
+                        "payload_bytes": len(png) * samples,
+                    }
+                    print(f"   {key:<36} median {results[key]['median_ms']:9.2f} ms  min {results[key]['min_ms']:9.2f} ms")
+    return results
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """与基线对比，返回回退列表"""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        delta = current["median_ms"] - previous["median_ms"]
+        if delta > min_delta_ms and current["median_ms"] > previous["median_ms"] * (1 + threshold):
+            regressions.append((key, previous["median_ms"], current["median_ms"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图像服务本地开销微基准")
+    parser.add_argument("--sizes", default="512,1024,2048,4096", help="图像边长列表 (默认: 512,1024,2048,4096)")
+    parser.add_argument("--samples", default="1,4", help="每个请求的图像数量列表 (默认: 1,4)")
+    parser.add_argument("--repeat", type=int, default=5, help="每个阶段的重复次数 (默认: 5)")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="基线文件 (默认: bench/baseline.json)")
+    parser.add_argument("--update-baseline", action="store_true", help="把本次结果写入基线文件")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="相对基线中位数允许的变慢比例 (默认: 0.25)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="小于该绝对差值（毫秒）的变化视为噪声 (默认: 1.0)")
+    parser.add_argument("--output", default=None, help="本次结果 JSON 输出路径")
+    args = parser.parse_args()
+
+    baseline_path = Path(args.baseline)
+    if not args.update_baseline and not baseline_path.exists():
+        # 不自动生成基线：路径写错时 CI 会一直“通过”
+        print(f"❌ 基线文件不存在: {baseline_path}（首次运行请加 --update-baseline 记录基线）")
+        return 2
+
+    sizes = [int(v) for v in args.sizes.split(",")]
+    sample_counts = [int(v) for v in args.samples.split(",")]
+    results = run(sizes, sample_counts, args.repeat)
+
+    document = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pillow": Image.__version__,
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(document, indent=2), encoding="utf-8")
+
+    if args.update_baseline:
+        if baseline_path.exists():
+            # 只覆盖本次运行到的条目，保留其它尺寸的历史基线
+            previous = json.loads(baseline_path.read_text(encoding="utf-8"))
+            previous["results"].update(results)
+            previous["meta"] = document["meta"]
+            document = previous
+        baseline_path.write_text(json.dumps(document, indent=2), encoding="utf-8")
+        print(f"✅ 基线已写入: {baseline_path}")
+        return 0
+
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))["results"]
+    missing = [key for key in results if key not in baseline]
+    if len(missing) == len(results):
+        print(f"❌ 基线中没有本次运行的任何阶段，无法对比: {baseline_path}")
+        return 2
+    for key in missing:
+        print(f"WARN   基线中没有 {key}，未对比")
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+    if regressions:
+        print(f"❌ {len(regressions)} 个阶段超过基线 {args.threshold * 100:.0f}%:")
+        for key, before, after in regressions:
+            print(f"   {key:<36} {before:9.2f} ms -> {after:9.2f} ms (+{(after / before - 1) * 100:.0f}%)")
+        return 1
+    print(f"✅ 所有阶段均在基线 {args.threshold * 100:.0f}% 以内")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线上游桩服务与录制/回放工具
+在没有真实 API 密钥和网络波动的机器上，对 glm_image_api.py 和 stable_diffusion_api.py 做可复现的性能测试
+
+用法:
+    # GLM images/generations 桩服务（配合 GLM_API_URL 使用）
+    python stub_upstreams.py glm --port 8801 --latency lognormal:0.8,0.3 --error-rate 0.02
+    GLM_API_URL=http://127.0.0.1:8801/api/paas/v4/images/generations python glm_image_api.py server
+
+    # 录制一次真实响应，之后离线回放
+    python stub_upstreams.py glm --record https://open.bigmodel.cn/api/paas/v4/images/generations --cassettes cassettes/glm
+    python stub_upstreams.py glm --replay --cassettes cassettes/glm
+
+    # 使用伪造的 Stability generate 流启动 stable_diffusion_api 服务
+    python stub_upstreams.py stability --port 5000 --latency uniform:1,3 --filter-rate 0.05
+    python stub_upstreams.py stability --record --cassettes cassettes/sd --api-key YOUR_KEY
+    python stub_upstreams.py stability --replay --cassettes cassettes/sd
+
+延迟分布格式: fixed:秒 | uniform:最小,最大 | normal:均值,标准差 | lognormal:中位数,sigma（中位数单位秒，sigma 为对数空间的标准差）
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+
+SKILLS_DIR = Path(__file__).resolve().parent.parent / "skills"
+
+
+def parse_latency(spec):
+    """解析延迟分布描述，返回 f(rng) -> 秒"""
+    kind, _, params = (spec or "fixed:0").partition(":")
+    values = [float(v) for v in params.split(",") if v] if params else []
+    if kind == "fixed":
+        seconds = values[0] if values else 0.0
+        return lambda rng: seconds
+    if kind == "uniform":
+        low, high = values
+        return lambda rng: rng.uniform(low, high)
+    if kind == "normal":
+        mean, stddev = values
+        return lambda rng: max(0.0, rng.gauss(mean, stddev))
+    if kind == "lognormal":
+        median, sigma = values  # 中位数 e^mu，换算成对数空间的 mu
+        return lambda rng: rng.lognormvariate(math.log(median) if median > 0 else 0.0, sigma)
+    raise ValueError(f"未知的延迟分布: {spec}")
+
+
+class Behaviour:
+    """桩服务的可配置行为：延迟、错误注入、负载大小；随机数带种子，结果可复现"""
+
+    def __init__(self, latency="fixed:0", error_rate=0.0, error_status=500, filter_rate=0.0,
+                 payload_bytes=None, seed=0):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.filter_rate = filter_rate
+        self.payload_bytes = payload_bytes
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._images = {}
+        self._images_lock = threading.Lock()
+
+    def draw(self):
+        """抽取一次请求的 (延迟, 是否注入错误, 是否被内容过滤)"""
+        with self._lock:
+            return (self.latency(self._rng),
+                    self._rng.random() < self.error_rate,
+                    self._rng.random() < self.filter_rate)
+
+    def image(self, width, height):
+        """返回 PNG 图像字节；指定 payload_bytes 时按字节数生成，否则按请求尺寸生成（结果缓存）"""
+        if self.payload_bytes:
+            # 噪声图 PNG 几乎不可压缩，RGB 每像素约 3 字节
+            side = max(1, int(math.sqrt(self.payload_bytes / 3)))
+            width = height = side
+        key = (width, height)
+        with self._images_lock:
+            cached = self._images.get(key)
+        if cached is None:
+            rng = random.Random(width * 100003 + height)
+            raw = rng.randbytes(width * height * 3)
+            buffered = BytesIO()
+            Image.frombytes("RGB", (width, height), raw).save(buffered, format="PNG", compress_level=1)
+            cached = buffered.getvalue()
+            with self._images_lock:
+                self._images[key] = cached
+        return cached
+
+
+def request_key(body):
+    """请求的规范化哈希，用作录制文件名"""
+    try:
+        canonical = json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False)
+    except ValueError:
+        canonical = body.decode("utf-8", "replace")
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+# ---------------------------------------------------------------------------
+# GLM images/generations 桩服务
+# ---------------------------------------------------------------------------
+
+def make_glm_handler(behaviour, mode, cassettes, upstream):
+    """构造 GLM 桩服务的请求处理类
+
+    mode: synthetic（按配置合成响应）/ record（转发到真实上游并录制）/ replay（回放录制结果）
+    """
+    files = {}
+    files_lock = threading.Lock()
+    if cassettes:
+        cassettes.mkdir(parents=True, exist_ok=True)
+
+    class GlmStubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body, content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_json(self, status, data):
+            self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+        def do_GET(self):
+            # url 格式响应的图片下载地址
+            name = self.path.rsplit("/", 1)[-1]
+            with files_lock:
+                data = files.get(name)
+            if data is None:
+                self._send_json(404, {"error": {"code": "404", "message": "not found"}})
+            else:
+                self._send(200, data, "image/png")
+
+        def do_POST(self):
+            if not self.path.endswith("/images/generations"):
+                self._send_json(404, {"error": {"code": "404", "message": "not found"}})
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            key = request_key(body)
+
+            if mode == "record":
+                self._record(body, key)
+            elif mode == "replay":
+                self._replay(key)
+            else:
+                self._synthetic(body)
+
+        def _synthetic(self, body):
+            request = json.loads(body)
+            latency, fail, filtered = behaviour.draw()
+            time.sleep(latency)
+            if fail:
+                self._send_json(behaviour.error_status, {
+                    "error": {"code": "1302" if behaviour.error_status == 429 else "500",
+                              "message": "injected error"}})
+                return
+            if filtered:
+                self._send_json(400, {"error": {"code": "1301", "message": "系统检测到输入或生成内容可能包含不安全或敏感内容"}})
+                return
+
+            width, height = (int(v) for v in request.get("size", "1024x1024").split("x"))
+            png = behaviour.image(width, height)
+            data = []
+            for _ in range(int(request.get("n", 1))):
+                if self.server.url_mode:
+                    name = f"{hashlib.sha1(png).hexdigest()[:16]}.png"
+                    with files_lock:
+                        files[name] = png
+                    host, port = self.server.server_address[:2]
+                    data.append({"url": f"http://{host}:{port}/files/{name}"})
+                else:
+                    data.append({"b64_image": base64.b64encode(png).decode("ascii")})
+            self._send_json(200, {"id": f"stub{int(time.time() * 1000)}", "created": int(time.time()), "data": data})
+
+        def _record(self, body, key):
+            headers = {"Content-Type": "application/json"}
+            if self.headers.get("Authorization"):
+                headers["Authorization"] = self.headers["Authorization"]
+            started = time.perf_counter()
+            req = urllib.request.Request(upstream, data=body, headers=headers, method="POST")
+            try:
+                with urllib.request.urlopen(req, timeout=300) as response:
+                    status, payload = response.status, response.read()
+            except urllib.error.HTTPError as e:
+                status, payload = e.code, e.read()
+            latency = time.perf_counter() - started
+            (cassettes / f"{key}.json").write_text(json.dumps({
+                "status": status, "latency": latency, "body": payload.decode("utf-8"),
+            }, ensure_ascii=False), encoding="utf-8")
+            print(f"📼 已录制 {key} (状态码 {status}, {latency:.2f}s)")
+            self._send(status, payload)
+
+        def _replay(self, key):
+            cassette = cassettes / f"{key}.json"
+            if not cassette.exists():
+                self._send_json(404, {"error": {"code": "404", "message": f"no cassette for {key}"}})
+                return
+            recorded = json.loads(cassette.read_text(encoding="utf-8"))
+            latency, _, _ = behaviour.draw()
+            time.sleep(recorded["latency"] if self.server.recorded_latency else latency)
+            self._send(recorded["status"], recorded["body"].encode("utf-8"))
+
+    return GlmStubHandler
+
+
+def serve_glm(args):
+    behaviour = Behaviour(args.latency, args.error_rate, args.error_status or 500, args.filter_rate,
+                          args.payload_bytes, args.seed)
+    mode = "record" if args.record else "replay" if args.replay else "synthetic"
+    cassettes = Path(args.cassettes) if args.cassettes else None
+    if mode != "synthetic" and cassettes is None:
+        print("ERROR  录制/回放模式需要 --cassettes 目录")
+        return 1
+
+    handler = make_glm_handler(behaviour, mode, cassettes, args.record)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    server.url_mode = args.url
+    server.recorded_latency = args.recorded_latency
+    print(f"🧪 GLM 桩服务 ({mode}) 已启动: http://{args.host}:{args.port}/api/paas/v4/images/generations")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+# ---------------------------------------------------------------------------
+# Stability generate 流的伪造实现
+# ---------------------------------------------------------------------------
+
+def _generation():
+    import stability_sdk.interfaces.gooseai.generation.generation_pb2 as generation
+    return generation
+
+
+# --error-status 在 Stability 桩中映射为语义对应的 gRPC 状态
+GRPC_STATUS = {
+    400: "INVALID_ARGUMENT",
+    401: "UNAUTHENTICATED",
+    403: "PERMISSION_DENIED",
+    404: "NOT_FOUND",
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    501: "UNIMPLEMENTED",
+    503: "UNAVAILABLE",
+    504: "DEADLINE_EXCEEDED",
+}
+
+
+class FakeRpcError(Exception):
+    """模拟 gRPC 错误，提供与 grpc.RpcError 相同的 code()/details() 接口"""
+
+    def __init__(self, code_name, details):
+        import grpc
+        super().__init__(details)
+        self._code = getattr(grpc.StatusCode, code_name)
+        self._details = details
+
+    def code(self):
+        return self._code
+
+    def details(self):
+        return self._details
+
+
+class FakeStabilityInference:
+    """替代 client.StabilityInference，generate() 按配置的延迟、错误和过滤率返回真实的 Answer 消息"""
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+
+    def generate(self, prompt, width=512, height=512, samples=1, **kwargs):
+        generation = _generation()
+        latency, fail, filtered = self.behaviour.draw()
+        time.sleep(latency)
+        if fail:
+            raise FakeRpcError(GRPC_STATUS[self.behaviour.error_status], "injected error")
+        if width % 64 or height % 64:
+            raise FakeRpcError("INVALID_ARGUMENT", "width and height must be multiples of 64")
+        png = self.behaviour.image(width, height)
+        for _ in range(samples):
+            if filtered:
+                artifact = generation.Artifact(type=generation.ARTIFACT_IMAGE, binary=b"",
+                                               finish_reason=generation.FILTER)
+            else:
+                artifact = generation.Artifact(type=generation.ARTIFACT_IMAGE, binary=png,
+                                               finish_reason=generation.NULL)
+            yield generation.Answer(artifacts=[artifact])
+
+
+def _stability_key(prompt, kwargs):
+    data = {"prompt": prompt}
+    data.update({k: v for k, v in kwargs.items() if isinstance(v, (str, int, float, list))})
+    return request_key(json.dumps(data, sort_keys=True).encode("utf-8"))
+
+
+class RecordingStabilityInference:
+    """包装真实客户端：透传 generate() 并把每个 Answer 序列化保存"""
+
+    def __init__(self, client, cassettes):
+        self.client = client
+        self.cassettes = Path(cassettes)
+        self.cassettes.mkdir(parents=True, exist_ok=True)
+
+    def generate(self, prompt, **kwargs):
+        key = _stability_key(prompt, kwargs)
+        started = time.perf_counter()
+        answers = [answer.SerializeToString() for answer in self.client.generate(prompt=prompt, **kwargs)]
+        latency = time.perf_counter() - started
+        (self.cassettes / f"{key}.json").write_text(json.dumps({
+            "latency": latency,
+            "answers": [base64.b64encode(a).decode("ascii") for a in answers],
+        }), encoding="utf-8")
+        print(f"📼 已录制 {key} ({len(answers)} 个结果, {latency:.2f}s)")
+        generation = _generation()
+        for raw in answers:
+            yield generation.Answer.FromString(raw)
+
+
+class ReplayStabilityInference:
+    """回放录制的 Answer；recorded_latency 为 True 时按录制时的耗时等待，否则按 behaviour 抽取"""
+
+    def __init__(self, cassettes, behaviour, recorded_latency=False):
+        self.cassettes = Path(cassettes)
+        self.behaviour = behaviour
+        self.recorded_latency = recorded_latency
+
+    def generate(self, prompt, **kwargs):
+        key = _stability_key(prompt, kwargs)
+        cassette = self.cassettes / f"{key}.json"
+        if not cassette.exists():
+            raise FakeRpcError("NOT_FOUND", f"no cassette for {key}")
+        recorded = json.loads(cassette.read_text(encoding="utf-8"))
+        latency, _, _ = self.behaviour.draw()
+        time.sleep(recorded["latency"] if self.recorded_latency else latency)
+        generation = _generation()
+        for raw in recorded["answers"]:
+            yield generation.Answer.FromString(base64.b64decode(raw))
+
+
+def serve_stability(args):
+    """以伪造/录制/回放的上游启动 stable_diffusion_api 的 Flask 应用"""
+    error_status = args.error_status or 503
+    if error_status not in GRPC_STATUS:
+        print(f"ERROR  --error-status {error_status} 没有对应的 gRPC 状态，可选: "
+              + ", ".join(str(code) for code in GRPC_STATUS))
+        return 1
+
+    sys.path.insert(0, str(SKILLS_DIR / "nano-banana-api" / "scripts"))
+    import stable_diffusion_api
+
+    behaviour = Behaviour(args.latency, args.error_rate, error_status, args.filter_rate,
+                          args.payload_bytes, args.seed)
+    if (args.record or args.replay) and not args.cassettes:
+        print("ERROR  录制/回放模式需要 --cassettes 目录")
+        return 1
+    if args.record:
+        from stability_sdk import client
+        api_key = args.api_key or os.getenv("STABILITY_API_KEY")
+        if not api_key:
+            print("ERROR  录制模式需要真实的 STABILITY_API_KEY 或 --api-key")
+            return 1
+        real = client.StabilityInference(key=api_key, engine="stable-diffusion-xl-1024-v1-0")
+        upstream = RecordingStabilityInference(real, args.cassettes)
+        mode = "record"
+    elif args.replay:
+        upstream = ReplayStabilityInference(args.cassettes, behaviour, args.recorded_latency)
+        mode = "replay"
+    else:
+        upstream = FakeStabilityInference(behaviour)
+        mode = "synthetic"
+
+    stable_diffusion_api.STABILITY_API_KEY = stable_diffusion_api.STABILITY_API_KEY or "stub"
+    stable_diffusion_api.stability_api = upstream
+    print(f"🧪 Stable Diffusion API（{mode} 上游）已启动: http://{args.host}:{args.port}")
+    stable_diffusion_api.app.run(host=args.host, port=args.port, threaded=True)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线上游桩服务与录制/回放工具")
+    subparsers = parser.add_subparsers(dest="upstream", required=True)
+
+    for name, default_port, help_text in (
+            ("glm", 8801, "GLM images/generations HTTP 桩服务"),
+            ("stability", 5000, "使用伪造 Stability 上游的 stable_diffusion_api 服务")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--host", default="127.0.0.1", help="监听地址 (默认: 127.0.0.1)")
+        sub.add_argument("--port", type=int, default=default_port, help=f"监听端口 (默认: {default_port})")
+        sub.add_argument("--latency", default="fixed:0", help="延迟分布 (默认: fixed:0)")
+        sub.add_argument("--error-rate", type=float, default=0.0, help="注入错误的概率 (默认: 0)")
+        sub.add_argument("--error-status", type=int, default=None,
+                         help="注入错误的 HTTP 状态码 (glm 默认: 500；stability 映射为 gRPC 状态，默认 503 即 UNAVAILABLE)")
+        sub.add_argument("--filter-rate", type=float, default=0.0, help="内容过滤的概率 (默认: 0)")
+        sub.add_argument("--payload-bytes", type=int, default=None,
+                         help="图像大小（字节），默认按请求尺寸生成")
+        sub.add_argument("--seed", type=int, default=0, help="随机种子，保证结果可复现 (默认: 0)")
+        sub.add_argument("--replay", action="store_true", help="回放 --cassettes 中录制的响应")
+        sub.add_argument("--recorded-latency", action="store_true", help="回放时使用录制时的真实耗时")
+        sub.add_argument("--cassettes", default=None, help="录制文件目录")
+
+    subparsers.choices["glm"].add_argument("--record", metavar="UPSTREAM_URL", default=None,
+                                           help="转发到真实上游并录制响应")
+    subparsers.choices["glm"].add_argument("--url", action="store_true",
+                                           help="以 url 形式返回图像（默认 b64_image）")
+    subparsers.choices["stability"].add_argument("--record", action="store_true",
+                                                 help="调用真实 Stability API 并录制响应")
+    subparsers.choices["stability"].add_argument("--api-key", default=None, help="录制模式使用的 API 密钥")
+
+    args = parser.parse_args()
+    if args.upstream == "glm":
+        return serve_glm(args)
+    return serve_stability(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Idempotency-Key 支持
+带相同幂等键的重试请求会挂到正在进行的生成上，或在保留期内直接返回已存储的结果，避免重复计费
+"""
+
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, current_app, jsonify, request
+
+HEADER = "Idempotency-Key"
+CLIENT_HEADER = "X-Client-Id"
+MAX_KEY_LENGTH = 255
+MAX_BYTES = 256 * 1024 * 1024
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "done", "response", "expires_at", "size")
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.response = None
+        self.expires_at = None
+        self.size = 0
+
+
+class IdempotencyStore:
+    """按 (客户端, 幂等键) 保存进行中和已完成的请求，带保留期和按响应体总字节数的 LRU 容量上限
+
+    只淘汰已完成的条目；进行中的条目不占用容量，也不会被淘汰（否则重试会重复生成）
+    """
+
+    def __init__(self, ttl=3600, max_bytes=MAX_BYTES, wait_timeout=300):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"started": 0, "replayed": 0, "attached": 0, "conflicts": 0, "evictions": 0}
+
+    def begin(self, scoped_key, fingerprint):
+        """返回 (entry, is_owner)；is_owner 为 True 时由调用方执行实际生成"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(scoped_key)
+            if entry is not None and entry.expires_at is not None and entry.expires_at <= now:
+                del self._entries[scoped_key]
+                self._bytes -= entry.size
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(scoped_key)
+                if entry.fingerprint != fingerprint:
+                    self._counters["conflicts"] += 1
+                elif entry.done.is_set():
+                    self._counters["replayed"] += 1
+                else:
+                    self._counters["attached"] += 1
+                return entry, False
+
+            entry = _Entry(fingerprint)
+            self._entries[scoped_key] = entry
+            self._counters["started"] += 1
+            return entry, True
+
+    def finish(self, scoped_key, entry, response, keep=True):
+        """记录结果并唤醒等待者；keep 为 False 时不保留（服务端错误允许客户端重试）"""
+        entry.response = response
+        entry.expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            entry.done.set()
+            if self._entries.get(scoped_key) is not entry:
+                return
+            if not keep:
+                del self._entries[scoped_key]
+                return
+            entry.size = len(response[1])
+            self._bytes += entry.size
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """从最久未使用的一端淘汰已完成的条目，直到总字节数回到上限以内（调用方持有锁）"""
+        for key, entry in list(self._entries.items()):
+            if self._bytes <= self.max_bytes:
+                break
+            if entry.done.is_set():
+                del self._entries[key]
+                self._bytes -= entry.size
+                self._counters["evictions"] += 1
+
+    def stats(self):
+        """计数器快照"""
+        with self._lock:
+            return dict(self._counters, size=len(self._entries), bytes=self._bytes,
+                        ttl=self.ttl, max_bytes=self.max_bytes)
+
+
+def _replay(stored):
+    status, body, mimetype = stored
+    response = Response(body, status=status, mimetype=mimetype)
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _fingerprint():
+    """请求体指纹：JSON 按键排序后再哈希，键顺序或空白不同的同一请求视为相同"""
+    parsed = request.get_json(silent=True)
+    if parsed is None:
+        body = request.get_data()
+    else:
+        body = json.dumps(parsed, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(body).hexdigest()
+
+
+def idempotent(store):
+    """Flask 视图装饰器：为带 Idempotency-Key 请求头的请求提供幂等语义
+
+    幂等键按 (客户端 IP, X-Client-Id 请求头) 隔离：X-Client-Id 由调用方自行填写，只用于在同一 IP 内
+    进一步区分，不能借此访问其他 IP 的结果。部署在反向代理之后时所有请求的 IP 相同，
+    此时必须由代理设置（覆盖）X-Client-Id，否则同一代理后的调用方可以互相重放结果。
+    同一键对应不同请求体时返回 422；5xx 结果不保留，重试会重新生成。
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify({"error": f"{HEADER} 长度不能超过 {MAX_KEY_LENGTH}"}), 400
+
+            scoped_key = (request.remote_addr or "", request.headers.get(CLIENT_HEADER, ""), key)
+            fingerprint = _fingerprint()
+
+            entry, is_owner = store.begin(scoped_key, fingerprint)
+            if entry.fingerprint != fingerprint:
+                return jsonify({"error": f"{HEADER} 已用于不同的请求内容"}), 422
+
+            if not is_owner:
+                # 挂到进行中的生成上，或直接返回已存储的结果
+                if not entry.done.wait(store.wait_timeout):
+                    return jsonify({"error": "相同幂等键的请求仍在处理中，请稍后重试"}), 409
+                return _replay(entry.response)
+
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            except Exception:
+                store.finish(scoped_key, entry,
+                             (500, b'{"error": "request failed"}', "application/json"), keep=False)
+                raise
+            stored = (response.status_code, response.get_data(), response.mimetype)
+            store.finish(scoped_key, entry, stored, keep=response.status_code < 500)
+            return response
+        return wrapper
+    return decorator
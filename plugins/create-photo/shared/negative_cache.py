@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+确定性失败的负结果缓存
+被内容审核拦截、参数校验失败等请求重复提交时直接返回缓存的错误，不再请求上游
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# 各错误类别的默认缓存时间（秒），0 表示不缓存
+DEFAULT_TTLS = {
+    "content_filter": 300,
+    "invalid_param": 600,
+}
+
+
+class NegativeCache:
+    """按规范化请求缓存确定性错误，带 TTL 和 LRU 容量上限"""
+
+    def __init__(self, ttls=None, max_entries=1024):
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "evictions": 0}
+        self._hits_by_class = {}
+
+    @staticmethod
+    def key(request_data):
+        """规范化请求（键排序的 JSON）的 SHA-256"""
+        canonical = json.dumps(request_data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """返回缓存的错误，未命中或已过期时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            expires_at, error_class, error = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            self._hits_by_class[error_class] = self._hits_by_class.get(error_class, 0) + 1
+            return error
+
+    def put(self, key, error_class, error):
+        """缓存一个确定性错误；未配置 TTL 的错误类别不缓存"""
+        ttl = self.ttls.get(error_class, 0)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, error_class, error)
+            self._entries.move_to_end(key)
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def stats(self):
+        """计数器快照"""
+        with self._lock:
+            return dict(self._counters, size=len(self._entries),
+                        hits_by_class=dict(self._hits_by_class), ttls=dict(self.ttls))
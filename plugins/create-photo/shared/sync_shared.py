@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+同步共享模块到各技能目录
+tracing.py、negative_cache.py、idempotency.py 只在 shared/ 中维护；每个技能需要能单独打包和安装，
+因此由本脚本生成各技能内的副本（带“生成文件”标记），修改源文件后重新运行即可
+
+用法:
+    python shared/sync_shared.py           # 重新生成所有副本
+    python shared/sync_shared.py --check   # 只检查副本是否与源文件一致（打包/CI 前运行），不一致时退出码为 1
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+SHARED_DIR = Path(__file__).resolve().parent
+PLUGIN_DIR = SHARED_DIR.parent
+
+# 源文件 -> 需要副本的技能目录（相对插件根目录）
+MODULES = {
+    "tracing.py": ["skills/glm-image", "skills/nano-banana-api/scripts"],
+    "negative_cache.py": ["skills/glm-image", "skills/nano-banana-api/scripts"],
+    "idempotency.py": ["skills/glm-image", "skills/nano-banana-api/scripts"],
+}
+
+MARKER = "# 生成文件，请勿直接修改：源文件为 plugins/create-photo/shared/{name}，改完运行 shared/sync_shared.py\n"
+
+
+def render(name):
+    """生成副本内容：在源文件的 shebang 之后插入生成标记"""
+    source = (SHARED_DIR / name).read_text(encoding="utf-8")
+    first, sep, rest = source.partition("\n")
+    if first.startswith("#!"):
+        return first + sep + MARKER.format(name=name) + rest
+    return MARKER.format(name=name) + source
+
+
+def sync(check=False):
+    """生成或检查所有副本，返回不一致（或已更新）的副本路径列表"""
+    stale = []
+    for name, targets in MODULES.items():
+        content = render(name)
+        for target in targets:
+            path = PLUGIN_DIR / target / name
+            try:
+                current = path.read_text(encoding="utf-8")
+            except FileNotFoundError:
+                current = None
+            if current == content:
+                continue
+            stale.append(path)
+            if not check:
+                path.write_text(content, encoding="utf-8")
+    return stale
+
+
+def main():
+    parser = argparse.ArgumentParser(description="同步 shared/ 中的共享模块到各技能目录")
+    parser.add_argument("--check", action="store_true", help="只检查副本是否最新，不写文件")
+    args = parser.parse_args()
+
+    stale = sync(check=args.check)
+    for path in stale:
+        rel = path.relative_to(PLUGIN_DIR)
+        print(f"ERROR  副本已过期: {rel}" if args.check else f"OK 已更新: {rel}")
+    if args.check and stale:
+        print("请运行 python shared/sync_shared.py 重新生成副本")
+        return 1
+    if not stale:
+        print("OK 所有副本均为最新")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
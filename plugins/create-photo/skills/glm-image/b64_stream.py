@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+GLM Image API 响应的流式解析
+逐块扫描 JSON 响应体，把 b64_image 字段直接解码写入临时文件，避免整段 base64 常驻内存
+"""
+
+import base64
+import json
+import tempfile
+
+# 解码后的图像超过该大小时从内存转存到磁盘临时文件
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+B64_KEY = b'"b64_image"'
+
+_OUTSIDE, _STRING, _B64 = range(3)
+
+
+class _B64Sink:
+    """增量 base64 解码器，输出到 SpooledTemporaryFile"""
+
+    def __init__(self, spool_max_size):
+        self.file = tempfile.SpooledTemporaryFile(max_size=spool_max_size)
+        self.pending = b""
+
+    def feed(self, data):
+        # JSON 允许把 "/" 转义为 "\/"；块边界可能截断转义序列，末尾的反斜杠留到下一块处理
+        data = self.pending + data
+        if data.endswith(b"\\"):
+            data, tail = data[:-1], b"\\"
+        else:
+            tail = b""
+        if b"\\" in data:
+            data = data.replace(b"\\/", b"/").replace(b"\\n", b"").replace(b"\\r", b"")
+        data = data.translate(None, b" \t\r\n")
+        usable = len(data) // 4 * 4
+        if usable:
+            self.file.write(base64.b64decode(data[:usable]))
+        self.pending = data[usable:] + tail
+
+    def close(self):
+        if self.pending:
+            self.file.write(base64.b64decode(self.pending))
+            self.pending = b""
+        self.file.seek(0)
+        return self.file
+
+
+def parse_image_response(chunks, spool_max_size=SPOOL_MAX_SIZE):
+    """流式解析图像生成响应
+
+    除 b64_image 外的字段体积很小，按字节扫描并保留到骨架 JSON 中；
+    b64_image 的值被替换为整数下标，对应的图像数据解码写入返回的文件句柄。
+
+    Args:
+        chunks: 响应体字节块迭代器（例如 response.iter_content()）
+        spool_max_size: 单张图像在内存中缓存的最大字节数
+
+    Returns:
+        (dict, list): 解析后的响应字典，解码后图像的文件句柄列表（由调用方关闭）
+
+    Raises:
+        ValueError: 响应体不完整或不是合法 JSON；此时已创建的句柄均已关闭
+    """
+    skeleton = bytearray()
+    handles = []
+    state = _OUTSIDE
+    token = bytearray()
+    last_string = None
+    expect_b64 = False
+    escaped = False
+    sink = None
+
+    try:
+        for chunk in chunks:
+            pos = 0
+            size = len(chunk)
+            while pos < size:
+                if state == _B64:
+                    # base64 字符集中不会出现引号，遇到的第一个引号即字符串结束
+                    end = chunk.find(b'"', pos)
+                    if end == -1:
+                        sink.feed(chunk[pos:])
+                        break
+                    sink.feed(chunk[pos:end])
+                    handles.append(sink.close())
+                    skeleton += str(len(handles) - 1).encode("ascii")
+                    sink = None
+                    state = _OUTSIDE
+                    pos = end + 1
+                    continue
+
+                byte = chunk[pos:pos + 1]
+                pos += 1
+                if state == _STRING:
+                    token += byte
+                    if escaped:
+                        escaped = False
+                    elif byte == b"\\":
+                        escaped = True
+                    elif byte == b'"':
+                        skeleton += token
+                        last_string = bytes(token)
+                        state = _OUTSIDE
+                elif byte == b'"':
+                    if expect_b64:
+                        sink = _B64Sink(spool_max_size)
+                        state = _B64
+                        expect_b64 = False
+                    else:
+                        token = bytearray(byte)
+                        state = _STRING
+                else:
+                    if byte == b":":
+                        expect_b64 = last_string == B64_KEY
+                    elif not byte.isspace():
+                        expect_b64 = False
+                        last_string = None
+                    skeleton += byte
+
+        if state != _OUTSIDE:
+            raise ValueError("响应体不完整")
+        return json.loads(skeleton.decode("utf-8")), handles
+    except BaseException:
+        # 解析失败时调用方拿不到句柄，已解码的临时文件在这里关闭
+        for handle in handles:
+            handle.close()
+        if sink is not None:
+            sink.file.close()
+        raise
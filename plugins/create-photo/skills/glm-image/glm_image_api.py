@@ -6,25 +6,56 @@ GLM Image API 服务器
 
 import os
 import sys
+import json
+import base64
+import math
+import time
+import hashlib
 import argparse
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 from flask import Flask, request, jsonify
 from pathlib import Path
 
+import b64_stream
+import tracing
+from negative_cache import NegativeCache
+from idempotency import MAX_BYTES, IdempotencyStore, idempotent
+
 app = Flask(__name__)
+tracing.init_app(app)
 
 # 配置文件路径
 ENV_FILE = Path(__file__).parent / ".env"
 ENV_EXAMPLE_FILE = Path(__file__).parent / ".env.example"
 
+# 上游接口地址（可通过 GLM_API_URL 指向本地桩服务做离线压测）
+DEFAULT_API_URL = "https://open.bigmodel.cn/api/paas/v4/images/generations"
+
 # 配置变量（模块级别）
 config = None
+# 追踪导出器只在首次加载配置时创建；load_config 可能被多次调用，重复创建会泄漏文件句柄和后台线程
+_tracing_configured = False
+
+# 上游确定性错误码 -> 负缓存错误类别（限流、服务繁忙等瞬时错误不在此列）
+DETERMINISTIC_ERROR_CODES = {
+    "1301": "content_filter",   # 内容安全审核未通过
+    "1210": "invalid_param",    # API 调用参数有误
+    "1211": "invalid_param",    # 模型不存在
+    "1214": "invalid_param",    # 输入参数错误
+}
+
+# 负结果缓存：确定性失败的请求在 TTL 内直接返回缓存的错误
+negative_cache = NegativeCache()
+
+# 幂等键存储：客户端超时重试时复用进行中或已完成的生成结果
+idempotency_store = IdempotencyStore()
 
 # 加载配置
 def load_config(interactive=True):
     """加载配置文件"""
-    global config
+    global config, _tracing_configured
 
     if not ENV_FILE.exists():
         if ENV_EXAMPLE_FILE.exists():
@@ -38,6 +69,9 @@ def load_config(interactive=True):
             sys.exit(1)
 
     load_dotenv(ENV_FILE)
+    if not _tracing_configured:
+        tracing.configure_from_env("glm-image")
+        _tracing_configured = True
 
     # 检查API密钥
     api_key = os.getenv("GLM_API_KEY")
@@ -70,6 +104,7 @@ def load_config(interactive=True):
 
     config = {
         "api_key": api_key,
+        "api_url": os.getenv("GLM_API_URL", DEFAULT_API_URL),
         "default_width": int(os.getenv("DEFAULT_WIDTH", "1024")),
         "default_height": int(os.getenv("DEFAULT_HEIGHT", "1024")),
         "default_model": os.getenv("DEFAULT_MODEL", "glm-image"),
@@ -78,6 +113,13 @@ def load_config(interactive=True):
         "server_port": int(os.getenv("SERVER_PORT", "5001"))
     }
 
+    negative_cache.ttls.update({
+        "content_filter": int(os.getenv("NEGATIVE_CACHE_TTL_CONTENT_FILTER", "300")),
+        "invalid_param": int(os.getenv("NEGATIVE_CACHE_TTL_INVALID_PARAM", "600")),
+    })
+    idempotency_store.ttl = int(os.getenv("IDEMPOTENCY_TTL", "3600"))
+    idempotency_store.max_bytes = int(os.getenv("IDEMPOTENCY_MAX_BYTES", str(MAX_BYTES)))
+
     return config
 
 def update_config(key, value):
@@ -102,6 +144,18 @@ def update_config(key, value):
 
     print(f"OK 配置 {key} 已更新")
 
+def classify_error(status_code, error_text):
+    """判断上游错误是否为确定性失败，返回负缓存错误类别，瞬时错误返回 None"""
+    if status_code >= 500 or status_code == 429:
+        return None
+    try:
+        error = json.loads(error_text).get("error") or {}
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(error, dict):
+        return None  # {"error": "消息文本"} 这类响应没有错误码，按瞬时错误处理
+    return DETERMINISTIC_ERROR_CODES.get(str(error.get("code", "")))
+
 def generate_image(prompt, negative_prompt="", width=1024, height=1024,
                   model="glm-image", style="写实", samples=1):
     """生成图像
@@ -117,11 +171,12 @@ def generate_image(prompt, negative_prompt="", width=1024, height=1024,
 
     Returns:
         (list, str, str): 图像数据列表，状态信息，照片ID
+            b64_image 形式的结果以 "file" 文件句柄返回（已解码的图像数据），而不是 base64 字符串
     """
     if config is None:
         load_config()
 
-    url = "https://open.bigmodel.cn/api/paas/v4/images/generations"
+    url = config.get("api_url") or DEFAULT_API_URL
 
     # 构建请求头
     headers = {
@@ -144,24 +199,48 @@ def generate_image(prompt, negative_prompt="", width=1024, height=1024,
     if samples > 1:
         payload["n"] = samples
 
+    # 相同的请求体在上游必然得到相同的确定性错误，命中时直接返回
+    cache_key = NegativeCache.key(payload)
+    cached_error = negative_cache.get(cache_key)
+    if cached_error is not None:
+        with tracing.span("glm.negative_cache_hit"):
+            return None, cached_error, None
+
+    handles = []
+    used = set()   # 已交给调用方的句柄下标，其余句柄在 finally 中关闭
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=240)
-        if response.status_code == 200:
-            result = response.json()
+        # 流式读取响应体：b64_image 直接解码到临时文件，不在内存中保留整段 base64
+        with tracing.span("glm.upstream", model=model, size=payload["size"], samples=samples) as upstream_span, \
+                requests.post(url, json=payload, headers=headers, timeout=240, stream=True) as response:
+            upstream_span.set_attribute("http.status_code", response.status_code)
+            if response.status_code == 200:
+                result, handles = b64_stream.parse_image_response(
+                    response.iter_content(chunk_size=64 * 1024))
+            else:
+                result = None
+                error_text = response.text
 
+        if result is not None:
             if "data" in result:
                 images = []
                 for item in result["data"]:
-                    if "url" in item:
+                    index = item.get("b64_image")
+                    if item.get("url"):
                         images.append({
                             "base64": None,
                             "url": item["url"]
                         })
-                    elif "b64_image" in item:
+                    elif type(index) is int and 0 <= index < len(handles):
+                        used.add(index)
                         images.append({
-                            "base64": item["b64_image"],
-                            "url": None
+                            "base64": None,
+                            "url": None,
+                            "file": handles[index]
                         })
+                    else:
+                        # "b64_image": null 或既没有 url 也没有 b64_image，属于上游返回格式问题
+                        used.clear()
+                        return None, f"上游响应格式错误: 图像条目缺少 url/b64_image: {item}", None
 
                 # 保存照片id
                 photo_id = result.get("id", "")
@@ -170,27 +249,54 @@ def generate_image(prompt, negative_prompt="", width=1024, height=1024,
                 error_msg = result.get("error_msg", "未知错误")
                 return None, error_msg, None
         else:
-            print(f"DEBUG 响应状态码: {response.status_code}")
-            print(f"DEBUG 响应内容: {response.text}")
-            print(f"DEBUG 请求头: {headers}")
-            print(f"DEBUG 请求体: {payload}")
-            return None, f"API 请求失败: 状态码 {response.status_code} - {response.text}", None
+            tracing.log(f"DEBUG 响应状态码: {response.status_code}")
+            tracing.log(f"DEBUG 响应内容: {error_text}")
+            tracing.log(f"DEBUG 请求头: {headers}")
+            tracing.log(f"DEBUG 请求体: {payload}")
+            error_msg = f"API 请求失败: 状态码 {response.status_code} - {error_text}"
+            error_class = classify_error(response.status_code, error_text)
+            if error_class:
+                negative_cache.put(cache_key, error_class, error_msg)
+            return None, error_msg, None
     except Exception as e:
+        used.clear()
         return None, f"请求异常: {str(e)}", None
+    finally:
+        for i, handle in enumerate(handles):
+            if i not in used:
+                handle.close()
+
+def image_to_json(image_data):
+    """把 generate_image 返回的图像转换为可 JSON 序列化的字典（文件句柄编码为 base64）"""
+    handle = image_data.get("file")
+    if handle is None:
+        return image_data
+    with handle:
+        return {"base64": base64.b64encode(handle.read()).decode("ascii"), "url": None}
 
 @app.route("/ping", methods=["GET"])
 def ping():
     """健康检查接口"""
     return jsonify({"status": "ok", "message": "GLM Image API 服务正常运行"})
 
+@app.route("/stats", methods=["GET"])
+def stats():
+    """运行统计接口"""
+    return jsonify({
+        "negative_cache": negative_cache.stats(),
+        "idempotency": idempotency_store.stats()
+    })
+
 @app.route("/txt2img", methods=["POST"])
+@idempotent(idempotency_store)
 def txt2img():
     """文生图 API"""
     if config is None:
         load_config()
 
     try:
-        data = request.get_json()
+        with tracing.span("txt2img.parse_json", content_length=request.content_length or 0):
+            data = request.get_json()
         prompt = data.get("prompt")
 
         if not prompt:
@@ -207,18 +313,209 @@ def txt2img():
         )
 
         if images:
-            return jsonify({
-                "prompt": prompt,
-                "images": images,
-                "count": len(images),
-                "photo_id": photo_id
-            })
+            with tracing.span("txt2img.serialize", count=len(images)):
+                return jsonify({
+                    "prompt": prompt,
+                    "images": [image_to_json(img) for img in images],
+                    "count": len(images),
+                    "photo_id": photo_id
+                })
         else:
             return jsonify({"error": status}), 500
 
     except Exception as e:
         return jsonify({"error": f"请求处理失败: {str(e)}"}), 500
 
+def load_prompts_file(prompts_file, defaults):
+    """读取批量提示词文件
+
+    每行可以是纯文本提示词，也可以是 JSON 对象：
+        {"prompt": "...", "size": "1024x768", "style": "卡通", "filename": "猫"}
+    JSON 对象中可覆盖 negative_prompt/width/height/size/model/style/samples/filename，
+    空行和以 # 开头的行会被忽略。
+
+    Returns:
+        list: [(行号, 任务字典, 任务键)]
+    """
+    jobs = []
+    with open(prompts_file, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                item = json.loads(line)
+            else:
+                item = {"prompt": line}
+            if not item.get("prompt"):
+                raise ValueError(f"第 {line_no} 行缺少 prompt")
+
+            job = dict(defaults)
+            for key in ("prompt", "negative_prompt", "width", "height", "model",
+                        "style", "samples", "filename"):
+                if key in item:
+                    job[key] = item[key]
+            if "size" in item:
+                width, height = str(item["size"]).lower().split("x")
+                job["width"], job["height"] = int(width), int(height)
+
+            # 任务键：优先使用显式 id，否则使用规范化参数的哈希，用于断点续跑
+            key = item.get("id") or hashlib.sha1(
+                json.dumps(job, sort_keys=True, ensure_ascii=False).encode("utf-8")
+            ).hexdigest()
+            jobs.append((line_no, job, str(key)))
+    return jobs
+
+def load_manifest(manifest_file):
+    """读取进度文件，返回 (已完成的任务键集合, {未完成任务键: 上次部分保存的文件})"""
+    done = set()
+    partial = {}
+    if os.path.exists(manifest_file):
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 中断时可能留下半行，忽略即可
+                    continue
+                if entry.get("status") == "done":
+                    done.add(entry["key"])
+                    partial.pop(entry["key"], None)
+                else:
+                    partial[entry["key"]] = entry.get("files") or []
+    return done, partial
+
+def _percentile(sorted_values, pct):
+    """最近秩百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100.0 * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+def _run_job(job, output_dir, key, line_no):
+    """执行单个批量任务：生成并立即保存，任务键作为请求 ID 写入日志和追踪"""
+    token = tracing.set_request_id(key[:16])
+    try:
+        with tracing.span("batch.job"):
+            return _generate_and_save(job, output_dir, line_no)
+    finally:
+        tracing.reset_request_id(token)
+
+def _generate_and_save(job, output_dir, line_no):
+    """生成单个任务的图像并保存，返回 (已保存文件, 是否全部保存, 状态, 照片ID, 耗时)
+
+    文件名为 <filename>_<行号>[_<序号>].png：行号在提示词文件内唯一，不依赖照片ID；
+    目标文件已存在时不覆盖，该图像记为保存失败
+    """
+    import save_png_from_url
+
+    started = time.perf_counter()
+    images, status, photo_id = generate_image(
+        prompt=job["prompt"],
+        negative_prompt=job["negative_prompt"],
+        width=job["width"],
+        height=job["height"],
+        model=job["model"],
+        style=job["style"],
+        samples=job["samples"]
+    )
+    latency = time.perf_counter() - started
+    if not images:
+        return None, False, status, photo_id, latency
+
+    stem = f"{job['filename']}_{line_no}" if job["filename"] else str(line_no)
+    files = []
+    for i, img in enumerate(images):
+        # 多张图像总是加序号，否则同一任务的文件名相同
+        name = f"{stem}_{i + 1}" if len(images) > 1 else stem
+        saved_path = save_png_from_url.save_image_from_dict(img, photo_id, None, output_dir,
+                                                            filename=name, overwrite=False)
+        if saved_path:
+            files.append(saved_path)
+    if len(files) < len(images):
+        status = f"仅保存了 {len(files)}/{len(images)} 张图像"
+    return files, len(files) == len(images), status, photo_id, latency
+
+def run_batch(args):
+    """批量生成：并发执行 prompts 文件中的任务，并支持断点续跑"""
+    defaults = {
+        "negative_prompt": args.negative,
+        "width": args.width,
+        "height": args.height,
+        "model": args.model,
+        "style": args.style,
+        "samples": args.samples,
+        "filename": args.filename,
+    }
+    try:
+        jobs = load_prompts_file(args.prompts_file, defaults)
+    except (OSError, ValueError) as e:
+        print(f"ERROR  读取提示词文件失败: {e}")
+        return 1
+
+    manifest_file = args.manifest or f"{args.prompts_file}.progress.jsonl"
+    done, partial = load_manifest(manifest_file)
+    pending = [(line_no, job, key) for line_no, job, key in jobs if key not in done]
+    # 上次只保存了部分图像的任务会整体重新生成，先删除它留下的文件，避免新文件因同名而无法保存
+    for _, _, key in pending:
+        for path in partial.get(key, []):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    print(f"🎨 批量生成: 共 {len(jobs)} 个任务，已完成 {len(jobs) - len(pending)} 个，"
+          f"待生成 {len(pending)} 个 (并发 {args.concurrency})")
+    print(f"📒 进度文件: {manifest_file}")
+    if not pending:
+        return 0
+
+    latencies = []
+    image_count = 0
+    failed = 0
+    started = time.perf_counter()
+
+    with open(manifest_file, "a", encoding="utf-8") as manifest, \
+            ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as executor:
+        futures = {
+            executor.submit(_run_job, job, args.output, key, line_no): (line_no, key)
+            for line_no, job, key in pending
+        }
+        for future in as_completed(futures):
+            line_no, key = futures[future]
+            try:
+                files, complete, status, photo_id, latency = future.result()
+            except Exception as e:
+                files, complete, status, photo_id, latency = None, False, f"请求异常: {str(e)}", None, None
+
+            entry = {"key": key, "line": line_no, "photo_id": photo_id}
+            if complete:
+                entry.update(status="done", files=files, latency=round(latency, 3))
+                latencies.append(latency)
+                image_count += len(files)
+                print(f"✅ 第 {line_no} 行完成 ({latency:.1f}s)")
+            else:
+                # 部分保存也记为未完成，续跑时会重新生成该任务
+                entry.update(status="partial" if files else "failed", error=status)
+                if files:
+                    entry["files"] = files
+                    image_count += len(files)
+                failed += 1
+                print(f"ERROR  第 {line_no} 行生成失败: {status}")
+
+            # 每完成一项立即落盘，中断后可从进度文件恢复
+            manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            manifest.flush()
+
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print("📊 批量生成统计:")
+    print(f"   成功: {len(pending) - failed}  失败: {failed}  图像: {image_count}")
+    print(f"   耗时: {elapsed:.1f}s  吞吐: {image_count / elapsed * 60 if elapsed else 0:.2f} 张/分钟")
+    print(f"   延迟: p50={_percentile(latencies, 50):.2f}s  p90={_percentile(latencies, 90):.2f}s  "
+          f"p99={_percentile(latencies, 99):.2f}s")
+    return 1 if failed else 0
+
 def main():
     """主函数"""
     # 处理命令行参数之前先处理配置
@@ -272,7 +569,10 @@ def main():
 
     # 直接生成模式
     generate_parser = subparsers.add_parser("generate", help="直接生成图像")
-    generate_parser.add_argument("--prompt", type=str, required=True, help="图像描述")
+    prompt_group = generate_parser.add_mutually_exclusive_group(required=True)
+    prompt_group.add_argument("--prompt", type=str, help="图像描述")
+    prompt_group.add_argument("--prompts-file", type=str,
+                           help="批量生成: JSONL 文件，每行一个提示词或 JSON 对象")
     generate_parser.add_argument("--negative", type=str, default="",
                            help="负向提示词")
     generate_parser.add_argument("--width", type=int, default=config["default_width"],
@@ -289,6 +589,10 @@ def main():
                            help="输出目录 (默认: 工作区根目录/OUT_ai_photo)")
     generate_parser.add_argument("--filename", type=str, default=None,
                            help="指定文件名 (默认: 使用照片ID)")
+    generate_parser.add_argument("--concurrency", type=int, default=4,
+                           help="批量生成并发数 (默认: 4)")
+    generate_parser.add_argument("--manifest", type=str, default=None,
+                           help="批量生成进度文件 (默认: <prompts-file>.progress.jsonl)")
 
     # 配置管理
     config_parser = subparsers.add_parser("config", help="配置管理")
@@ -311,6 +615,9 @@ def main():
 
         app.run(host=args.host, port=args.port, debug=args.debug)
 
+    elif args.subcommand == "generate" and args.prompts_file:
+        return run_batch(args)
+
     elif args.subcommand == "generate":
         print(f"🎨 正在生成图像...")
         print(f"📝 提示词: {args.prompt}")
@@ -383,4 +690,4 @@ if __name__ == "__main__":
         print("WARN   缺少依赖库，正在安装...")
         os.system(f"{sys.executable} -m pip install python-dotenv flask requests pillow")
 
-    main()
+    sys.exit(main())
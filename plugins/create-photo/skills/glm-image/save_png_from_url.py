@@ -6,13 +6,16 @@
 import requests
 import os
 import base64
+import shutil
 from io import BytesIO
 from PIL import Image
 from pathlib import Path
 
+import tracing
+
 import os
 
-def save_png_from_url(image_url, photo_id, keywords, output_dir=None):
+def save_png_from_url(image_url, photo_id, keywords, output_dir=None, filename=None, overwrite=True):
     """
     从GLM Image API返回的URL下载图像并保存
 
@@ -21,6 +24,8 @@ def save_png_from_url(image_url, photo_id, keywords, output_dir=None):
         photo_id: 图像的唯一标识符
         keywords: 图像的关键词（用于文件名）
         output_dir: 输出目录（默认：当前工作区根目录/OUT_ai_photo）
+        filename: 指定文件名（不含扩展名），指定时不再拼接关键词和照片ID
+        overwrite: 为 False 时目标文件已存在则不保存
 
     Returns:
         str: 保存的文件路径
@@ -31,48 +36,59 @@ def save_png_from_url(image_url, photo_id, keywords, output_dir=None):
         root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
         output_dir = os.path.join(root_path, 'OUT_ai_photo')
     try:
-        # 确保输出目录存在
-        output_path = Path(output_dir)
-        output_path.mkdir(exist_ok=True)
-
-        # 生成文件名
-        # 使用关键词和照片ID的后四位
-        id_suffix = photo_id[-4:] if photo_id else "0001"
-        if keywords:
-            filename = f"{keywords}_{id_suffix}.png"
-        else:
-            filename = f"{id_suffix}.png"
-        save_path = output_path / filename
+        save_path = _image_save_path(output_dir, photo_id, keywords, filename)
 
         print(f"📦 正在下载图像: {image_url}")
         print(f"💾 保存路径: {save_path}")
 
         # 下载图像
-        response = requests.get(image_url, timeout=30)
+        with tracing.span("save.download", url=image_url) as download_span:
+            response = requests.get(image_url, timeout=30)
+            download_span.set_attribute("http.status_code", response.status_code)
+            if response.status_code == 200:
+                # 保存图像到文件
+                with open(save_path, "wb" if overwrite else "xb") as f:
+                    f.write(response.content)
         if response.status_code == 200:
-            # 保存图像到文件
-            with open(save_path, "wb") as f:
-                f.write(response.content)
-
             print(f"✅ 图像已保存到: {save_path}")
             return str(save_path)
         else:
             print(f"❌ 下载失败，HTTP状态码: {response.status_code}")
             return None
 
+    except FileExistsError as e:
+        print(f"❌ 文件已存在，未覆盖: {e.filename}")
+        return None
     except Exception as e:
         print(f"❌ 保存图像时出错: {str(e)}")
         return None
 
-def save_image_from_dict(image_data, photo_id, keywords, output_dir=None):
+def _image_save_path(output_dir, photo_id, keywords, filename=None):
+    """生成保存路径：<关键词>_<照片ID后四位>.png，或指定的 <filename>.png"""
+    output_path = Path(output_dir)
+    output_path.mkdir(exist_ok=True)
+    if filename:
+        return output_path / f"{filename}.png"
+
+    id_suffix = photo_id[-4:] if photo_id else "0001"
+    if keywords:
+        filename = f"{keywords}_{id_suffix}.png"
+    else:
+        filename = f"{id_suffix}.png"
+    return output_path / filename
+
+def save_image_from_dict(image_data, photo_id, keywords, output_dir=None, filename=None, overwrite=True):
     """
-    从generate_image返回的字典中保存图像（支持base64和url）
+    从generate_image返回的字典中保存图像（支持文件句柄、base64和url）
 
     Args:
-        image_data: 包含图像信息的字典（来自generate_image的返回）
+        image_data: 包含图像信息的字典（来自generate_image的返回，支持 file/base64/url）
+            file 文件句柄保存后即关闭（超过内存阈值的句柄背后是临时文件）
         photo_id: 图像的唯一标识符
         keywords: 图像的关键词（用于文件名）
         output_dir: 输出目录（默认：当前工作区根目录/OUT_ai_photo）
+        filename: 指定文件名（不含扩展名），指定时不再拼接关键词和照片ID
+        overwrite: 为 False 时目标文件已存在则不保存
 
     Returns:
         str: 保存的文件路径
@@ -82,30 +98,47 @@ def save_image_from_dict(image_data, photo_id, keywords, output_dir=None):
         # 获取当前工作区根目录（my-marketplace）
         root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
         output_dir = os.path.join(root_path, 'OUT_ai_photo')
+    mode = "wb" if overwrite else "xb"
     try:
-        if image_data.get("base64"):
+        if image_data.get("file") is not None:
+            print(f"📦 使用已解码的图像数据保存图像")
+            save_path = _image_save_path(output_dir, photo_id, keywords, filename)
+            handle = image_data["file"]
+            with tracing.span("save.write_image") as save_span:
+                handle.seek(0)
+                img = Image.open(handle)
+                save_span.set_attribute("format", img.format)
+                if img.format == "PNG":
+                    # 已经是 PNG，直接流式复制，省去解码和重新编码
+                    handle.seek(0)
+                    with open(save_path, mode) as f:
+                        shutil.copyfileobj(handle, f)
+                else:
+                    with open(save_path, mode) as f:
+                        img.save(f, "PNG")
+            print(f"✅ 图像已保存到: {save_path}")
+            return str(save_path)
+        elif image_data.get("base64"):
             print(f"📦 使用base64数据保存图像")
-            img_data = base64.b64decode(image_data["base64"])
-            img = Image.open(BytesIO(img_data))
-
-            output_path = Path(output_dir)
-            output_path.mkdir(exist_ok=True)
-
-            id_suffix = photo_id[-4:] if photo_id else "0001"
-            if keywords:
-                filename = f"{keywords}_{id_suffix}.png"
-            else:
-                filename = f"{id_suffix}.png"
-            save_path = output_path / filename
-
-            img.save(save_path, "PNG")
+            save_path = _image_save_path(output_dir, photo_id, keywords, filename)
+            with tracing.span("save.decode_base64"):
+                img_data = base64.b64decode(image_data["base64"])
+                img = Image.open(BytesIO(img_data))
+                with open(save_path, mode) as f:
+                    img.save(f, "PNG")
             print(f"✅ 图像已保存到: {save_path}")
             return str(save_path)
         elif image_data.get("url"):
-            return save_png_from_url(image_data["url"], photo_id, keywords, output_dir)
+            return save_png_from_url(image_data["url"], photo_id, keywords, output_dir, filename, overwrite)
         else:
             print("❌ 图像数据无效：既没有base64数据也没有URL")
             return None
+    except FileExistsError as e:
+        print(f"❌ 文件已存在，未覆盖: {e.filename}")
+        return None
     except Exception as e:
         print(f"❌ 保存图像时出错: {str(e)}")
         return None
+    finally:
+        if image_data.get("file") is not None:
+            image_data["file"].close()
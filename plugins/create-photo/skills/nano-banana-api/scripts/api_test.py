@@ -8,122 +8,300 @@ Nano Banana API 测试脚本
 import argparse
 import requests
 import json
-import base64
-from io import BytesIO
-from PIL import Image
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 import os
 
+from image_client import ImageClient, ImageClientError
 
-def print_response(response):
-    """格式化输出响应"""
-    try:
-        data = response.json()
-        print(json.dumps(data, indent=2, ensure_ascii=False))
-    except:
-        print(response.text)
+
+def print_data(data):
+    """格式化输出响应数据"""
+    print(json.dumps(data, indent=2, ensure_ascii=False))
+
+
+def print_error(e):
+    """输出客户端异常及服务端返回的错误内容"""
+    if isinstance(e, ImageClientError) and e.status_code:
+        print(f"\033[91m❌ 请求失败，状态码: {e.status_code}\033[0m")
+        if e.payload:
+            print_data(e.payload)
+        else:
+            print(e)
+    elif isinstance(e, requests.exceptions.Timeout):
+        print("\033[91m❌ 请求超时，服务器响应时间过长\033[0m")
+    elif isinstance(e, requests.exceptions.ConnectionError):
+        print("\033[91m❌ 无法连接到服务器，请检查服务器是否已启动\033[0m")
+    else:
+        print(f"\033[91m❌ 请求异常: {e}\033[0m")
 
 
-def test_health_check(api_url):
+def test_health_check(client):
     """测试健康检查"""
     print("\033[92m=== 健康检查 ===\033[0m")
     try:
-        response = requests.get(f"{api_url}/ping")
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("status") == "ok":
-                print("\033[92m✅ 健康检查通过\033[0m")
-                print_response(response)
-            else:
-                print("\033[91m❌ 健康检查响应异常\033[0m")
-                print_response(response)
+        data = client.ping()
+        if data.get("status") == "ok":
+            print("\033[92m✅ 健康检查通过\033[0m")
         else:
-            print(f"\033[91m❌ 健康检查失败，状态码: {response.status_code}\033[0m")
-            print_response(response)
-    except requests.exceptions.ConnectionError:
-        print("\033[91m❌ 无法连接到服务器，请检查服务器是否已启动\033[0m")
+            print("\033[91m❌ 健康检查响应异常\033[0m")
+        print_data(data)
     except Exception as e:
-        print(f"\033[91m❌ 健康检查异常: {e}\033[0m")
+        print_error(e)
     print()
 
 
-def test_root_path(api_url):
+def test_root_path(client):
     """测试根路径"""
     print("\033[92m=== 根路径测试 ===\033[0m")
     try:
-        response = requests.get(f"{api_url}/")
-        if response.status_code == 200:
-            print("\033[92m✅ 根路径测试通过\033[0m")
-            print_response(response)
-        else:
-            print(f"\033[91m❌ 根路径访问失败，状态码: {response.status_code}\033[0m")
-            print_response(response)
+        data = client.info()
+        print("\033[92m✅ 根路径测试通过\033[0m")
+        print_data(data)
     except Exception as e:
-        print(f"\033[91m❌ 根路径测试异常: {e}\033[0m")
+        print_error(e)
     print()
 
 
-def test_text_to_image(api_url, prompt, output_dir="output"):
+def test_text_to_image(client, prompt, output_dir="output"):
     """测试文本到图像"""
     print("\033[92m=== 文生图测试 ===\033[0m")
     print(f"使用提示词: \033[94m{prompt}\033[0m")
 
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    try:
+        result = client.txt2img(prompt, negative_prompt="ugly, blurry, low quality",
+                                width=512, height=512, steps=10, samples=1)
+        if result.images:
+            # 保存图片（base64 分块解码写盘，url 流式下载）
+            for filepath in result.save(output_dir, prefix="image", client=client):
+                print(f"\033[92m✅ 图片已保存: {filepath}\033[0m")
+            for img_info in result.images:
+                if "error" in img_info:
+                    print(f"\033[91m❌ 图片生成失败: {img_info['error']}\033[0m")
+        else:
+            print("\033[91m❌ 响应中没有图片数据\033[0m")
+        print(f"耗时 {result.elapsed:.2f}s，接收 {result.bytes_received / 1048576:.2f} MB")
+    except Exception as e:
+        print_error(e)
+    print()
 
-    payload = {
-        "prompt": prompt,
-        "negative_prompt": "ugly, blurry, low quality",
-        "width": 512,
-        "height": 512,
-        "steps": 10,
-        "samples": 1
-    }
 
+# 压测默认的混合负载：不同提示词和尺寸按权重抽取
+DEFAULT_PROFILES = [
+    {"name": "small", "prompt": "cartoon horse, cute style, white background",
+     "width": 512, "height": 512, "steps": 10, "weight": 5},
+    {"name": "medium", "prompt": "a lighthouse on a cliff at sunset, oil painting",
+     "width": 768, "height": 768, "steps": 20, "weight": 3},
+    {"name": "large", "prompt": "futuristic city skyline at night, neon lights, highly detailed",
+     "width": 1024, "height": 1024, "steps": 30, "weight": 2},
+]
+
+
+def load_profiles(path):
+    """加载压测负载配置（JSON 数组，字段同 /txt2img 请求体，另有 name 和 weight）"""
+    if not path:
+        return DEFAULT_PROFILES
+    with open(path, "r", encoding="utf-8") as f:
+        profiles = json.load(f)
+    for idx, profile in enumerate(profiles):
+        profile.setdefault("name", f"profile_{idx}")
+        profile.setdefault("weight", 1)
+    return profiles
+
+
+def percentile(sorted_values, pct):
+    """最近秩百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100.0 * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+def send_request(client, profile):
+    """通过客户端发送一次文生图请求，返回结果记录"""
+    params = {k: v for k, v in profile.items() if k not in ("name", "weight", "prompt")}
+    params.setdefault("samples", 1)
+    started = time.perf_counter()
+    record = {"profile": profile["name"], "start": started}
     try:
-        response = requests.post(
-            f"{api_url}/txt2img",
-            headers={"Content-Type": "application/json"},
-            json=payload,
-            timeout=30
-        )
-
-        if response.status_code == 200:
-            data = response.json()
-
-            if "images" in data and data["images"]:
-                # 保存图片
-                for idx, img_info in enumerate(data["images"]):
-                    if "base64" in img_info:
-                        try:
-                            # 解码并保存图片
-                            img_data = base64.b64decode(img_info["base64"])
-                            img = Image.open(BytesIO(img_data))
-                            filename = f"image_{idx}.png"
-                            filepath = os.path.join(output_dir, filename)
-                            img.save(filepath)
-                            print(f"\033[92m✅ 图片已保存: {filepath}\033[0m")
-                        except Exception as e:
-                            print(f"\033[91m❌ 保存图片失败: {e}\033[0m")
-                    elif "error" in img_info:
-                        print(f"\033[91m❌ 图片生成失败: {img_info['error']}\033[0m")
-            else:
-                print("\033[91m❌ 响应中没有图片数据\033[0m")
-
-            print_response(response)
-        else:
-            print(f"\033[91m❌ 文生图请求失败，状态码: {response.status_code}\033[0m")
-            print_response(response)
-    except requests.exceptions.Timeout:
-        print("\033[91m❌ 请求超时，服务器响应时间过长\033[0m")
-    except requests.exceptions.ConnectionError:
-        print("\033[91m❌ 无法连接到服务器，请检查服务器是否已启动\033[0m")
+        result = client.txt2img(profile["prompt"], **params)
+        record["bytes"] = result.bytes_received
+        record["status"] = result.status_code
+        record["ok"] = True
+    except ImageClientError as e:
+        record["bytes"] = 0
+        record["status"] = e.status_code or type(e).__name__
+        record["ok"] = False
+    except requests.exceptions.RequestException as e:
+        record["bytes"] = 0
+        record["status"] = type(e).__name__
+        record["ok"] = False
     except Exception as e:
-        print(f"\033[91m❌ 文生图测试异常: {e}\033[0m")
-        import traceback
-        traceback.print_exc()
+        # 其他异常（响应解析失败等）同样计为失败，否则工作线程会静默退出，错误率偏低
+        record["bytes"] = 0
+        record["status"] = type(e).__name__
+        record["ok"] = False
+    record["latency"] = time.perf_counter() - started
+    return record
+
+
+def summarize(records, elapsed):
+    """汇总吞吐量、错误率、延迟百分位和接收字节数"""
+    latencies = sorted(r["latency"] for r in records if r["ok"])
+    errors = sum(1 for r in records if not r["ok"])
+    total = len(records)
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p90_ms": percentile(latencies, 90) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "bytes_received": sum(r["bytes"] for r in records),
+    }
+
+
+def _display_width(text):
+    """终端显示宽度（中文字符占两列）"""
+    return sum(2 if ord(c) > 0x2E80 else 1 for c in text)
+
+
+def print_table(title, rows):
+    """以表格形式输出汇总结果"""
+    header = ["名称", "请求数", "错误数", "错误率", "吞吐(req/s)", "p50(ms)", "p90(ms)", "p99(ms)", "接收(MB)"]
+    cells = []
+    for name, summary in rows:
+        cells.append([
+            name,
+            str(summary["requests"]),
+            str(summary["errors"]),
+            f"{summary['error_rate'] * 100:.1f}%",
+            f"{summary['throughput_rps']:.2f}",
+            f"{summary['p50_ms']:.0f}",
+            f"{summary['p90_ms']:.0f}",
+            f"{summary['p99_ms']:.0f}",
+            f"{summary['bytes_received'] / 1048576:.2f}",
+        ])
+    widths = [max(_display_width(row[i]) for row in cells + [header]) for i in range(len(header))]
+    print(f"\033[92m=== {title} ===\033[0m")
+    for row in [header] + cells:
+        print("  ".join(c + " " * (w - _display_width(c)) for c, w in zip(row, widths)))
     print()
 
 
+def run_load_test(client, args):
+    """压测模式：固定并发（闭环）或固定速率（开环），支持预热和按时长/请求数停止"""
+    profiles = load_profiles(args.profile)
+    weights = [p["weight"] for p in profiles]
+    if not args.duration and not args.requests:
+        args.duration = 30
+
+    mode = f"速率 {args.rate} req/s" if args.rate else f"并发 {args.concurrency}"
+    limit = f"{args.duration}s" if args.duration else f"{args.requests} 个请求"
+    print(f"\033[92m=== 压测 ===\033[0m")
+    print(f"目标: {client.base_url}  模式: {mode}  限制: {limit}  预热: {args.warmup}s  负载: "
+          + ", ".join(p["name"] for p in profiles))
+
+    records = []
+    lock = threading.Lock()
+    issued = [0]
+    stop = threading.Event()
+    started = time.perf_counter()
+    measure_start = started + args.warmup
+    deadline = measure_start + args.duration if args.duration else None
+
+    def next_slot():
+        """领取一个请求名额，达到停止条件时返回 False"""
+        now = time.perf_counter()
+        if stop.is_set() or (deadline and now >= deadline):
+            stop.set()
+            return False
+        if args.requests and now >= measure_start:
+            with lock:
+                if issued[0] >= args.requests:
+                    stop.set()
+                    return False
+                issued[0] += 1
+        return True
+
+    def fire():
+        # 所有工作线程共享客户端的连接池，与生产调用方走同一条代码路径
+        profile = random.choices(profiles, weights=weights)[0]
+        record = send_request(client, profile)
+        record["warmup"] = record["start"] < measure_start
+        with lock:
+            records.append(record)
+
+    def closed_loop_worker():
+        while next_slot():
+            fire()
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        if args.rate:
+            # 开环：按固定间隔发出请求，不受响应快慢影响；在途请求数受 --concurrency 限制
+            interval = 1.0 / args.rate
+            in_flight = threading.Semaphore(args.concurrency)
+            next_time = time.perf_counter()
+            while next_slot():
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                next_time += interval
+                in_flight.acquire()
+                future = executor.submit(fire)
+                future.add_done_callback(lambda _: in_flight.release())
+        else:
+            for _ in range(args.concurrency):
+                executor.submit(closed_loop_worker)
+
+    finished = time.perf_counter()
+    measured = [r for r in records if not r["warmup"]]
+    elapsed = finished - max(measure_start, started)
+
+    overall = summarize(measured, elapsed)
+    rows = [("全部", overall)]
+    by_profile = {}
+    for profile in profiles:
+        subset = [r for r in measured if r["profile"] == profile["name"]]
+        if subset:
+            by_profile[profile["name"]] = summarize(subset, elapsed)
+            rows.append((profile["name"], by_profile[profile["name"]]))
+    print_table("压测结果", rows)
+
+    status_counts = {}
+    for r in measured:
+        status_counts[str(r["status"])] = status_counts.get(str(r["status"]), 0) + 1
+
+    report = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "target": client.base_url,
+        "config": {
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "duration": args.duration,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "timeout": args.timeout,
+            "profiles": profiles,
+        },
+        "elapsed_s": elapsed,
+        "warmup_requests": len(records) - len(measured),
+        "summary": overall,
+        "profiles": by_profile,
+        "status_counts": status_counts,
+    }
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\033[92m✅ 压测报告已保存: {args.report}\033[0m")
+    return report
+
+
 def load_config():
     """加载配置"""
     config = {}
@@ -157,6 +335,8 @@ def main():
   python api_test.py --health            # 只测试健康检查
   python api_test.py --txt2img           # 只测试文生图
   python api_test.py --txt2img --prompt "cartoon horse"  # 自定义提示词
+  python api_test.py --load --concurrency 8 --duration 60 --warmup 10 --report load.json  # 固定并发压测
+  python api_test.py --load --rate 2 --requests 200 --profile profiles.json            # 固定速率压测
         """.strip()
     )
 
@@ -200,6 +380,62 @@ def main():
         help="图片输出目录"
     )
 
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="单个请求超时时间（秒）(默认: 压测 120，其他测试 30)"
+    )
+
+    load_group = parser.add_argument_group("压测模式")
+    load_group.add_argument(
+        "--load",
+        action="store_true",
+        help="运行压测，输出吞吐量、错误率、延迟百分位和接收字节数"
+    )
+    load_group.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="并发数；指定 --rate 时为最大在途请求数 (默认: 4)"
+    )
+    load_group.add_argument(
+        "--rate",
+        type=float,
+        default=None,
+        help="目标请求速率 (req/s)，不指定时按固定并发压测"
+    )
+    load_group.add_argument(
+        "--duration",
+        type=float,
+        default=None,
+        help="压测时长（秒，不含预热），与 --requests 都未指定时默认 30"
+    )
+    load_group.add_argument(
+        "--requests",
+        type=int,
+        default=None,
+        help="压测请求数（不含预热）"
+    )
+    load_group.add_argument(
+        "--warmup",
+        type=float,
+        default=0,
+        help="预热时长（秒），预热期间的请求不计入结果 (默认: 0)"
+    )
+    load_group.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="负载配置 JSON 文件（提示词/尺寸组合及权重），默认使用内置混合负载"
+    )
+    load_group.add_argument(
+        "--report",
+        type=str,
+        default=None,
+        help="JSON 报告输出路径，便于多次压测对比"
+    )
+
     parser.add_argument(
         "--full",
         action="store_true",
@@ -212,15 +448,23 @@ def main():
     api_url = f"http://{args.host}:{args.port}"
 
     # 确定要运行的测试
-    if args.health:
-        test_health_check(api_url)
-    elif args.txt2img:
-        test_text_to_image(api_url, args.prompt, args.output)
+    if args.timeout is None:
+        args.timeout = 120 if args.load else 30
+    if args.load:
+        # 压测不重试，避免掩盖错误和拉低延迟统计
+        with ImageClient(api_url, timeout=args.timeout, max_concurrency=args.concurrency, retries=0) as client:
+            run_load_test(client, args)
     else:
-        # 默认运行完整测试
-        test_health_check(api_url)
-        test_root_path(api_url)
-        test_text_to_image(api_url, args.prompt, args.output)
+        with ImageClient(api_url, timeout=args.timeout) as client:
+            if args.health:
+                test_health_check(client)
+            elif args.txt2img:
+                test_text_to_image(client, args.prompt, args.output)
+            else:
+                # 默认运行完整测试
+                test_health_check(client)
+                test_root_path(client)
+                test_text_to_image(client, args.prompt, args.output)
 
     print("\033[92m=== 测试完成 ===\033[0m")
 
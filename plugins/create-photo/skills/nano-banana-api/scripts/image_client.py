@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+create-photo 图像服务 Python 客户端
+适用于 glm_image_api.py 和 stable_diffusion_api.py 提供的 /ping、/txt2img 接口
+
+特性:
+    - 基于 requests.Session 的连接池，所有线程共享
+    - 自动附带 Idempotency-Key，超时/5xx 重试不会重复计费
+    - 批量提交（并发数有上限）和任务轮询
+    - 图像下载流式写入文件，base64 结果分块解码写盘
+    - 同步 ImageClient 与 asyncio 版 AsyncImageClient
+
+用法:
+    from image_client import ImageClient
+
+    with ImageClient("http://127.0.0.1:5001") as client:
+        result = client.txt2img("一只可爱的卡通猫", width=1024, height=1024)
+        result.save("out", prefix="cat")
+
+        jobs = [client.submit(prompt) for prompt in prompts]
+        for job in client.as_completed(jobs):
+            job.result().save("out")
+"""
+
+import asyncio
+import base64
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed as futures_as_completed
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT = 240
+CHUNK_SIZE = 1024 * 1024
+
+
+class ImageClientError(Exception):
+    """服务返回错误或请求失败"""
+
+    def __init__(self, message, status_code=None, payload=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.payload = payload
+
+
+class GenerationResult:
+    """一次 /txt2img 调用的结果"""
+
+    def __init__(self, data, status_code, bytes_received, elapsed):
+        self.data = data
+        self.status_code = status_code
+        self.bytes_received = bytes_received
+        self.elapsed = elapsed
+
+    @property
+    def images(self):
+        return self.data.get("images", [])
+
+    @property
+    def photo_id(self):
+        return self.data.get("photo_id", "")
+
+    def save(self, output_dir, prefix="image", client=None):
+        """保存所有图像，返回文件路径列表；url 形式的图像需要传入 client 以流式下载"""
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+        saved = []
+        for idx, image in enumerate(self.images):
+            target = output_path / f"{prefix}_{idx}.png"
+            if image.get("base64"):
+                write_base64(image["base64"], target)
+            elif image.get("url"):
+                if client is None:
+                    raise ImageClientError("保存 url 图像需要提供 client")
+                client.download(image["url"], target)
+            else:
+                continue
+            saved.append(str(target))
+        return saved
+
+
+def write_base64(data, path, chunk_chars=4 * CHUNK_SIZE):
+    """分块解码 base64 字符串并写入文件（先写临时文件再改名）"""
+    tmp_path = f"{path}.part"
+    with open(tmp_path, "wb") as f:
+        for start in range(0, len(data), chunk_chars):
+            f.write(base64.b64decode(data[start:start + chunk_chars]))
+    os.replace(tmp_path, path)
+    return path
+
+
+class Job:
+    """批量提交的任务句柄，可轮询状态或阻塞等待结果"""
+
+    def __init__(self, job_id, params, future):
+        self.id = job_id
+        self.params = params
+        self.future = future
+
+    @property
+    def status(self):
+        if self.future.running():
+            return "running"
+        if not self.future.done():
+            return "pending"
+        return "failed" if self.future.exception() else "done"
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+    def poll(self):
+        """返回任务状态快照"""
+        snapshot = {"id": self.id, "status": self.status}
+        if snapshot["status"] == "failed":
+            snapshot["error"] = str(self.future.exception())
+        return snapshot
+
+
+class ImageClient:
+    """同步客户端：连接池 + 重试 + 有界并发的批量提交"""
+
+    def __init__(self, base_url, timeout=DEFAULT_TIMEOUT, max_concurrency=8, retries=2,
+                 backoff=0.5, client_id=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.client_id = client_id
+
+        # 带 Idempotency-Key 的 POST 也可以安全重试
+        retry = Retry(total=retries, connect=retries, read=retries, backoff_factor=backoff,
+                      status_forcelist=(502, 503, 504), allowed_methods=frozenset({"GET", "POST"}),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency,
+                              max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if client_id:
+            self.session.headers["X-Client-Id"] = client_id
+
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    # -- 基础请求 ---------------------------------------------------------
+
+    def request(self, method, path, **kwargs):
+        """发送请求，返回 requests.Response"""
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, f"{self.base_url}{path}", **kwargs)
+
+    def _json(self, response):
+        try:
+            data = response.json()
+        except ValueError:
+            raise ImageClientError(f"响应不是 JSON: {response.text[:200]}", response.status_code)
+        if response.status_code != 200:
+            raise ImageClientError(data.get("error", f"状态码 {response.status_code}"),
+                                   response.status_code, data)
+        return data
+
+    def ping(self):
+        """健康检查"""
+        return self._json(self.request("GET", "/ping", timeout=10))
+
+    def info(self):
+        """服务主页信息（仅 stable_diffusion_api 提供）"""
+        return self._json(self.request("GET", "/", timeout=10))
+
+    def txt2img(self, prompt, idempotency_key=None, **params):
+        """文生图，返回 GenerationResult；失败时抛出 ImageClientError"""
+        payload = dict(params, prompt=prompt)
+        headers = {"Idempotency-Key": idempotency_key or uuid.uuid4().hex}
+        started = time.perf_counter()
+        response = self.request("POST", "/txt2img", json=payload, headers=headers)
+        elapsed = time.perf_counter() - started
+        data = self._json(response)
+        return GenerationResult(data, response.status_code, len(response.content), elapsed)
+
+    def download(self, url, path):
+        """流式下载到文件，不在内存中保留整张图片"""
+        tmp_path = f"{path}.part"
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                raise ImageClientError(f"下载失败，状态码 {response.status_code}", response.status_code)
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+        os.replace(tmp_path, path)
+        return path
+
+    # -- 批量提交与轮询 ---------------------------------------------------
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                                    thread_name_prefix="image-client")
+            return self._executor
+
+    def submit(self, prompt, **params):
+        """提交任务，立即返回 Job；同时执行的任务数不超过 max_concurrency"""
+        job_id = params.pop("idempotency_key", None) or uuid.uuid4().hex
+        future = self._get_executor().submit(self.txt2img, prompt, idempotency_key=job_id, **params)
+        return Job(job_id, dict(params, prompt=prompt), future)
+
+    def batch(self, requests_params):
+        """批量提交 [{"prompt": ..., ...}]，返回 Job 列表"""
+        return [self.submit(**params) for params in requests_params]
+
+    @staticmethod
+    def as_completed(jobs, timeout=None):
+        """按完成顺序迭代 Job"""
+        by_future = {job.future: job for job in jobs}
+        for future in futures_as_completed(by_future, timeout=timeout):
+            yield by_future[future]
+
+    @staticmethod
+    def poll(jobs):
+        """返回所有任务的状态快照"""
+        return [job.poll() for job in jobs]
+
+    @staticmethod
+    def wait(jobs, interval=1.0, timeout=None, callback=None):
+        """轮询直到所有任务结束；callback 每轮收到状态快照列表"""
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            snapshot = ImageClient.poll(jobs)
+            if callback:
+                callback(snapshot)
+            if all(job.done() for job in jobs):
+                return snapshot
+            if deadline and time.monotonic() >= deadline:
+                raise TimeoutError("等待任务超时")
+            time.sleep(interval)
+
+    def close(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class AsyncImageClient:
+    """asyncio 客户端：在有界线程池中复用同步客户端的连接池
+
+    async with AsyncImageClient("http://127.0.0.1:5000") as client:
+        result = await client.txt2img("cartoon horse", width=512, height=512)
+        async for params, outcome in client.batch(items):
+            ...
+    """
+
+    def __init__(self, base_url, max_concurrency=8, **kwargs):
+        self._client = ImageClient(base_url, max_concurrency=max_concurrency, **kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="image-client-async")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _call(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            return await loop.run_in_executor(self._executor, lambda: func(*args, **kwargs))
+
+    async def ping(self):
+        return await self._call(self._client.ping)
+
+    async def info(self):
+        return await self._call(self._client.info)
+
+    async def txt2img(self, prompt, **params):
+        return await self._call(self._client.txt2img, prompt, **params)
+
+    async def download(self, url, path):
+        return await self._call(self._client.download, url, path)
+
+    async def batch(self, requests_params):
+        """按完成顺序产出 (参数, GenerationResult 或异常)"""
+        async def run(params):
+            try:
+                return params, await self.txt2img(**params)
+            except Exception as e:
+                return params, e
+
+        tasks = [asyncio.ensure_future(run(params)) for params in requests_params]
+        for task in asyncio.as_completed(tasks):
+            yield await task
+
+    async def close(self):
+        self._executor.shutdown(wait=False)
+        self._client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
@@ -9,6 +9,10 @@ from io import BytesIO
 import base64
 import threading
 
+from negative_cache import NegativeCache
+from idempotency import MAX_BYTES, IdempotencyStore, idempotent
+import tracing
+
 # 检查是否已安装 Stability-AI SDK
 try:
     import stability_sdk
@@ -22,6 +26,10 @@ except ImportError:
 # 创建 Flask 应用
 app = Flask(__name__)
 
+# 链路追踪（TRACING_EXPORTER=jsonl/otlp 启用）
+tracing.configure_from_env("nano-banana-api")
+tracing.init_app(app)
+
 # 配置 Stability-AI API 密钥（需要从环境变量中获取）
 STABILITY_API_KEY = os.getenv("STABILITY_API_KEY")
 
@@ -30,6 +38,18 @@ if not STABILITY_API_KEY:
     print("请设置 STABILITY_API_KEY 环境变量，或在代码中直接设置。")
     print("API 密钥可从 https://beta.stability.ai/ 获取。")
 
+# 负结果缓存：被安全过滤或参数校验拒绝的请求在 TTL 内直接返回缓存的错误
+negative_cache = NegativeCache({
+    "content_filter": int(os.getenv("NEGATIVE_CACHE_TTL_CONTENT_FILTER", "300")),
+    "invalid_param": int(os.getenv("NEGATIVE_CACHE_TTL_INVALID_PARAM", "600")),
+})
+
+# 幂等键存储：客户端超时重试时复用进行中或已完成的生成结果
+idempotency_store = IdempotencyStore(
+    ttl=int(os.getenv("IDEMPOTENCY_TTL", "3600")),
+    max_bytes=int(os.getenv("IDEMPOTENCY_MAX_BYTES", str(MAX_BYTES))),
+)
+
 # 初始化 Stability-AI 客户端
 stability_api = None
 try:
@@ -62,16 +82,47 @@ def ping():
     return jsonify({"status": "ok", "message": "API 服务正常运行"})
 
 
+@app.route("/stats")
+def stats():
+    """运行统计"""
+    return jsonify({
+        "negative_cache": negative_cache.stats(),
+        "idempotency": idempotency_store.stats()
+    })
+
+
+def is_invalid_argument(error):
+    """gRPC 参数校验错误（INVALID_ARGUMENT）属于确定性失败"""
+    code = getattr(error, "code", None)
+    if not callable(code):
+        return False
+    try:
+        return getattr(code(), "name", "") == "INVALID_ARGUMENT"
+    except Exception:
+        return False
+
+
+def encode_image_base64(binary):
+    """将上游返回的图像重新编码为 PNG 并转换为 base64 字符串"""
+    img = Image.open(BytesIO(binary))
+    buffered = BytesIO()
+    img.save(buffered, format="PNG")
+    return base64.b64encode(buffered.getvalue()).decode()
+
+
 @app.route("/txt2img", methods=["POST"])
+@idempotent(idempotency_store)
 def text_to_image():
     """文生图 API"""
+    cache_key = None
     try:
         # 检查 API 密钥是否已配置
         if not STABILITY_API_KEY or not stability_api:
             return jsonify({"error": "未配置 Stability-AI API 密钥，请先在 .env 文件中配置 API 密钥"}), 500
 
         # 获取请求参数
-        data = request.json
+        with tracing.span("txt2img.parse_json", content_length=request.content_length or 0):
+            data = request.json
         prompt = data.get("prompt")
         negative_prompt = data.get("negative_prompt", "")
         width = data.get("width", 1024)
@@ -87,6 +138,16 @@ def text_to_image():
         if width % 64 != 0 or height % 64 != 0:
             return jsonify({"error": "图像尺寸不符合要求，宽度和高度必须是 64 的倍数"}), 400
 
+        # 相同请求的确定性失败直接返回缓存结果
+        cache_key = NegativeCache.key({
+            "prompt": prompt, "negative_prompt": negative_prompt, "width": width, "height": height,
+            "steps": steps, "cfg_scale": cfg_scale, "samples": samples,
+        })
+        cached = negative_cache.get(cache_key)
+        if cached is not None:
+            body, status_code = cached
+            return jsonify(body), status_code
+
         # 直接使用字符串列表而不是复杂的 Prompt 对象
         if negative_prompt:
             prompts = [
@@ -96,41 +157,49 @@ def text_to_image():
         else:
             prompts = [prompt]
 
-        # 生成图像
-        answers = stability_api.generate(
-            prompt=prompts,
-            width=width,
-            height=height,
-            steps=steps,
-            cfg_scale=cfg_scale,
-            samples=samples,
-            sampler=generation.SAMPLER_K_DPM_2_ANCESTRAL,
-        )
+        # 生成图像（上游为流式返回，sd.generate 减去各 sd.encode_image 即为上游耗时）
+        with tracing.span("sd.generate", width=width, height=height, steps=steps, samples=samples):
+            answers = stability_api.generate(
+                prompt=prompts,
+                width=width,
+                height=height,
+                steps=steps,
+                cfg_scale=cfg_scale,
+                samples=samples,
+                sampler=generation.SAMPLER_K_DPM_2_ANCESTRAL,
+            )
 
-        # 处理生成结果
-        images = []
-        for resp in answers:
-            for artifact in resp.artifacts:
-                if artifact.finish_reason == generation.FILTER:
-                    images.append({"error": "图像内容不符合安全规范，请尝试调整提示词"})
-                elif artifact.type == generation.ARTIFACT_IMAGE:
-                    img = Image.open(BytesIO(artifact.binary))
-                    # 将图像转换为 base64 字符串
-                    buffered = BytesIO()
-                    img.save(buffered, format="PNG")
-                    img_str = base64.b64encode(buffered.getvalue()).decode()
-                    images.append({"base64": img_str})
+            # 处理生成结果
+            images = []
+            for resp in answers:
+                for artifact in resp.artifacts:
+                    if artifact.finish_reason == generation.FILTER:
+                        images.append({"error": "图像内容不符合安全规范，请尝试调整提示词"})
+                    elif artifact.type == generation.ARTIFACT_IMAGE:
+                        with tracing.span("sd.encode_image", bytes=len(artifact.binary)):
+                            img_str = encode_image_base64(artifact.binary)
+                        images.append({"base64": img_str})
 
-        # 返回结果
-        return jsonify({
+        body = {
             "prompt": prompt,
             "images": images,
             "count": len(images)
-        })
+        }
+
+        # 所有结果都被安全过滤时记入负缓存
+        if images and all("error" in image for image in images):
+            negative_cache.put(cache_key, "content_filter", (body, 200))
+
+        # 返回结果
+        with tracing.span("txt2img.serialize", count=len(images)):
+            return jsonify(body)
 
     except Exception as e:
-        print(f"生成图像时出错：{e}")
-        return jsonify({"error": f"生成图像时发生错误：{str(e)}，请稍后重试"}), 500
+        tracing.log(f"生成图像时出错：{e}")
+        body = {"error": f"生成图像时发生错误：{str(e)}，请稍后重试"}
+        if cache_key is not None and is_invalid_argument(e):
+            negative_cache.put(cache_key, "invalid_param", (body, 500))
+        return jsonify(body), 500
 
 
 if __name__ == "__main__":
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# 生成文件，请勿直接修改：源文件为 plugins/create-photo/shared/tracing.py，改完运行 shared/sync_shared.py
+"""
+轻量级链路追踪
+为生成、下载、保存等阶段记录 span，并在日志中携带请求 ID；导出器可插拔（JSON Lines / OTLP HTTP）
+
+环境变量：
+    TRACING_EXPORTER       none（默认）/ jsonl / otlp
+    TRACING_JSONL_PATH     jsonl 导出文件路径（默认：traces.jsonl）
+    TRACING_OTLP_ENDPOINT  OTLP/HTTP 接收地址（默认：http://127.0.0.1:4318/v1/traces）
+    TRACING_SERVICE_NAME   服务名（默认：create-photo）
+
+未启用时 span() 返回共享的空操作对象，开销只有一次全局变量判断。
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.request
+
+REQUEST_ID_HEADER = "X-Request-Id"
+
+_exporter = None
+_service_name = "create-photo"
+_current_span = contextvars.ContextVar("current_span", default=None)
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+
+class _NoopSpan:
+    """追踪关闭时使用的空 span"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """一个计时阶段；作为上下文管理器使用，结束时交给导出器"""
+
+    __slots__ = ("name", "attributes", "trace_id", "span_id", "parent_id",
+                 "start_ns", "end_ns", "error", "_token")
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.error = None
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.parent_id = parent.span_id if parent else None
+        self.span_id = secrets.token_hex(8)
+        request_id = _request_id.get()
+        if request_id:
+            self.attributes.setdefault("request_id", request_id)
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        exporter = _exporter
+        if exporter is not None:
+            exporter.export(self)
+        return False
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class JsonLinesExporter:
+    """每个 span 一行 JSON，写入本地文件，离线可用"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+        atexit.register(self.shutdown)
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def shutdown(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpHttpExporter:
+    """OTLP/HTTP JSON 导出器，后台线程批量发送，不阻塞请求线程"""
+
+    def __init__(self, endpoint, service_name, batch_size=256, interval=2.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def export(self, span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            # 接收端不可用时丢弃，不影响业务请求
+            pass
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.interval)
+            except queue.Empty:
+                continue
+            if item is None:
+                return
+            batch.append(item)
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._send(batch)
+                    return
+                batch.append(item)
+            self._send(batch)
+
+    def _send(self, batch):
+        spans = []
+        for span in batch:
+            otlp_span = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = span.parent_id
+            spans.append(otlp_span)
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "create-photo.tracing"}, "spans": spans}],
+        }]}
+        req = urllib.request.Request(
+            self.endpoint, data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"}, method="POST")
+        try:
+            urllib.request.urlopen(req, timeout=5).close()
+        except Exception as e:
+            print(f"WARN   OTLP 导出失败: {e}")
+
+    def shutdown(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+
+def configure(exporter, service_name=None):
+    """设置导出器；传入 None 关闭追踪。被替换的导出器会先刷出已排队的 span 再关闭"""
+    global _exporter, _service_name
+    previous, _exporter = _exporter, exporter
+    if service_name:
+        _service_name = service_name
+    if previous is not None and previous is not exporter:
+        atexit.unregister(previous.shutdown)
+        previous.shutdown()
+
+
+def configure_from_env(service_name="create-photo"):
+    """根据环境变量选择导出器"""
+    kind = os.getenv("TRACING_EXPORTER", "none").strip().lower()
+    service_name = os.getenv("TRACING_SERVICE_NAME", service_name)
+    if kind == "jsonl":
+        configure(JsonLinesExporter(os.getenv("TRACING_JSONL_PATH", "traces.jsonl")), service_name)
+    elif kind == "otlp":
+        endpoint = os.getenv("TRACING_OTLP_ENDPOINT", "http://127.0.0.1:4318/v1/traces")
+        configure(OtlpHttpExporter(endpoint, service_name), service_name)
+    else:
+        configure(None)
+
+
+def enabled():
+    return _exporter is not None
+
+
+def span(name, **attributes):
+    """创建 span：with tracing.span("stage", key=value): ..."""
+    if _exporter is None:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+def set_request_id(request_id):
+    """设置当前上下文的请求 ID，返回用于恢复的 token"""
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+
+def log(message):
+    """打印日志，带上当前请求 ID"""
+    request_id = _request_id.get()
+    if request_id:
+        print(f"[{request_id}] {message}")
+    else:
+        print(message)
+
+
+def init_app(app):
+    """为 Flask 应用接入请求 ID 和请求级 span"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request():
+        request_id = request.headers.get(REQUEST_ID_HEADER) or secrets.token_hex(8)
+        g.tracing_request_token = _request_id.set(request_id)
+        if _exporter is not None:
+            g.tracing_span = Span("http.request", {"http.method": request.method, "http.route": request.path})
+            g.tracing_span.__enter__()
+
+    @app.after_request
+    def _add_request_id(response):
+        request_id = _request_id.get()
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        request_span = g.get("tracing_span")
+        if request_span is not None:
+            request_span.set_attribute("http.status_code", response.status_code)
+        return response
+
+    @app.teardown_request
+    def _end_request(exc):
+        request_span = g.pop("tracing_span", None)
+        if request_span is not None:
+            request_span.__exit__(type(exc) if exc else None, exc, None)
+        token = g.pop("tracing_request_token", None)
+        if token is not None:
+            _request_id.reset(token)
+
+    return app